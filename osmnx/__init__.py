@@ -5,6 +5,8 @@
 # Web: https://github.com/gboeing/osmnx
 ###################################################################################################
 
+from .cache import *
+from .compact import *
 from .core import *
 from .plot import *
 from .projection import *
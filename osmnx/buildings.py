@@ -14,7 +14,7 @@ from descartes import PolygonPatch
 
 from .projection import project_geometry
 from .plot import save_and_show
-from .core import consolidate_subdivide_geometry, get_polygons_coordinates, overpass_request, bbox_from_point, gdf_from_place
+from .core import consolidate_subdivide_geometry, get_polygons_coordinates, overpass_request_batch, bbox_from_point, gdf_from_place
 from .utils import log, geocode
 
 
@@ -54,8 +54,6 @@ def osm_bldg_download(polygon=None, north=None, south=None, east=None, west=None
     by_bbox = not (north is None or south is None or east is None or west is None)
     if not (by_poly or by_bbox):
         raise ValueError('You must pass a polygon or north, south, east, and west')
-        
-    response_jsons = []
     
     # pass server memory allocation in bytes for the query to the API
     # if None, pass nothing so the server will use its default allocation size
@@ -78,13 +76,14 @@ def osm_bldg_download(polygon=None, north=None, south=None, east=None, west=None
         start_time = time.time()
         
         # loop through each polygon rectangle in the geometry (there will only be one if original bbox didn't exceed max area size)
+        datas = []
         for poly in geometry:
             # represent bbox as south,west,north,east and round lat-longs to 8 decimal places (ie, within 1 mm) so URL strings aren't different due to float rounding issues (for consistent caching)
             west, south, east, north = poly.bounds
             query_template = '[out:json][timeout:{timeout}]{maxsize};(way["building"]({south:.8f},{west:.8f},{north:.8f},{east:.8f});(._;>;););out;'
             query_str = query_template.format(north=north, south=south, east=east, west=west, timeout=timeout, maxsize=maxsize)
-            response_json = overpass_request(data={'data':query_str}, timeout=timeout)
-            response_jsons.append(response_json)
+            datas.append({'data':query_str})
+        response_jsons = overpass_request_batch(datas, timeout=timeout)
         log('Got all building footprints data within bounding box from API in {:,} request(s) and {:,.2f} seconds'.format(len(geometry), time.time()-start_time))
     
     elif by_poly:
@@ -96,12 +95,13 @@ def osm_bldg_download(polygon=None, north=None, south=None, east=None, west=None
         log('Requesting building footprints data within polygon from API in {:,} request(s)'.format(len(polygon_coord_strs)))
         start_time = time.time()
         
-        # pass each polygon exterior coordinates in the list to the API, one at a time
+        # pass each polygon exterior coordinates in the list to the API
+        datas = []
         for polygon_coord_str in polygon_coord_strs:
             query_template = '[out:json][timeout:{timeout}]{maxsize};way(poly:"{polygon}")["building"];(._;>;);out;'
             query_str = query_template.format(polygon=polygon_coord_str, timeout=timeout, maxsize=maxsize)
-            response_json = overpass_request(data={'data':query_str}, timeout=timeout)
-            response_jsons.append(response_json)
+            datas.append({'data':query_str})
+        response_jsons = overpass_request_batch(datas, timeout=timeout)
         log('Got all building footprints data within polygon from API in {:,} request(s) and {:,.2f} seconds'.format(len(polygon_coord_strs), time.time()-start_time))
         
     return response_jsons
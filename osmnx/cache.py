@@ -0,0 +1,804 @@
+###################################################################################################
+# Module: cache.py
+# Description: Save and retrieve HTTP responses in a local file folder or single-file database cache
+# License: MIT, see full license in LICENSE.txt
+# Web: https://github.com/gboeing/osmnx
+###################################################################################################
+
+import os
+import io
+import json
+import time
+import gzip
+import codecs
+import zlib
+import sqlite3
+import hashlib
+import logging as lg
+
+from . import globals
+from .utils import log
+
+# zstandard is an optional dependency for zstd-compressed cache entries
+try:
+    import zstandard as zstd
+except ImportError as e:
+    zstd = None
+
+# ijson is an optional dependency for decoding cached responses incrementally
+try:
+    import ijson
+except ImportError as e:
+    ijson = None
+
+
+# leading bytes that identify each compression format, and the cache file extension for each format
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+ZLIB_MAGIC = b'\x78'
+CACHE_FILE_EXTENSIONS = {None:'.json', 'gzip':'.json.gz', 'zstd':'.json.zst'}
+
+# running counts of cache lookups and writes since import (or since the last call to reset_cache_stats)
+cache_stats = {'hits':0, 'misses':0, 'saves':0, 'evictions':0}
+
+
+def get_cache_key(url):
+    """
+    Hash a request URL into the key under which its response is cached.
+
+    The key is the same md5 hex digest that the folder cache uses as its filenames,
+    so responses can be moved between cache backends without knowing their URLs.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+
+    Returns
+    -------
+    string
+    """
+    return hashlib.md5(url.encode('utf-8')).hexdigest()
+
+
+def get_cache_db_path():
+    """
+    Return the path of the sqlite cache database file inside the cache folder.
+
+    Returns
+    -------
+    string
+    """
+    return '{}/{}'.format(globals.cache_folder, globals.cache_db_filename)
+
+
+def connect_cache_db(db_path=None):
+    """
+    Open a connection to the sqlite cache database, creating it if it does not exist yet.
+
+    The database runs in write-ahead-log mode so that readers do not block a writer.
+
+    Parameters
+    ----------
+    db_path : string
+        path of the database file, if None, use the default path in the cache folder
+
+    Returns
+    -------
+    sqlite3.Connection
+    """
+    if db_path is None:
+        db_path = get_cache_db_path()
+
+    # create the folder on the disk if it doesn't already exist
+    folder = os.path.dirname(db_path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+
+    conn = sqlite3.connect(db_path, timeout=60)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS responses '
+                 '(key TEXT PRIMARY KEY, url TEXT, data BLOB, size INTEGER, created REAL, accessed REAL)')
+    conn.execute('CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)')
+    return conn
+
+
+def open_compressed_writer(fileobj, compression=None):
+    """
+    Wrap a binary file object so that bytes written to it are compressed.
+
+    Parameters
+    ----------
+    fileobj : file-like
+        binary file object to write the compressed bytes to
+    compression : string
+        {None, 'gzip', 'zstd'} the compression format, None writes the bytes uncompressed
+
+    Returns
+    -------
+    file-like
+        writable binary file object, which must be closed to flush the compressed stream
+    """
+    if compression is None:
+        return fileobj
+    elif compression == 'gzip':
+        return gzip.GzipFile(fileobj=fileobj, mode='wb')
+    elif compression == 'zstd':
+        if zstd is None:
+            raise ImportError('The zstandard package must be installed to use zstd cache compression')
+        return zstd.ZstdCompressor().stream_writer(fileobj)
+    else:
+        raise ValueError('unknown cache_compression "{}"'.format(compression))
+
+
+def open_decompressed_reader(fileobj):
+    """
+    Wrap a binary file object so that its bytes are decompressed as they are read.
+
+    The compression format is detected from the stream's leading magic bytes, so gzip, zstd,
+    zlib, and uncompressed json entries can all be read back regardless of the current settings.
+
+    Parameters
+    ----------
+    fileobj : file-like
+        binary file object containing a (possibly compressed) json response
+
+    Returns
+    -------
+    file-like
+        readable binary file object
+    """
+    magic = fileobj.read(4)
+    fileobj.seek(0)
+    if magic[:2] == GZIP_MAGIC:
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+    elif magic == ZSTD_MAGIC:
+        if zstd is None:
+            raise ImportError('The zstandard package must be installed to read zstd-compressed cache entries')
+        return zstd.ZstdDecompressor().stream_reader(fileobj)
+    elif magic[:1] == ZLIB_MAGIC:
+        return io.BytesIO(zlib.decompress(fileobj.read()))
+    else:
+        return fileobj
+
+
+def dump_response(response_json, fileobj, compression=None):
+    """
+    Serialize a response json object into a binary file object, one encoded chunk at a time.
+
+    The response is never held in memory as a single json string.
+
+    Parameters
+    ----------
+    response_json : dict
+        the json response
+    fileobj : file-like
+        binary file object to write to
+    compression : string
+        {None, 'gzip', 'zstd'} the compression format
+
+    Returns
+    -------
+    None
+    """
+    writer = open_compressed_writer(fileobj, compression)
+    for chunk in json.JSONEncoder().iterencode(response_json):
+        writer.write(chunk.encode('utf-8'))
+
+    # finish the compressed stream without closing the underlying file object
+    if compression == 'zstd':
+        writer.flush(zstd.FLUSH_FRAME)
+    elif writer is not fileobj:
+        writer.close()
+
+
+def load_response(fileobj):
+    """
+    Deserialize a (possibly compressed) response json object from a binary file object.
+
+    The json is parsed straight from the decompressing stream. If the ijson package is
+    installed, the decompressed text is never held in memory alongside the parsed object.
+
+    Parameters
+    ----------
+    fileobj : file-like
+        binary file object to read from
+
+    Returns
+    -------
+    dict
+    """
+    reader = open_decompressed_reader(fileobj)
+    if ijson is not None:
+        return next(ijson.items(reader, '', use_float=True))
+    return json.load(codecs.getreader('utf-8')(reader))
+
+
+def compress_response(response_json, compression=None):
+    """
+    Serialize a response json object to compressed bytes.
+
+    Parameters
+    ----------
+    response_json : dict
+        the json response
+    compression : string
+        {'gzip', 'zstd'} the compression format, if None, use globals.cache_compression or gzip if that is None
+
+    Returns
+    -------
+    bytes
+    """
+    if compression is None:
+        compression = globals.cache_compression or 'gzip'
+    buffer = io.BytesIO()
+    dump_response(response_json, buffer, compression=compression)
+    return buffer.getvalue()
+
+
+def decompress_response(data):
+    """
+    Deserialize compressed bytes back into a response json object.
+
+    Parameters
+    ----------
+    data : bytes
+        the compressed json response
+
+    Returns
+    -------
+    dict
+    """
+    return load_response(io.BytesIO(data))
+
+
+def get_cache_filename(url):
+    """
+    Find the path of an existing response file for this url in the cache folder.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+
+    Returns
+    -------
+    string or None
+    """
+    key = get_cache_key(url)
+    for extension in ['.json.zst', '.json.gz', '.json']:
+        cache_path_filename = '{}/{}{}'.format(globals.cache_folder, key, extension)
+        if os.path.isfile(cache_path_filename):
+            return cache_path_filename
+
+
+def is_cache_filename(filename):
+    """
+    Determine if a filename in the cache folder is a cached response file.
+
+    Parameters
+    ----------
+    filename : string
+        name of the file
+
+    Returns
+    -------
+    bool
+    """
+    return any(filename.endswith(extension) for extension in CACHE_FILE_EXTENSIONS.values())
+
+
+def folder_cache_put(url, response_json):
+    """
+    Save a response json object to its own (optionally compressed) json file in the cache folder.
+
+    If globals.cache_max_size or globals.cache_max_age is set, expired and least-recently
+    used responses are evicted after saving.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+    response_json : dict
+        the json response
+
+    Returns
+    -------
+    None
+    """
+    # create the folder on the disk if it doesn't already exist
+    if not os.path.exists(globals.cache_folder):
+        os.makedirs(globals.cache_folder)
+
+    # hash the url (to make filename shorter than the often extremely long url)
+    extension = CACHE_FILE_EXTENSIONS[globals.cache_compression]
+    cache_path_filename = '{}/{}{}'.format(globals.cache_folder, get_cache_key(url), extension)
+
+    # stream the json into the (compressed) file, then remove any copy of this response saved with a different compression
+    with open(cache_path_filename, 'wb') as cache_file:
+        dump_response(response_json, cache_file, compression=globals.cache_compression)
+    for other_extension in CACHE_FILE_EXTENSIONS.values():
+        other_path_filename = '{}/{}{}'.format(globals.cache_folder, get_cache_key(url), other_extension)
+        if not other_extension == extension and os.path.isfile(other_path_filename):
+            os.remove(other_path_filename)
+
+    log('Saved response to cache file "{}"'.format(cache_path_filename))
+    if globals.cache_max_size is not None or globals.cache_max_age is not None:
+        prune_folder_cache(max_size=globals.cache_max_size, max_age=globals.cache_max_age)
+
+
+def is_expired_cache_file(cache_path_filename):
+    """
+    Delete a cache file if it is older than globals.cache_max_age.
+
+    Parameters
+    ----------
+    cache_path_filename : string
+        path of the cached response file
+
+    Returns
+    -------
+    bool
+        True if the file had expired and was deleted
+    """
+    if globals.cache_max_age is not None and time.time() - os.path.getmtime(cache_path_filename) > globals.cache_max_age:
+        os.remove(cache_path_filename)
+        cache_stats['evictions'] += 1
+        return True
+    return False
+
+
+def touch_cache_file(cache_path_filename):
+    """
+    Record that a cache file was just used, by setting its access time to now.
+
+    The modification time is kept, as it records when the response was saved (see
+    is_expired_cache_file), so size-based eviction removes least-recently used files first.
+
+    Parameters
+    ----------
+    cache_path_filename : string
+        path of the cached response file
+
+    Returns
+    -------
+    None
+    """
+    os.utime(cache_path_filename, (time.time(), os.path.getmtime(cache_path_filename)))
+
+
+def folder_cache_get(url):
+    """
+    Retrieve a response json object from its json file in the cache folder.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+
+    Returns
+    -------
+    response_json : dict or None
+    """
+    # open the cache file for this url hash if it already exists, otherwise return None
+    cache_path_filename = get_cache_filename(url)
+    if cache_path_filename is not None and not is_expired_cache_file(cache_path_filename):
+        touch_cache_file(cache_path_filename)
+        with open(cache_path_filename, 'rb') as cache_file:
+            response_json = load_response(cache_file)
+        log('Retrieved response from cache file "{}" for URL "{}"'.format(cache_path_filename, url))
+        return response_json
+
+
+def iter_cache_elements(url, element_types=None):
+    """
+    Iterate over the elements of an Overpass response in the cache without loading the whole response.
+
+    If the ijson package is installed, elements are decoded one at a time straight from the
+    (decompressing) file stream, so the full json tree is never held in memory. Otherwise this
+    falls back to loading the whole response and iterating over its elements. The elements can
+    be passed directly to core.parse_osm_nodes_paths or core.create_graph. Expired responses are
+    not streamed, and lookups count towards the cache stats and least-recently used eviction
+    just as core.get_from_cache does.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+    element_types : list
+        only yield elements of these OSM types (e.g., ['node', 'way']), if None, yield all elements
+
+    Returns
+    -------
+    generator
+        yields element dicts, or yields nothing if the url is not in the cache
+    """
+    if globals.cache_backend == 'folder':
+        cache_path_filename = get_cache_filename(url)
+        if cache_path_filename is None or is_expired_cache_file(cache_path_filename):
+            cache_stats['misses'] += 1
+            return
+        touch_cache_file(cache_path_filename)
+        fileobj = open(cache_path_filename, 'rb')
+    elif globals.cache_backend == 'sqlite':
+        data = sqlite_cache_get_data(url)
+        if data is None:
+            cache_stats['misses'] += 1
+            return
+        fileobj = io.BytesIO(data)
+    else:
+        raise ValueError('cannot stream from cache_backend "{}"'.format(globals.cache_backend))
+    cache_stats['hits'] += 1
+
+    with fileobj:
+        reader = open_decompressed_reader(fileobj)
+        if ijson is not None:
+            # decode non-integer numbers as floats, as load_response does, rather than ijson's default decimals
+            elements = ijson.items(reader, 'elements.item', use_float=True)
+        else:
+            elements = json.load(codecs.getreader('utf-8')(reader))['elements']
+
+        for element in elements:
+            if element_types is None or element['type'] in element_types:
+                yield element
+
+
+def sqlite_cache_put(url, response_json):
+    """
+    Save a compressed response json object to the sqlite cache database.
+
+    If globals.cache_max_size or globals.cache_max_age is set, expired and least-recently
+    used responses are evicted after saving.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+    response_json : dict
+        the json response
+
+    Returns
+    -------
+    None
+    """
+    data = compress_response(response_json)
+    now = time.time()
+
+    conn = connect_cache_db()
+    try:
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO responses (key, url, data, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                         (get_cache_key(url), url, sqlite3.Binary(data), len(data), now, now))
+        log('Saved {:,.1f}KB compressed response to cache database "{}"'.format(len(data) / 1000., get_cache_db_path()))
+
+        if globals.cache_max_size is not None or globals.cache_max_age is not None:
+            prune_sqlite_cache(conn, max_size=globals.cache_max_size, max_age=globals.cache_max_age)
+    finally:
+        conn.close()
+
+
+def sqlite_cache_get_data(url):
+    """
+    Retrieve a compressed response from the sqlite cache database, deleting it instead if it has expired.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+
+    Returns
+    -------
+    bytes or None
+    """
+    key = get_cache_key(url)
+    conn = connect_cache_db()
+    try:
+        row = conn.execute('SELECT data, created FROM responses WHERE key=?', (key,)).fetchone()
+        if row is None:
+            return None
+
+        data, created = row
+        now = time.time()
+        with conn:
+            if globals.cache_max_age is not None and now - created > globals.cache_max_age:
+                # the response has expired: delete it and treat this as a miss
+                conn.execute('DELETE FROM responses WHERE key=?', (key,))
+                cache_stats['evictions'] += 1
+                return None
+
+            # record the access time so size-based eviction removes least-recently used responses first
+            conn.execute('UPDATE responses SET accessed=? WHERE key=?', (now, key))
+    finally:
+        conn.close()
+
+    log('Retrieved response from cache database "{}" for URL "{}"'.format(get_cache_db_path(), url))
+    return bytes(data)
+
+
+def sqlite_cache_get(url):
+    """
+    Retrieve a response json object from the sqlite cache database.
+
+    Parameters
+    ----------
+    url : string
+        the url of the request
+
+    Returns
+    -------
+    response_json : dict or None
+    """
+    data = sqlite_cache_get_data(url)
+    if data is not None:
+        return decompress_response(data)
+
+
+# the available cache backends, as name:(get function, put function)
+cache_backends = {'folder':(folder_cache_get, folder_cache_put),
+                  'sqlite':(sqlite_cache_get, sqlite_cache_put)}
+
+
+def register_cache_backend(name, get_function, put_function):
+    """
+    Register a custom cache backend, to be selected with utils.config(cache_backend=name).
+
+    Parameters
+    ----------
+    name : string
+        the name of the backend
+    get_function : function
+        function accepting a URL and returning the cached response json, or None if it is not cached
+    put_function : function
+        function accepting a URL and a response json, which saves the response to the cache
+
+    Returns
+    -------
+    None
+    """
+    cache_backends[name] = (get_function, put_function)
+
+
+def get_cache_backend(name=None):
+    """
+    Look up the get and put functions of a cache backend.
+
+    Parameters
+    ----------
+    name : string
+        the name of the backend, if None, use globals.cache_backend
+
+    Returns
+    -------
+    tuple
+        (get_function, put_function)
+    """
+    if name is None:
+        name = globals.cache_backend
+    if name not in cache_backends:
+        raise ValueError('unknown cache_backend "{}"'.format(name))
+    return cache_backends[name]
+
+
+def prune_sqlite_cache(conn, max_size=None, max_age=None):
+    """
+    Evict expired and least-recently used responses from an open sqlite cache database.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        connection to the cache database
+    max_size : int
+        evict least-recently used responses until the total compressed size is at most this many bytes
+    max_age : numeric
+        evict responses saved more than this many seconds ago
+
+    Returns
+    -------
+    int
+        the number of evicted responses
+    """
+    evicted = 0
+    with conn:
+        if max_age is not None:
+            cursor = conn.execute('DELETE FROM responses WHERE created < ?', (time.time() - max_age,))
+            evicted += cursor.rowcount
+
+        if max_size is not None:
+            total_size = conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total_size > max_size:
+                # walk the responses from least to most recently accessed, deleting until we are under the limit
+                keys_to_delete = []
+                for key, size in conn.execute('SELECT key, size FROM responses ORDER BY accessed ASC'):
+                    if total_size <= max_size:
+                        break
+                    keys_to_delete.append((key,))
+                    total_size -= size
+                conn.executemany('DELETE FROM responses WHERE key=?', keys_to_delete)
+                evicted += len(keys_to_delete)
+
+    cache_stats['evictions'] += evicted
+    if evicted > 0:
+        log('Evicted {:,} responses from cache database'.format(evicted))
+    return evicted
+
+
+def prune_folder_cache(max_size=None, max_age=None):
+    """
+    Evict expired and least-recently used response files from the cache folder.
+
+    Files are expired by their modification time, when they were saved, and evicted by size
+    from the least recent access time first (see touch_cache_file).
+
+    Parameters
+    ----------
+    max_size : int
+        evict least-recently used files until the total size is at most this many bytes
+    max_age : numeric
+        evict files saved more than this many seconds ago
+
+    Returns
+    -------
+    int
+        the number of evicted responses
+    """
+    if not os.path.exists(globals.cache_folder):
+        return 0
+
+    # get the (access time, size, path) of every cached response file, deleting the expired ones
+    evicted = 0
+    files = []
+    now = time.time()
+    for filename in os.listdir(globals.cache_folder):
+        if is_cache_filename(filename):
+            path = os.path.join(globals.cache_folder, filename)
+            stat = os.stat(path)
+            if max_age is not None and now - stat.st_mtime > max_age:
+                os.remove(path)
+                evicted += 1
+            else:
+                files.append((stat.st_atime, stat.st_size, path))
+
+    # walk the files from least to most recently accessed, deleting until we are under the limit
+    if max_size is not None:
+        files.sort()
+        total_size = sum(size for _, size, _ in files)
+        for atime, size, path in files:
+            if total_size <= max_size:
+                break
+            os.remove(path)
+            total_size -= size
+            evicted += 1
+
+    cache_stats['evictions'] += evicted
+    if evicted > 0:
+        log('Evicted {:,} responses from cache folder "{}"'.format(evicted, globals.cache_folder))
+    return evicted
+
+
+def prune_cache(max_size=None, max_age=None):
+    """
+    Evict responses from the configured cache backend by size and/or age.
+
+    Parameters
+    ----------
+    max_size : int
+        evict least-recently used responses until the cache is at most this many bytes,
+        if None, use globals.cache_max_size
+    max_age : numeric
+        evict responses saved more than this many seconds ago, if None, use globals.cache_max_age
+
+    Returns
+    -------
+    int
+        the number of evicted responses
+    """
+    if max_size is None:
+        max_size = globals.cache_max_size
+    if max_age is None:
+        max_age = globals.cache_max_age
+
+    if globals.cache_backend == 'sqlite':
+        conn = connect_cache_db()
+        try:
+            return prune_sqlite_cache(conn, max_size=max_size, max_age=max_age)
+        finally:
+            conn.close()
+    elif globals.cache_backend == 'folder':
+        return prune_folder_cache(max_size=max_size, max_age=max_age)
+    else:
+        raise ValueError('cannot prune cache_backend "{}"'.format(globals.cache_backend))
+
+
+def get_cache_stats():
+    """
+    Get the cache hit, miss, save, and eviction counts, plus the size of the configured cache.
+
+    Returns
+    -------
+    stats : dict
+        the counts, plus 'entries' (number of cached responses) and 'size' (total bytes on disk)
+    """
+    stats = dict(cache_stats)
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_rate'] = stats['hits'] / float(lookups) if lookups > 0 else None
+
+    if globals.cache_backend == 'sqlite' and os.path.exists(get_cache_db_path()):
+        conn = connect_cache_db()
+        try:
+            stats['entries'], stats['size'] = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        finally:
+            conn.close()
+    elif globals.cache_backend == 'folder' and os.path.exists(globals.cache_folder):
+        paths = [os.path.join(globals.cache_folder, f) for f in os.listdir(globals.cache_folder) if is_cache_filename(f)]
+        stats['entries'] = len(paths)
+        stats['size'] = sum(os.path.getsize(path) for path in paths)
+
+    return stats
+
+
+def reset_cache_stats():
+    """
+    Reset the cache hit, miss, save, and eviction counts to zero.
+
+    Returns
+    -------
+    None
+    """
+    for key in cache_stats:
+        cache_stats[key] = 0
+
+
+def migrate_cache_folder(folder=None, db_path=None, remove_files=False):
+    """
+    Move the responses in a folder cache of {md5}.json (or .json.gz, .json.zst) files into the sqlite cache database.
+
+    The files' md5 names are the request URLs' cache keys, so the migrated responses are found
+    by the same requests that saved them.
+
+    Parameters
+    ----------
+    folder : string
+        the folder of json response files, if None, use globals.cache_folder
+    db_path : string
+        path of the database file, if None, use the default path in the cache folder
+    remove_files : bool
+        if True, delete each json file once it has been migrated
+
+    Returns
+    -------
+    int
+        the number of migrated responses
+    """
+    start_time = time.time()
+    if folder is None:
+        folder = globals.cache_folder
+
+    conn = connect_cache_db(db_path)
+    migrated = 0
+    try:
+        for filename in sorted(os.listdir(folder)):
+            if not is_cache_filename(filename):
+                continue
+
+            key = filename.split('.')[0]
+            path = os.path.join(folder, filename)
+            try:
+                with open(path, 'rb') as cache_file:
+                    response_json = load_response(cache_file)
+            except (ValueError, IOError):
+                log('Could not parse cache file "{}", skipping it'.format(path), level=lg.WARNING)
+                continue
+
+            data = compress_response(response_json)
+            mtime = os.path.getmtime(path)
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO responses (key, url, data, size, created, accessed) VALUES (?, ?, ?, ?, ?, ?)',
+                             (key, None, sqlite3.Binary(data), len(data), mtime, mtime))
+            migrated += 1
+            if remove_files:
+                os.remove(path)
+    finally:
+        conn.close()
+
+    log('Migrated {:,} responses from cache folder "{}" to cache database in {:,.2f} seconds'.format(migrated, folder, time.time()-start_time))
+    return migrated
@@ -0,0 +1,429 @@
+###################################################################################################
+# Module: compact.py
+# Description: Store street networks compactly in arrays, and convert them to/from networkx graphs
+# License: MIT, see full license in LICENSE.txt
+# Web: https://github.com/gboeing/osmnx
+###################################################################################################
+
+import copy
+import time
+import numpy as np
+import networkx as nx
+from shapely.geometry import LineString
+
+from .utils import log, get_node_id_array, get_largest_component
+
+# scipy is only needed to find connected components of compact graphs without converting them
+try:
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+except ImportError as e:
+    connected_components = None
+
+
+class CompactGraph(object):
+    """
+    A street network stored in arrays instead of networkx's dicts of dicts.
+
+    The edges are stored as a CSR (compressed sparse row) adjacency: the edges leaving the node in
+    row i are edges indptr[i] to indptr[i+1], going to the nodes in rows targets[indptr[i]:indptr[i+1]],
+    with the multigraph keys in keys. Node and edge attributes are stored as typed columns, one per
+    attribute, each a dict with a 'kind' and a boolean 'mask' of which nodes or edges have the attribute:
+
+    - 'bool', 'int' or 'float' columns hold a numpy array of 'values'
+    - 'category' columns (strings, such as highway tags) hold integer 'codes' into a list of unique 'categories'
+    - 'geometry' columns (LineStrings, such as edge geometries) hold all the 'coords' in one array,
+      geometry i's from 'offsets'[i] to 'offsets'[i+1]
+    - 'object' columns hold any other values (such as lists) in an object array of 'values'
+
+    Convert graphs with graph_to_compact and back with compact_to_graph, which round-trip losslessly.
+
+    Parameters
+    ----------
+    node_ids : numpy array
+        the id of the node in each row
+    indptr : numpy array
+        the position of each row's first edge, plus the number of edges at the end
+    targets : numpy array
+        the row of each edge's destination node
+    keys : numpy array
+        the key of each edge
+    node_columns : dict
+        the node attribute columns, keyed by attribute name
+    edge_columns : dict
+        the edge attribute columns, keyed by attribute name
+    graph : dict
+        the graph's attributes, such as its name and crs
+    """
+
+    def __init__(self, node_ids, indptr, targets, keys, node_columns=None, edge_columns=None, graph=None):
+        self.node_ids = node_ids
+        self.indptr = indptr
+        self.targets = targets
+        self.keys = keys
+        self.node_columns = node_columns if node_columns is not None else {}
+        self.edge_columns = edge_columns if edge_columns is not None else {}
+        self.graph = graph if graph is not None else {}
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    def __repr__(self):
+        return 'CompactGraph with {:,} nodes and {:,} edges'.format(self.number_of_nodes(), self.number_of_edges())
+
+    def number_of_nodes(self):
+        return len(self.node_ids)
+
+    def number_of_edges(self):
+        return len(self.targets)
+
+    def sources(self):
+        """
+        Return the row of each edge's origin node.
+        """
+        return np.repeat(np.arange(len(self.node_ids)), np.diff(self.indptr))
+
+    def node_values(self, name):
+        """
+        Return a node attribute's values as an array, with NaN (or None) where nodes do not have it.
+        """
+        return get_column_array(self.node_columns[name])
+
+    def edge_values(self, name):
+        """
+        Return an edge attribute's values as an array, with NaN (or None) where edges do not have it.
+        """
+        return get_column_array(self.edge_columns[name])
+
+    def copy(self):
+        """
+        Return a copy of the graph, sharing no arrays, category lists, mutable values or graph attributes with it.
+        """
+        C = self.subgraph(np.ones(len(self.node_ids), dtype=bool))
+        for column in list(C.node_columns.values()) + list(C.edge_columns.values()):
+            if column['kind'] == 'category':
+                column['categories'] = list(column['categories'])
+            elif column['kind'] == 'object':
+                column['values'] = copy.deepcopy(column['values'])
+        C.graph = copy.deepcopy(self.graph)
+        return C
+
+    def subgraph(self, node_mask):
+        """
+        Return the graph induced by some of its nodes: those nodes and all the edges between them.
+
+        Parameters
+        ----------
+        node_mask : numpy array
+            a boolean array of which nodes (by row) to keep
+
+        Returns
+        -------
+        CompactGraph
+        """
+        node_mask = np.asarray(node_mask, dtype=bool)
+        new_rows = np.cumsum(node_mask) - 1
+        edge_mask = node_mask[self.sources()] & node_mask[self.targets]
+        edge_index = np.flatnonzero(edge_mask)
+        node_index = np.flatnonzero(node_mask)
+        edge_counts = np.bincount(self.sources()[edge_index], minlength=len(self.node_ids))[node_index]
+        indptr = np.concatenate([[0], np.cumsum(edge_counts)]).astype(np.int64)
+        return CompactGraph(node_ids=self.node_ids[node_index],
+                            indptr=indptr,
+                            targets=new_rows[self.targets[edge_index]],
+                            keys=self.keys[edge_index],
+                            node_columns={name:take_column(column, node_index) for name, column in self.node_columns.items()},
+                            edge_columns={name:take_column(column, edge_index) for name, column in self.edge_columns.items()},
+                            graph=dict(self.graph))
+
+
+def make_column(values):
+    """
+    Store a list of attribute values in the most compact column type that holds them all losslessly.
+
+    Parameters
+    ----------
+    values : list
+        the values, with None where there is no value
+
+    Returns
+    -------
+    dict
+        the column (see CompactGraph)
+    """
+
+    mask = np.array([value is not None for value in values], dtype=bool)
+    present = [value for value in values if value is not None]
+    types = set(type(value) for value in present)
+
+    if types == set([bool]):
+        return {'kind':'bool', 'mask':mask, 'values':np.array([bool(value) for value in values], dtype=bool)}
+
+    if len(types) > 0 and all(issubclass(value_type, (int, np.integer)) and not issubclass(value_type, (bool, np.bool_))
+                              for value_type in types):
+        try:
+            return {'kind':'int', 'mask':mask, 'values':np.array([value if value is not None else 0 for value in values], dtype=np.int64)}
+        except OverflowError:
+            pass
+
+    if types == set([float]) or types == set([np.float64]):
+        return {'kind':'float', 'mask':mask, 'values':np.array([value if value is not None else np.nan for value in values], dtype=np.float64)}
+
+    if types == set([str]):
+        # intern each unique string once, in the order they appear
+        categories = []
+        category_codes = {}
+        codes = np.full(len(values), -1, dtype=np.int32)
+        for position, value in enumerate(values):
+            if value is not None:
+                if not value in category_codes:
+                    category_codes[value] = len(categories)
+                    categories.append(value)
+                codes[position] = category_codes[value]
+        return {'kind':'category', 'mask':mask, 'codes':codes, 'categories':categories}
+
+    if types == set([LineString]) and not any(value.has_z for value in present):
+        counts = np.array([len(value.coords) if value is not None else 0 for value in values], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        coords = np.array([xy for value in present for xy in value.coords], dtype=np.float64).reshape(-1, 2)
+        return {'kind':'geometry', 'mask':mask, 'coords':coords, 'offsets':offsets}
+
+    object_values = np.empty(len(values), dtype=object)
+    for position, value in enumerate(values):
+        object_values[position] = value
+    return {'kind':'object', 'mask':mask, 'values':object_values}
+
+
+def make_float_column(values, mask=None):
+    """
+    Make a float column from an array of values.
+
+    Parameters
+    ----------
+    values : numpy array
+    mask : numpy array
+        which values are present, if None, all of them
+
+    Returns
+    -------
+    dict
+    """
+    mask = np.ones(len(values), dtype=bool) if mask is None else mask
+    return {'kind':'float', 'mask':mask, 'values':np.asarray(values, dtype=np.float64)}
+
+
+def take_column(column, index):
+    """
+    Select some rows of a column.
+
+    Parameters
+    ----------
+    column : dict
+    index : numpy array
+        the positions of the rows to select, in order
+
+    Returns
+    -------
+    dict
+    """
+
+    taken = {'kind':column['kind'], 'mask':column['mask'][index]}
+    if column['kind'] == 'category':
+        taken['codes'] = column['codes'][index]
+        taken['categories'] = column['categories']
+    elif column['kind'] == 'geometry':
+        starts = column['offsets'][index]
+        counts = column['offsets'][index + 1] - starts
+        taken['offsets'] = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        coord_index = np.repeat(starts - taken['offsets'][:-1], counts) + np.arange(counts.sum())
+        taken['coords'] = column['coords'][coord_index]
+    else:
+        taken['values'] = column['values'][index]
+    return taken
+
+
+def get_column_array(column):
+    """
+    Get a column's values as an array, with NaN (for numbers) or None where there is no value.
+
+    Parameters
+    ----------
+    column : dict
+
+    Returns
+    -------
+    numpy array
+    """
+
+    if column['kind'] in ['int', 'bool', 'float']:
+        if column['mask'].all():
+            return column['values']
+        values = column['values'].astype(np.float64) if column['kind'] == 'float' else column['values'].astype(object)
+        values[~column['mask']] = np.nan if column['kind'] == 'float' else None
+        return values
+    return np.array(get_column_list(column), dtype=object)
+
+
+def get_column_list(column):
+    """
+    Get a column's values as a list of python objects, with None where there is no value.
+
+    Parameters
+    ----------
+    column : dict
+
+    Returns
+    -------
+    list
+    """
+
+    mask = column['mask'].tolist()
+    if column['kind'] == 'category':
+        categories = column['categories']
+        values = [categories[code] for code in column['codes'].tolist()]
+    elif column['kind'] == 'geometry':
+        offsets = column['offsets'].tolist()
+        coords = column['coords']
+        values = [LineString(coords[start:end]) if present else None
+                  for start, end, present in zip(offsets[:-1], offsets[1:], mask)]
+    elif column['kind'] == 'object':
+        values = list(column['values'])
+    else:
+        values = column['values'].tolist()
+    return [value if present else None for value, present in zip(values, mask)]
+
+
+def make_columns(records):
+    """
+    Store a list of attribute dicts as columns.
+
+    Parameters
+    ----------
+    records : list
+        one dict of attributes per node or edge
+
+    Returns
+    -------
+    dict
+        the columns, keyed by attribute name, in the order the attributes first appear
+    """
+
+    names = []
+    seen = set()
+    for record in records:
+        for name in record:
+            if not name in seen:
+                seen.add(name)
+                names.append(name)
+    return {name:make_column([record.get(name) for record in records]) for name in names}
+
+
+def graph_to_compact(G):
+    """
+    Convert a networkx multidigraph into a CompactGraph.
+
+    Parameters
+    ----------
+    G : networkx multidigraph
+
+    Returns
+    -------
+    CompactGraph
+    """
+
+    start_time = time.time()
+    nodes = G.nodes()
+    node_rows = {node:row for row, node in enumerate(nodes)}
+
+    # walk each node's outgoing edges in order, so rows of the adjacency are contiguous
+    edge_counts = np.zeros(len(nodes), dtype=np.int64)
+    targets = []
+    keys = []
+    edge_records = []
+    for row, node in enumerate(nodes):
+        for v, keydict in G.succ[node].items():
+            v_row = node_rows[v]
+            for key, data in keydict.items():
+                targets.append(v_row)
+                keys.append(key)
+                edge_records.append(data)
+            edge_counts[row] += len(keydict)
+
+    C = CompactGraph(node_ids=get_node_id_array(nodes),
+                     indptr=np.concatenate([[0], np.cumsum(edge_counts)]).astype(np.int64),
+                     targets=np.array(targets, dtype=np.int64),
+                     keys=get_node_id_array(keys),
+                     node_columns=make_columns([G.node[node] for node in nodes]),
+                     edge_columns=make_columns(edge_records),
+                     graph=dict(G.graph))
+    log('Converted graph to compact graph with {:,} nodes and {:,} edges in {:,.2f} seconds'.format(len(C), C.number_of_edges(), time.time()-start_time))
+    return C
+
+
+def compact_to_graph(C):
+    """
+    Convert a CompactGraph into a networkx multidigraph.
+
+    Parameters
+    ----------
+    C : CompactGraph
+
+    Returns
+    -------
+    networkx multidigraph
+    """
+
+    start_time = time.time()
+    G = nx.MultiDiGraph()
+    G.graph.update(C.graph)
+
+    node_ids = C.node_ids.tolist()
+    node_records = [{} for node in node_ids]
+    for name, column in C.node_columns.items():
+        for record, value, present in zip(node_records, get_column_list(column), column['mask'].tolist()):
+            if present:
+                record[name] = value
+    G.add_nodes_from(zip(node_ids, node_records))
+
+    edge_records = [{} for key in C.keys]
+    for name, column in C.edge_columns.items():
+        for record, value, present in zip(edge_records, get_column_list(column), column['mask'].tolist()):
+            if present:
+                record[name] = value
+    sources = [node_ids[row] for row in C.sources().tolist()]
+    targets = [node_ids[row] for row in C.targets.tolist()]
+    G.add_edges_from(zip(sources, targets, C.keys.tolist(), edge_records))
+
+    log('Converted compact graph to graph with {:,} nodes and {:,} edges in {:,.2f} seconds'.format(len(G), G.number_of_edges(), time.time()-start_time))
+    return G
+
+
+def get_largest_compact_component(C, strongly=False):
+    """
+    Return the largest weakly or strongly connected component of a CompactGraph.
+    
+    Parameters
+    ----------
+    C : CompactGraph
+    strongly : bool
+        if True, return the largest strongly instead of weakly connected component
+    
+    Returns
+    -------
+    CompactGraph
+    """
+
+    start_time = time.time()
+    if connected_components is None:
+        # without scipy, find the component in the equivalent networkx graph
+        component = get_largest_component(compact_to_graph(C), strongly=strongly)
+        node_mask = np.isin(C.node_ids, get_node_id_array(component.nodes()))
+    else:
+        adjacency = coo_matrix((np.ones(C.number_of_edges(), dtype=np.int8), (C.sources(), C.targets)), shape=(len(C), len(C)))
+        component_count, labels = connected_components(adjacency, directed=True, connection='strong' if strongly else 'weak')
+        node_mask = labels == np.argmax(np.bincount(labels)) if len(C) > 0 else np.zeros(0, dtype=bool)
+
+    if node_mask.all():
+        return C
+    log('Graph was not connected, retained only the largest {} connected component ({:,} of {:,} total nodes) in {:.2f} seconds'.format('strongly' if strongly else 'weakly', int(node_mask.sum()), len(C), time.time()-start_time))
+    return C.subgraph(node_mask)
@@ -8,10 +8,8 @@
 import math
 import re
 import time
-import json
-import io
-import os
-import hashlib
+import copy
+import random
 import datetime as dt
 import logging as lg
 import requests
@@ -19,18 +17,41 @@ import numpy as np
 import pandas as pd
 import geopandas as gpd
 import networkx as nx
+import shapely
 
 from collections import OrderedDict
 from itertools import groupby
+from threading import Lock, Condition
+from email.utils import parsedate_tz, mktime_tz
+from multiprocessing.pool import ThreadPool
 from dateutil import parser as date_parser
+from urllib3.exceptions import NewConnectionError
 from shapely.geometry import Point, LineString, Polygon, MultiPolygon
 from shapely.ops import unary_union
+from shapely.prepared import prep
+
+# shapely's vectorized point-in-polygon tests are compiled, and may not be available
+try:
+    from shapely import vectorized as shapely_vectorized
+except ImportError as e:
+    shapely_vectorized = None
 
 from . import globals
-from .utils import log, make_str, get_largest_component, great_circle_vec, get_nearest_node, geocode
+from .utils import log, make_str, copy_attributes, get_largest_component, great_circle_vec, get_nearest_node, geocode, request_endpoint
+from .cache import get_cache_backend, cache_stats
 from .simplify import simplify_graph
 from .projection import project_geometry, project_gdf
 from .stats import count_streets_per_node
+from .compact import CompactGraph, graph_to_compact, compact_to_graph, make_float_column, get_largest_compact_component
+
+
+# running counts and timings of the requests sent to each API, see get_request_metrics
+request_metrics = {}
+request_metrics_lock = Lock()
+
+# the Overpass API slot scheduler's state (see acquire_overpass_slot), and the condition guarding it
+overpass_slots_state = {}
+overpass_slots = Condition()
 
 
 def save_to_cache(url, response_json):
@@ -58,20 +79,10 @@ def save_to_cache(url, response_json):
         if response_json is None:
             log('Saved nothing to cache because response_json is None')
         else:        
-            # create the folder on the disk if it doesn't already exist
-            if not os.path.exists(globals.cache_folder):
-                os.makedirs(globals.cache_folder)
-
-            # hash the url (to make filename shorter than the often extremely long url) 
-            filename = hashlib.md5(url.encode('utf-8')).hexdigest()
-            cache_path_filename = '{}/{}.json'.format(globals.cache_folder, filename)
-            
-            # dump to json, and save to file
-            json_str = make_str(json.dumps(response_json))
-            with io.open(cache_path_filename, 'w', encoding='utf-8') as cache_file:
-                cache_file.write(json_str)
-            
-            log('Saved response to cache file "{}"'.format(cache_path_filename))
+            # save the response with whichever cache backend is configured
+            _, put_function = get_cache_backend()
+            put_function(url, response_json)
+            cache_stats['saves'] += 1
         
 
 def get_from_cache(url):
@@ -89,14 +100,14 @@ def get_from_cache(url):
     """
     # if the tool is configured to use the cache
     if globals.use_cache:
-        # determine the filename by hashing the url
-        filename = hashlib.md5(url.encode('utf-8')).hexdigest()
-        cache_path_filename = '{}/{}.json'.format(globals.cache_folder, filename)
-        # open the cache file for this url hash if it already exists, otherwise return None
-        if os.path.isfile(cache_path_filename):
-            response_json = json.load(io.open(cache_path_filename, encoding='utf-8'))
-            log('Retrieved response from cache file "{}" for URL "{}"'.format(cache_path_filename, url))
-            return response_json        
+        # look up the response with whichever cache backend is configured, returns None if it is not cached
+        get_function, _ = get_cache_backend()
+        response_json = get_function(url)
+        if response_json is None:
+            cache_stats['misses'] += 1
+        else:
+            cache_stats['hits'] += 1
+        return response_json
 
 
 def get_pause_duration(recursive_delay=5, default_duration=10):
@@ -106,7 +117,7 @@ def get_pause_duration(recursive_delay=5, default_duration=10):
     Parameters
     ----------
     recursive_delay : int
-        how long to wait between recursive calls if server is currently running a query
+        how long to wait before checking the status again if server is currently running a query
     default_duration : int
         if fatal error, function falls back on returning this value
     
@@ -114,41 +125,478 @@ def get_pause_duration(recursive_delay=5, default_duration=10):
     -------
     int
     """
+    # check the status up to retry_max_attempts times while the server reports it is currently running a query
+    for attempt in range(globals.retry_max_attempts):
+        try:
+            response = request_endpoint('overpass', 'status')
+            status = response.text.split('\n')[3]
+            status_first_token = status.split(' ')[0]
+        except:
+            # if we cannot reach the status endpoint or parse its output, log an error and return default duration
+            log('Unable to query the Overpass API status endpoint', level=lg.ERROR)
+            return default_duration
+
+        try:
+            # if first token is numeric, it's how many slots you have available - no wait required
+            available_slots = int(status_first_token)
+            return 0
+        except:
+            # if first token is 'Slot', it tells you when your slot will be free
+            if status_first_token == 'Slot':
+                utc_time_str = status.split(' ')[3]
+                utc_time = date_parser.parse(utc_time_str).replace(tzinfo=None)
+                pause_duration = math.ceil((utc_time - dt.datetime.utcnow()).total_seconds())
+                return max(pause_duration, 1)
+
+            # if first token is 'Currently', it is currently running a query so check back in recursive_delay seconds
+            elif status_first_token == 'Currently':
+                time.sleep(recursive_delay)
+                record_request_metrics('overpass', pause_time=recursive_delay)
+
+            else:
+                # any other status is unrecognized - log an error and return default duration
+                log('Unrecognized server status: "{}"'.format(status), level=lg.ERROR)
+                return default_duration
+    
+    log('Overpass API server was still running a query after {} status checks'.format(globals.retry_max_attempts), level=lg.WARNING)
+    return default_duration
+
+
+def parse_overpass_status(status_text):
+    """
+    Parse the text of the Overpass API status endpoint into the state of our query slots.
+    
+    Parameters
+    ----------
+    status_text : string
+        the text returned by the /status endpoint
+    
+    Returns
+    -------
+    dict
+        'rate_limit' (number of slots, 0 means unlimited), 'available' (number of slots free now), 
+        'release_times' (list of seconds from now until each busy slot is free), and 'running' 
+        (number of our queries the server is currently running)
+    """
+    status = {'rate_limit':None, 'available':0, 'release_times':[], 'running':0}
+    running_section = False
+    for line in status_text.split('\n'):
+        line = line.strip()
+        if line.startswith('Rate limit:'):
+            status['rate_limit'] = int(line.split(':')[1])
+        elif line.endswith('slots available now.') or line.endswith('slot available now.'):
+            status['available'] = int(line.split(' ')[0])
+        elif line.startswith('Slot available after:'):
+            # eg "Slot available after: 2017-03-20T14:09:28Z, in 12 seconds."
+            match = re.search(r'in (-?\d+) seconds', line)
+            status['release_times'].append(max(int(match.group(1)), 0) if match else 0)
+        elif line.startswith('Currently running queries'):
+            running_section = True
+        elif running_section and len(line) > 0:
+            status['running'] += 1
+    
+    if status['rate_limit'] is None:
+        raise ValueError('Unrecognized server status: "{}"'.format(status_text))
+    return status
+
+
+def get_overpass_slots_state(endpoint):
+    """
+    Get the slot scheduler's state for an Overpass API endpoint, creating it if it does not exist yet.
+    
+    Must be called while holding the overpass_slots condition. A new state has no slots 
+    and has already expired, so the first caller to acquire a slot syncs it from the server.
+    
+    Parameters
+    ----------
+    endpoint : string
+        base URL of the Overpass API endpoint
+    
+    Returns
+    -------
+    dict
+    """
+    if not endpoint in overpass_slots_state:
+        overpass_slots_state[endpoint] = {'rate_limit':None, 'free_at':[], 'held':0, 'synced':None, 
+                                          'expires':0, 'syncing':False}
+    return overpass_slots_state[endpoint]
+
+
+def sync_overpass_slots(endpoint):
+    """
+    Query an Overpass API endpoint's status once and reset the slot scheduler's state for it.
+    
+    Slots held by our in-flight queries stay held. A successful sync is then tracked locally 
+    until the server rejects a query. If the status cannot be fetched or parsed, the scheduler 
+    falls back to a single slot and syncs again after globals.overpass_status_ttl seconds.
+    
+    Parameters
+    ----------
+    endpoint : string
+        base URL of the Overpass API endpoint
+    
+    Returns
+    -------
+    dict
+        the scheduler state for the endpoint
+    """
+    now = time.time()
+    try:
+        response = request_endpoint('overpass', 'status', endpoint=endpoint)
+        status = parse_overpass_status(response.text)
+        rate_limit = status['rate_limit']
+        free_at = [now] * status['available'] + [now + t for t in sorted(status['release_times'])]
+        expires = None
+    except Exception as e:
+        log('Unable to get Overpass API status from {}, assuming a single slot: {}'.format(endpoint, e), level=lg.ERROR)
+        rate_limit = 1
+        free_at = [now]
+        expires = now + globals.overpass_status_ttl
+    
+    with overpass_slots:
+        state = get_overpass_slots_state(endpoint)
+        # the slots our in-flight queries hold show up as running queries, not as free slots
+        free_at = sorted(free_at)[:max(rate_limit - state['held'], 0)]
+        state.update({'rate_limit':rate_limit, 'free_at':free_at, 'synced':now, 'expires':expires, 'syncing':False})
+        overpass_slots.notify_all()
+        log('Synced Overpass API slots of {}: rate limit {}, {} slots free or freeing up'.format(endpoint, rate_limit, len(free_at)))
+        return dict(state)
+
+
+def acquire_overpass_slot(endpoint):
+    """
+    Wait for a free query slot on an Overpass API endpoint and claim it.
+    
+    The endpoint's status is fetched the first time a slot on it is needed, then tracked 
+    locally: each caller claims the slot that frees up soonest, waits until that time, and 
+    hands the slot back with release_overpass_slot when its query finishes. This replaces 
+    querying the status endpoint before every request and lets concurrent downloads use all
+    the slots the server allows. Only one caller syncs an endpoint at a time, the others 
+    wait for its result.
+    
+    Parameters
+    ----------
+    endpoint : string
+        base URL of the Overpass API endpoint
+    
+    Returns
+    -------
+    bool
+        True if a slot was claimed (and must be released), False if the server has no rate limit
+    """
+    start_time = time.time()
+    while True:
+        with overpass_slots:
+            state = get_overpass_slots_state(endpoint)
+            if state['syncing']:
+                overpass_slots.wait()
+                continue
+            
+            if state['expires'] is None or time.time() < state['expires']:
+                if state['rate_limit'] == 0:
+                    return False
+                
+                # wait until a slot is handed back (or the state expires) if our queries hold all of them
+                if len(state['free_at']) == 0:
+                    overpass_slots.wait()
+                    continue
+                
+                # claim the slot that frees up soonest
+                state['free_at'].sort()
+                slot_free_at = state['free_at'].pop(0)
+                state['held'] += 1
+                break
+            
+            # the state is missing or expired: this caller syncs it, outside the lock
+            state['syncing'] = True
+        
+        try:
+            sync_overpass_slots(endpoint)
+        finally:
+            with overpass_slots:
+                state['syncing'] = False
+                overpass_slots.notify_all()
+    
+    pause_duration = max(slot_free_at - time.time(), 0)
+    if pause_duration > 0:
+        log('Pausing {:,.2f} seconds until the next Overpass API slot is free'.format(pause_duration))
+        time.sleep(pause_duration)
+    record_request_metrics('overpass', pause_time=time.time()-start_time)
+    return True
+
+
+def release_overpass_slot(endpoint, query_duration, rejected=False):
+    """
+    Hand back a query slot on an Overpass API endpoint claimed with acquire_overpass_slot.
+    
+    The server keeps a slot blocked for a while after a query finishes, so the slot is 
+    expected to free up globals.overpass_slot_cooldown_factor times the query's duration 
+    from now. If the server rejected the query, our view of its slots is out of date, so 
+    the endpoint is synced again before its next query.
+    
+    Parameters
+    ----------
+    endpoint : string
+        base URL of the Overpass API endpoint
+    query_duration : float
+        how many seconds the query took
+    rejected : bool
+        if True, the server rejected the query for lack of a free slot
+    
+    Returns
+    -------
+    None
+    """
+    with overpass_slots:
+        state = get_overpass_slots_state(endpoint)
+        state['held'] -= 1
+        if rejected:
+            state['expires'] = 0
+        elif len(state['free_at']) + state['held'] < state['rate_limit']:
+            state['free_at'].append(time.time() + query_duration * globals.overpass_slot_cooldown_factor)
+        overpass_slots.notify_all()
+
+
+def send_in_overpass_slot(endpoint, send):
+    """
+    Send a request to an Overpass API endpoint while holding one of its query slots.
+    
+    Used as request_endpoint's send_wrapper, so every attempt at a query (including 
+    retries and failovers to other endpoints) waits for a slot on the server it goes to.
+    
+    Parameters
+    ----------
+    endpoint : string
+        base URL of the Overpass API endpoint
+    send : function
+        function with no arguments that sends the request to the endpoint and returns the requests.Response
+    
+    Returns
+    -------
+    requests.Response
+    """
+    has_slot = acquire_overpass_slot(endpoint)
+    start_time = time.time()
+    response = None
     try:
-        response = requests.get('http://overpass-api.de/api/status')
-        status = response.text.split('\n')[3]
-        status_first_token = status.split(' ')[0]
-    except:
-        # if we cannot reach the status endpoint or parse its output, log an error and return default duration
-        log('Unable to query http://overpass-api.de/api/status', level=lg.ERROR)
-        return default_duration
+        response = send()
+        return response
+    finally:
+        if has_slot:
+            rejected = response is not None and response.status_code == 429
+            release_overpass_slot(endpoint, time.time() - start_time, rejected=rejected)
+
+
+def record_request_metrics(api, **increments):
+    """
+    Add to the running request metrics of an API.
+    
+    Parameters
+    ----------
+    api : string
+        {'overpass', 'nominatim'} the API the request was sent to
+    increments : dict
+        the amount to add to each metric, by name
+    
+    Returns
+    -------
+    None
+    """
+    with request_metrics_lock:
+        metrics = request_metrics.setdefault(api, {'requests':0, 'retries':0, 'failures':0, 
+                                                   'request_time':0., 'pause_time':0., 'retry_wait_time':0.})
+        for name, increment in increments.items():
+            metrics[name] += increment
+
+
+def get_request_metrics():
+    """
+    Get the running request metrics of each API, to see where time spent downloading goes.
+    
+    For each API, 'requests' counts the http requests sent, 'retries' the requests that were 
+    re-sent after an error, and 'failures' the requests given up on. 'request_time' is the 
+    seconds spent waiting for responses, 'pause_time' the seconds paused before requests for 
+    the server's rate limit, and 'retry_wait_time' the seconds spent backing off before retries.
+    
+    Returns
+    -------
+    dict
+        dict of metric dicts, keyed by API name
+    """
+    with request_metrics_lock:
+        return {api:dict(metrics) for api, metrics in request_metrics.items()}
+
+
+def reset_request_metrics():
+    """
+    Reset all the request metrics to zero.
+    
+    Returns
+    -------
+    None
+    """
+    with request_metrics_lock:
+        request_metrics.clear()
 
+
+def get_retry_after(response):
+    """
+    Parse how many seconds a server asked us to wait from a response's Retry-After header.
+    
+    Parameters
+    ----------
+    response : requests.Response
+        the response, or None
+    
+    Returns
+    -------
+    float or None
+        seconds to wait, or None if the response has no (valid) Retry-After header
+    """
+    if response is None or not 'Retry-After' in response.headers:
+        return None
+    
+    value = response.headers['Retry-After'].strip()
     try:
-        # if first token is numeric, it's how many slots you have available - no wait required
-        available_slots = int(status_first_token)
-        pause_duration = 0
-    except:
-        # if first token is 'Slot', it tells you when your slot will be free
-        if status_first_token == 'Slot':
-            utc_time_str = status.split(' ')[3]
-            utc_time = date_parser.parse(utc_time_str).replace(tzinfo=None)
-            pause_duration = math.ceil((utc_time - dt.datetime.utcnow()).total_seconds())
-            pause_duration = max(pause_duration, 1)
-
-        # if first token is 'Currently', it is currently running a query so check back in recursive_delay seconds
-        elif status_first_token == 'Currently':
-            time.sleep(recursive_delay)
-            pause_duration = get_pause_duration()
+        # the header is either a number of seconds or an http date
+        return max(float(value), 0)
+    except ValueError:
+        parsed = parsedate_tz(value)
+        if parsed is None:
+            return None
+        return max(mktime_tz(parsed) - time.time(), 0)
+
 
+def get_retry_pause(attempt, response=None, error_pause_duration=None):
+    """
+    Calculate how long to wait before re-trying a failed request.
+    
+    A Retry-After header on the response takes precedence. Otherwise the pause is 
+    error_pause_duration if it was passed, or else an exponential backoff of 
+    globals.retry_backoff_base * 2^attempt seconds (capped at globals.retry_backoff_max)
+    with random jitter, so that many clients retrying at once spread out their retries.
+    
+    Parameters
+    ----------
+    attempt : int
+        how many times the request has already been re-tried
+    response : requests.Response
+        the failed response, or None if the request raised a connection error
+    error_pause_duration : numeric
+        if not None, pause this many seconds instead of backing off exponentially
+    
+    Returns
+    -------
+    float
+    """
+    retry_after = get_retry_after(response)
+    if retry_after is not None:
+        return retry_after
+    
+    if error_pause_duration is not None:
+        return error_pause_duration
+    
+    # "equal jitter": wait at least half the backoff, plus a random share of the other half
+    backoff = min(globals.retry_backoff_max, globals.retry_backoff_base * 2 ** attempt)
+    return backoff / 2. + random.uniform(0, backoff / 2.)
+
+
+def is_connection_failure(error):
+    """
+    Determine if a requests exception means a host could not be connected to at all (e.g., its name 
+    could not be resolved, or it refused or timed out the connection), rather than that a connection 
+    was dropped or a response timed out.
+    
+    Parameters
+    ----------
+    error : requests.exceptions.RequestException
+    
+    Returns
+    -------
+    bool
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', error.args[0]) if len(error.args) > 0 else None
+    return isinstance(reason, NewConnectionError)
+
+
+def request_json(api, send_request, error_pause_duration=None):
+    """
+    Send a request and return its JSON response, re-trying it in a loop if the server is overloaded.
+    
+    Responses with status code 429 ('too many requests') or 504 ('gateway timeout'), dropped 
+    connections and timed out responses are re-tried, up to globals.retry_max_attempts attempts 
+    in total and within globals.retry_deadline seconds, pausing before each retry as calculated 
+    by get_retry_pause. Failing to connect at all (see is_connection_failure), after failing over 
+    across the API's endpoints, and any other response without JSON data raise an exception 
+    immediately.
+    
+    Parameters
+    ----------
+    api : string
+        {'overpass', 'nominatim'} the API the request is sent to, for logging and metrics
+    send_request : function
+        function with no arguments that sends the request and returns the requests.Response
+    error_pause_duration : numeric
+        if not None, pause this many seconds before each retry instead of backing off exponentially
+    
+    Returns
+    -------
+    response_json : dict
+    """
+    start_time = time.time()
+    attempt = 0
+    while True:
+        
+        request_start_time = time.time()
+        response = None
+        try:
+            response = send_request()
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            record_request_metrics(api, requests=1, request_time=time.time()-request_start_time)
+            if is_connection_failure(e):
+                # every endpoint was already tried, so re-trying would just wait out the backoff
+                log('Could not connect to the {} API: {}'.format(api, e), level=lg.ERROR)
+                record_request_metrics(api, failures=1)
+                raise
+            log('Could not reach the {} API: {}'.format(api, e), level=lg.WARNING)
+            error = e
         else:
-            # any other status is unrecognized - log an error and return default duration
-            log('Unrecognized server status: "{}"'.format(status), level=lg.ERROR)
-            return default_duration
+            record_request_metrics(api, requests=1, request_time=time.time()-request_start_time)
+            
+            # get the response size and the domain, log result
+            size_kb = len(response.content) / 1000.
+            domain = re.findall(r'(?s)//(.*?)/', response.url)[0]
+            log('Downloaded {:,.1f}KB from {} in {:,.2f} seconds'.format(size_kb, domain, time.time()-request_start_time))
             
-    return pause_duration
+            try:
+                return response.json()
+            except ValueError:
+                error = Exception('Server returned no JSON data.\n{} {}\n{}'.format(response, response.reason, response.text))
+                if not response.status_code in [429, 504]:
+                    # this was an unhandled status_code, throw an exception
+                    log('Server at {} returned status code {} and no JSON data'.format(domain, response.status_code), level=lg.ERROR)
+                    record_request_metrics(api, failures=1)
+                    raise error
+        
+        # 429 is 'too many requests' and 504 is 'gateway timeout' from server overload - handle these errors by pausing then re-trying
+        attempt += 1
+        pause = get_retry_pause(attempt - 1, response=response, error_pause_duration=error_pause_duration)
+        
+        elapsed = time.time() - start_time
+        if attempt >= globals.retry_max_attempts or (globals.retry_deadline is not None and elapsed + pause > globals.retry_deadline):
+            log('Giving up on {} API request after {} attempts and {:,.2f} seconds'.format(api, attempt, elapsed), level=lg.ERROR)
+            record_request_metrics(api, failures=1)
+            raise error
+        
+        status = 'no response' if response is None else 'status code {} and no JSON data'.format(response.status_code)
+        log('{} API returned {}. Re-trying request in {:.2f} seconds (attempt {} of {}).'.format(api, status, pause, attempt + 1, globals.retry_max_attempts), level=lg.WARNING)
+        record_request_metrics(api, retries=1, retry_wait_time=pause)
+        time.sleep(pause)
 
 
-def nominatim_request(params, pause_duration=1, timeout=30, error_pause_duration=180):
+def nominatim_request(params, pause_duration=1, timeout=30, error_pause_duration=None):
     """
     Send a request to the Nominatim API via HTTP GET and return the JSON response.
     
@@ -161,7 +609,7 @@ def nominatim_request(params, pause_duration=1, timeout=30, error_pause_duration
     timeout : int
         the timeout interval for the requests library
     error_pause_duration : int
-        how long to pause in seconds before re-trying requests if error
+        how long to pause in seconds before re-trying requests if error, if None, back off exponentially
     
     Returns
     -------
@@ -169,7 +617,8 @@ def nominatim_request(params, pause_duration=1, timeout=30, error_pause_duration
     """
     
     # prepare the Nominatim API URL and see if request already exists in the cache
-    url = 'https://nominatim.openstreetmap.org/search'
+    # the URL always uses the first configured endpoint, so responses from any mirror share one cache key
+    url = '{}/search'.format(globals.nominatim_endpoints[0])
     prepared_url = requests.Request('GET', url, params=params).prepare().url
     cached_response_json = get_from_cache(prepared_url)
     
@@ -181,31 +630,11 @@ def nominatim_request(params, pause_duration=1, timeout=30, error_pause_duration
         # if this URL is not already in the cache, pause, then request it
         log('Pausing {:,.2f} seconds before making API GET request'.format(pause_duration))
         time.sleep(pause_duration)
-        start_time = time.time()
+        record_request_metrics('nominatim', pause_time=pause_duration)
         log('Requesting {} with timeout={}'.format(prepared_url, timeout))
-        response = requests.get(url, params=params, timeout=timeout)
-        
-        # get the response size and the domain, log result
-        size_kb = len(response.content) / 1000.
-        domain = re.findall(r'//(?s)(.*?)/', url)[0]
-        log('Downloaded {:,.1f}KB from {} in {:,.2f} seconds'.format(size_kb, domain, time.time()-start_time))
-        
-        try:
-            response_json = response.json()
-            save_to_cache(prepared_url, response_json)
-        except:
-            #429 is 'too many requests' and 504 is 'gateway timeout' from server overload - handle these errors by recursively calling nominatim_request until we get a valid response
-            if response.status_code in [429, 504]:
-                # pause for error_pause_duration seconds before re-trying request
-                log('Server at {} returned status code {} and no JSON data. Re-trying request in {:.2f} seconds.'.format(domain, response.status_code, error_pause_duration), level=lg.WARNING)
-                time.sleep(error_pause_duration)
-                response_json = nominatim_request(params=params, pause_duration=pause_duration, timeout=timeout)
-            
-            # else, this was an unhandled status_code, throw an exception
-            else:
-                log('Server at {} returned status code {} and no JSON data'.format(domain, response.status_code), level=lg.ERROR)
-                raise Exception('Server returned no JSON data.\n{} {}\n{}'.format(response, response.reason, response.text))
-        
+        send_request = lambda: request_endpoint('nominatim', 'search', params=params, timeout=timeout)
+        response_json = request_json('nominatim', send_request, error_pause_duration=error_pause_duration)
+        save_to_cache(prepared_url, response_json)
         return response_json
 
 
@@ -218,11 +647,12 @@ def overpass_request(data, pause_duration=None, timeout=180, error_pause_duratio
     data : dict or OrderedDict
         key-value pairs of parameters to post to the API
     pause_duration : int
-        how long to pause in seconds before requests, if None, will query API status endpoint to find when next slot is available
+        how long to pause in seconds before requests, if None, wait for a free slot on the endpoint 
+        before each attempt (see acquire_overpass_slot)
     timeout : int
         the timeout interval for the requests library
     error_pause_duration : int
-        how long to pause in seconds before re-trying requests if error
+        how long to pause in seconds before re-trying requests if error, if None, back off exponentially
     
     Returns
     -------
@@ -230,7 +660,8 @@ def overpass_request(data, pause_duration=None, timeout=180, error_pause_duratio
     """
     
     # define the Overpass API URL, then construct a GET-style URL as a string to hash to look up/save to cache
-    url = 'http://www.overpass-api.de/api/interpreter'
+    # the URL always uses the first configured endpoint, so responses from any mirror share one cache key
+    url = '{}/interpreter'.format(globals.overpass_endpoints[0])
     prepared_url = requests.Request('GET', url, params=data).prepare().url
     cached_response_json = get_from_cache(prepared_url)
     
@@ -239,41 +670,64 @@ def overpass_request(data, pause_duration=None, timeout=180, error_pause_duratio
         return cached_response_json
     
     else:
-        # if this URL is not already in the cache, pause, then request it
+        # if this URL is not already in the cache, pause (or wait for a free slot on each endpoint it is sent to), then request it
         if pause_duration is None:
-            this_pause_duration = get_pause_duration()
-        log('Pausing {:,.2f} seconds before making API POST request'.format(this_pause_duration))
-        time.sleep(this_pause_duration)
-        start_time = time.time()
-        log('Posting to {} with timeout={}, "{}"'.format(url, timeout, data))
-        response = requests.post(url, data=data, timeout=timeout)
-        
-        # get the response size and the domain, log result
-        size_kb = len(response.content) / 1000.
-        domain = re.findall(r'//(?s)(.*?)/', url)[0]
-        log('Downloaded {:,.1f}KB from {} in {:,.2f} seconds'.format(size_kb, domain, time.time()-start_time))
-        
-        try:
-            response_json = response.json()
-            if 'remark' in response_json:
-                log('Server remark: "{}"'.format(response_json['remark'], level=lg.WARNING))
-            save_to_cache(prepared_url, response_json)
-        except:
-            #429 is 'too many requests' and 504 is 'gateway timeout' from server overload - handle these errors by recursively calling overpass_request until we get a valid response
-            if response.status_code in [429, 504]:
-                # pause for error_pause_duration seconds before re-trying request
-                if error_pause_duration is None:
-                    error_pause_duration = get_pause_duration()
-                log('Server at {} returned status code {} and no JSON data. Re-trying request in {:.2f} seconds.'.format(domain, response.status_code, error_pause_duration), level=lg.WARNING)
-                time.sleep(error_pause_duration)
-                response_json = overpass_request(data=data, pause_duration=pause_duration, timeout=timeout)
-            
-            # else, this was an unhandled status_code, throw an exception
-            else:
-                log('Server at {} returned status code {} and no JSON data'.format(domain, response.status_code), level=lg.ERROR)
-                raise Exception('Server returned no JSON data.\n{} {}\n{}'.format(response, response.reason, response.text))
+            send_wrapper = send_in_overpass_slot
+        else:
+            send_wrapper = None
+            log('Pausing {:,.2f} seconds before making API POST request'.format(pause_duration))
+            time.sleep(pause_duration)
+            record_request_metrics('overpass', pause_time=pause_duration)
         
+        log('Posting to {} with timeout={}, "{}"'.format(url, timeout, data))
+        send_request = lambda: request_endpoint('overpass', 'interpreter', method='POST', data=data, timeout=timeout, 
+                                                send_wrapper=send_wrapper)
+        response_json = request_json('overpass', send_request, error_pause_duration=error_pause_duration)
+        if 'remark' in response_json:
+            log('Server remark: "{}"'.format(response_json['remark']), level=lg.WARNING)
+        save_to_cache(prepared_url, response_json)
         return response_json
+
+
+def overpass_request_batch(datas, pause_duration=None, timeout=180, max_workers=None):
+    """
+    Send several requests to the Overpass API, optionally concurrently, and return their JSON responses in order.
+    
+    Parameters
+    ----------
+    datas : list
+        list of dicts or OrderedDicts of key-value pairs of parameters to post to the API, one per request
+    pause_duration : int
+        how long to pause in seconds before each request, if None, will query API status endpoint to find when next slot is available
+    timeout : int
+        the timeout interval for the requests library
+    max_workers : int
+        how many requests to send at the same time, if None, use globals.overpass_max_workers
+    
+    Returns
+    -------
+    list
+        the response json dicts, in the same order as datas
+    """
+    if max_workers is None:
+        max_workers = globals.overpass_max_workers
+    max_workers = min(max_workers, len(datas))
+    
+    def request(data):
+        return overpass_request(data=data, pause_duration=pause_duration, timeout=timeout)
+    
+    if max_workers <= 1:
+        return [request(data) for data in datas]
+    
+    # send the requests from a pool of threads, map returns the responses in the order of datas
+    log('Sending {:,} requests to the Overpass API with {:,} concurrent workers'.format(len(datas), max_workers))
+    pool = ThreadPool(max_workers)
+    try:
+        response_jsons = pool.map(request, datas)
+    finally:
+        pool.close()
+        pool.join()
+    return response_jsons
     
     
 def osm_polygon_download(query, limit=1, polygon_geojson=1, pause_duration=1):
@@ -471,7 +925,8 @@ def get_osm_filter(network_type):
     return osm_filter
  
  
-def osm_net_download(polygon=None, north=None, south=None, east=None, west=None, network_type='all_private', timeout=180, memory=None, max_query_area_size=50*1000*50*1000):
+def osm_net_download(polygon=None, north=None, south=None, east=None, west=None, network_type='all_private', timeout=180, memory=None, 
+                     max_query_area_size=50*1000*50*1000, max_workers=None):
     """
     Download OSM ways and nodes within some bounding box from the Overpass API.
     
@@ -496,10 +951,13 @@ def osm_net_download(polygon=None, north=None, south=None, east=None, west=None,
     max_query_area_size : float
         max area for any part of the geometry, in the units the geometry is in: any polygon bigger will get divided up 
         for multiple queries to API (default is 50,000 * 50,000 units (ie, 50km x 50km in area, if units are meters))
+    max_workers : int
+        how many of the sub-queries to send to the API at the same time, if None, use globals.overpass_max_workers
     
     Returns
     -------
-    dict
+    list
+        list of response_json dicts, one per sub-query, in the order of the subdivided geometry
     """
     
     # check if we're querying by polygon or by bounding box based on which argument(s) where passed into this function
@@ -510,7 +968,6 @@ def osm_net_download(polygon=None, north=None, south=None, east=None, west=None,
     
     # create a filter to exclude certain kinds of routes based on the requested network_type
     osm_filter = get_osm_filter(network_type)
-    response_jsons = []
     
     # pass server memory allocation in bytes for the query to the API
     # if None, pass nothing so the server will use its default allocation size
@@ -535,13 +992,14 @@ def osm_net_download(polygon=None, north=None, south=None, east=None, west=None,
         start_time = time.time()
         
         # loop through each polygon rectangle in the geometry (there will only be one if original bbox didn't exceed max area size)
+        datas = []
         for poly in geometry:
             # represent bbox as south,west,north,east and round lat-longs to 8 decimal places (ie, within 1 mm) so URL strings aren't different due to float rounding issues (for consistent caching)
             west, south, east, north = poly.bounds
             query_template = '[out:json][timeout:{timeout}]{maxsize};(way["highway"]{filters}({south:.8f},{west:.8f},{north:.8f},{east:.8f});>;);out;'
             query_str = query_template.format(north=north, south=south, east=east, west=west, filters=osm_filter, timeout=timeout, maxsize=maxsize)
-            response_json = overpass_request(data={'data':query_str}, timeout=timeout)
-            response_jsons.append(response_json)
+            datas.append({'data':query_str})
+        response_jsons = overpass_request_batch(datas, timeout=timeout, max_workers=max_workers)
         log('Got all network data within bounding box from API in {:,} request(s) and {:,.2f} seconds'.format(len(geometry), time.time()-start_time))
     
     elif by_poly:
@@ -553,12 +1011,13 @@ def osm_net_download(polygon=None, north=None, south=None, east=None, west=None,
         log('Requesting network data within polygon from API in {:,} request(s)'.format(len(polygon_coord_strs)))
         start_time = time.time()
         
-        # pass each polygon exterior coordinates in the list to the API, one at a time
+        # pass each polygon exterior coordinates in the list to the API
+        datas = []
         for polygon_coord_str in polygon_coord_strs:
             query_template = '[out:json][timeout:{timeout}]{maxsize};(way["highway"]{filters}(poly:"{polygon}");>;);out;'
             query_str = query_template.format(polygon=polygon_coord_str, filters=osm_filter, timeout=timeout, maxsize=maxsize)
-            response_json = overpass_request(data={'data':query_str}, timeout=timeout)
-            response_jsons.append(response_json)
+            datas.append({'data':query_str})
+        response_jsons = overpass_request_batch(datas, timeout=timeout, max_workers=max_workers)
         log('Got all network data within polygon from API in {:,} request(s) and {:,.2f} seconds'.format(len(polygon_coord_strs), time.time()-start_time))
         
     return response_jsons
@@ -700,17 +1159,23 @@ def parse_osm_nodes_paths(osm_data):
     
     Parameters
     ----------
-    osm_data : dict
-        JSON response from from the Overpass API
+    osm_data : dict or iterable
+        JSON response from from the Overpass API, or an iterable of its elements (such as the
+        generator returned by cache.iter_cache_elements, which never holds the whole response in memory)
     
     Returns
     -------
     nodes, paths : tuple
     """
     
+    if isinstance(osm_data, dict):
+        elements = osm_data['elements']
+    else:
+        elements = osm_data
+    
     nodes = {}
     paths = {}
-    for element in osm_data['elements']:
+    for element in elements:
         if element['type'] == 'node':
             key = element['id']
             nodes[key] = get_node(element)
@@ -727,27 +1192,114 @@ def remove_isolated_nodes(G):
     
     Parameters
     ----------
-    G : networkx multidigraph
+    G : networkx multidigraph or CompactGraph
         the graph from which to remove nodes
     
     Returns
     -------
-    networkx multidigraph
+    networkx multidigraph or CompactGraph
     """
     
+    if isinstance(G, CompactGraph):
+        degrees = np.bincount(G.sources(), minlength=len(G)) + np.bincount(G.targets, minlength=len(G))
+        log('Removed {:,} isolated nodes'.format(int((degrees < 1).sum())))
+        return G.subgraph(degrees > 0)
+    
     isolated_nodes = [node for node, degree in dict(G.degree()).items() if degree < 1]
     G.remove_nodes_from(isolated_nodes)
     log('Removed {:,} isolated nodes'.format(len(isolated_nodes)))
     return G
     
 
+def get_edge_rows(G, node_rows):
+    """
+    Get the rows of every edge's origin and destination nodes, in arrays.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    node_rows : dict
+        the row of each node, keyed by node
+    
+    Returns
+    -------
+    u_rows, v_rows : tuple of numpy arrays
+    """
+    
+    u_rows = []
+    v_rows = []
+    for u, neighbors in G.adj.items():
+        u_row = node_rows[u]
+        for v, keydict in neighbors.items():
+            v_row = node_rows[v]
+            for key in keydict:
+                u_rows.append(u_row)
+                v_rows.append(v_row)
+    return np.array(u_rows, dtype=np.int64), np.array(v_rows, dtype=np.int64)
+
+
+def get_subgraph_copy(G, nodes):
+    """
+    Copy the subgraph induced by some nodes of a graph: those nodes and all the edges between them.
+    
+    Each node and edge gets a copy of its attribute dict and of the mutable values in it (see 
+    copy_attributes), so editing the copy does not change the graph, but its immutable values are 
+    shared, which is much faster than the deep copy made by G.subgraph(nodes).copy(). The graph's 
+    attributes are deep copied, without its coordinate views in other CRSs (see add_crs_view), 
+    which do not match the subgraph's nodes.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    nodes : list
+        the nodes to copy, in the order to add them in
+    
+    Returns
+    -------
+    networkx multidigraph
+    """
+    
+    node_set = set(nodes)
+    H = G.__class__()
+    H.graph.update(copy.deepcopy({key:value for key, value in G.graph.items() if key != 'crs_views'}))
+    H.add_nodes_from((node, copy_attributes(G.node[node])) for node in nodes)
+    H.add_edges_from((u, v, key, copy_attributes(data)) for u in nodes for v, keydict in G.adj[u].items() if v in node_set 
+                     for key, data in keydict.items())
+    return H
+
+
+def get_neighbor_mask(u_rows, v_rows, node_mask):
+    """
+    Find which nodes have at least one neighbor (successor or predecessor) in a set of nodes.
+    
+    Parameters
+    ----------
+    u_rows : numpy array
+        the row of each edge's origin node
+    v_rows : numpy array
+        the row of each edge's destination node
+    node_mask : numpy array
+        a boolean array of which nodes (by row) are in the set
+    
+    Returns
+    -------
+    numpy array
+        a boolean array of which nodes (by row) have a neighbor in the set
+    """
+    
+    neighbor_mask = np.zeros(len(node_mask), dtype=bool)
+    neighbor_mask[u_rows[node_mask[v_rows]]] = True
+    neighbor_mask[v_rows[node_mask[u_rows]]] = True
+    return neighbor_mask
+
+
 def truncate_graph_dist(G, source_node, max_distance=1000, weight='length', retain_all=False):
     """
     Remove everything further than some network distance from a specified node in graph.
     
     Parameters
     ----------
-    G : networkx multidigraph
+    G : networkx multidigraph or CompactGraph
     source_node : int
         the node in the graph from which to measure network distances to other nodes
     max_distance : int
@@ -762,6 +1314,9 @@ def truncate_graph_dist(G, source_node, max_distance=1000, weight='length', reta
     networkx multidigraph
     """
     
+    if isinstance(G, CompactGraph):
+        return graph_to_compact(truncate_graph_dist(compact_to_graph(G), source_node, max_distance, weight, retain_all))
+    
     # get the shortest distance between the node and every other node, then remove every node further than max_distance away
     start_time = time.time()
     G = G.copy()
@@ -787,7 +1342,7 @@ def truncate_graph_bbox(G, north, south, east, west, truncate_by_edge=False, ret
     
     Parameters
     ----------
-    G : networkx multidigraph
+    G : networkx multidigraph or CompactGraph
     north : float
         northern latitude of bounding box
     south : float
@@ -807,36 +1362,37 @@ def truncate_graph_bbox(G, north, south, east, west, truncate_by_edge=False, ret
     """
     
     start_time = time.time()
-    G = G.copy()
-    nodes_outside_bbox = []
-    
-    for node, data in G.nodes(data=True):
-        if data['y'] > north or data['y'] < south or data['x'] > east or data['x'] < west:
-            # this node is outside the bounding box
-            if not truncate_by_edge:
-                # if we're not truncating by edge, add node to list of nodes outside the bounding box
-                nodes_outside_bbox.append(node)
-            else:
-                # if we're truncating by edge, see if any of node's neighbors are within bounding box
-                any_neighbors_in_bbox = False
-                neighbors = list(G.successors(node)) + list(G.predecessors(node))
-                for neighbor in neighbors:
-                    x = G.node[neighbor]['x']
-                    y = G.node[neighbor]['y']
-                    if y < north and y > south and x < east and x > west:
-                        any_neighbors_in_bbox = True
-
-                # if none of its neighbors are within the bounding box, add node to list of nodes outside the bounding box
-                if not any_neighbors_in_bbox:
-                    nodes_outside_bbox.append(node)
-    
-    G.remove_nodes_from(nodes_outside_bbox)
+    
+    # gather the nodes' coordinates into arrays, and test them all against the bounding box at once
+    if isinstance(G, CompactGraph):
+        y = G.node_values('y').astype(np.float64)
+        x = G.node_values('x').astype(np.float64)
+    else:
+        nodes = G.nodes()
+        y = np.array([G.node[node]['y'] for node in nodes], dtype=np.float64)
+        x = np.array([G.node[node]['x'] for node in nodes], dtype=np.float64)
+    keep = (y <= north) & (y >= south) & (x <= east) & (x >= west)
+    
+    if truncate_by_edge:
+        # also retain nodes outside the bounding box if any of their neighbors are strictly within it
+        if isinstance(G, CompactGraph):
+            u_rows, v_rows = G.sources(), G.targets
+        else:
+            u_rows, v_rows = get_edge_rows(G, {node:row for row, node in enumerate(nodes)})
+        strictly_inside = (y < north) & (y > south) & (x < east) & (x > west)
+        keep |= get_neighbor_mask(u_rows, v_rows, strictly_inside)
+    
+    # then take the nodes to retain in one batch, copying only them and their edges
+    if isinstance(G, CompactGraph):
+        G = G.subgraph(keep)
+    else:
+        G = get_subgraph_copy(G, [node for node, retain in zip(nodes, keep.tolist()) if retain])
     log('Truncated graph by bounding box in {:,.2f} seconds'.format(time.time()-start_time))
     
     # remove any isolated nodes and retain only the largest component (if retain_all is True)
     if not retain_all:
         G = remove_isolated_nodes(G)
-        G = get_largest_component(G)
+        G = get_largest_compact_component(G) if isinstance(G, CompactGraph) else get_largest_component(G)
 
     return G
     
@@ -905,8 +1461,8 @@ def intersect_index_quadrats(gdf, geometry, quadrat_width=0.025, min_num=3, buff
     GeoDataFrame
     """
     
-    # create an empty dataframe to append matches to
-    points_within_geometry = pd.DataFrame()
+    # gather the matches in each chunk in a list, to concatenate once at the end
+    matches = []
     
     # cut the geometry into chunks for r-tree spatial index intersecting
     multipoly = quadrat_cut_geometry(geometry, quadrat_width=quadrat_width, buffer_amount=buffer_amount)
@@ -918,7 +1474,7 @@ def intersect_index_quadrats(gdf, geometry, quadrat_width=0.025, min_num=3, buff
     
     # loop through each chunk of the geometry to find approximate and then precisely intersecting points
     start_time = time.time()
-    for poly in multipoly:
+    for poly in getattr(multipoly, 'geoms', [multipoly]):
         
         # buffer by the tiny distance to account for any space lost in the quadrat cutting, otherwise may miss point(s) that lay directly on quadrat line
         buffer_size = quadrat_width * buffer_amount
@@ -927,9 +1483,10 @@ def intersect_index_quadrats(gdf, geometry, quadrat_width=0.025, min_num=3, buff
         # find approximate matches with r-tree, then precise matches from those approximate ones
         possible_matches_index = list(sindex.intersection(poly.bounds))
         possible_matches = gdf.iloc[possible_matches_index]
-        precise_matches = possible_matches[possible_matches.intersects(poly)]
-        points_within_geometry = points_within_geometry.append(precise_matches)
+        prepared_poly = prep(poly)
+        matches.append(possible_matches[[prepared_poly.intersects(point) for point in possible_matches['geometry']]])
     
+    points_within_geometry = pd.concat(matches) if len(matches) > 0 else pd.DataFrame()
     if len(points_within_geometry) > 0:
         # drop duplicate points, if buffered poly caused an overlap on point(s) that lay directly on a quadrat line
         points_within_geometry = points_within_geometry.drop_duplicates(subset='node')
@@ -941,47 +1498,108 @@ def intersect_index_quadrats(gdf, geometry, quadrat_width=0.025, min_num=3, buff
     return points_within_geometry
     
     
+def get_polygon_mask(x, y, polygon):
+    """
+    Find which points lie within (or on the boundary of) a polygon, given arrays of their coordinates.
+    
+    Only points within the polygon's bounding box are tested against it, with shapely's vectorized 
+    tests if available, else with a prepared geometry.
+    
+    Parameters
+    ----------
+    x : numpy array
+        the points' x coordinates
+    y : numpy array
+        the points' y coordinates
+    polygon : shapely Polygon or MultiPolygon
+    
+    Returns
+    -------
+    numpy array
+        a boolean array of which points intersect the polygon
+    """
+    
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    mask = np.zeros(len(x), dtype=bool)
+    west, south, east, north = polygon.bounds
+    candidates = np.flatnonzero((x >= west) & (x <= east) & (y >= south) & (y <= north))
+    if len(candidates) == 0:
+        return mask
+    
+    x_candidates = x[candidates]
+    y_candidates = y[candidates]
+    if int(shapely.__version__.split('.')[0]) >= 2:
+        # prepare a copy of the polygon, as preparing happens in place and the polygon is the caller's
+        if not shapely.is_prepared(polygon):
+            polygon = copy.copy(polygon)
+            shapely.prepare(polygon)
+        mask[candidates] = shapely.intersects_xy(polygon, x_candidates, y_candidates)
+    elif shapely_vectorized is not None:
+        mask[candidates] = shapely_vectorized.contains(polygon, x_candidates, y_candidates) | \
+                           shapely_vectorized.touches(polygon, x_candidates, y_candidates)
+    else:
+        prepared_polygon = prep(polygon)
+        mask[candidates] = [prepared_polygon.intersects(Point(xy)) for xy in zip(x_candidates.tolist(), y_candidates.tolist())]
+    return mask
+
+
 def truncate_graph_polygon(G, polygon, retain_all=False, truncate_by_edge=False):
     """
     Remove every node in graph that falls outside some shapely Polygon or MultiPolygon.
     
     Parameters
     ----------
-    G : networkx multidigraph
+    G : networkx multidigraph or CompactGraph
     polygon : Polygon or MultiPolygon
         only retain nodes in graph that lie within this geometry
     retain_all : bool
         if True, return the entire graph even if it is not connected
     truncate_by_edge : bool
-        if True retain node if it's outside polygon but at least one of node's neighbors are within polygon (NOT CURRENTLY IMPLEMENTED)
+        if True retain node if it's outside polygon but at least one of node's neighbors are within polygon
     
     Returns
     -------
-    networkx multidigraph
+    networkx multidigraph or CompactGraph
     """
     
     start_time = time.time()
-    G = G.copy()
     log('Identifying all nodes that lie outside the polygon...')
     
-    # get a GeoDataFrame of all the nodes, for spatial analysis
-    node_geom = [Point(data['x'], data['y']) for _, data in G.nodes(data=True)]
-    gdf_nodes = gpd.GeoDataFrame({'node':pd.Series(G.nodes()), 'geometry':node_geom})
-    gdf_nodes.crs = G.graph['crs']
+    # gather the nodes' coordinates into arrays, and find all the nodes in the graph that lie within the polygon at once
+    if isinstance(G, CompactGraph):
+        y = G.node_values('y')
+        x = G.node_values('x')
+    else:
+        nodes = G.nodes()
+        y = np.array([G.node[node]['y'] for node in nodes], dtype=np.float64)
+        x = np.array([G.node[node]['x'] for node in nodes], dtype=np.float64)
+    keep = get_polygon_mask(x, y, polygon)
+    if not keep.any():
+        # there are no nodes inside the polygon - can't create graph from that so throw error
+        raise Exception('There are no nodes within the requested geometry')
+    log('Identified {:,} nodes inside polygon in {:,.2f} seconds'.format(int(keep.sum()), time.time()-start_time))
     
-    # find all the nodes in the graph that lie outside the polygon
-    points_within_geometry = intersect_index_quadrats(gdf_nodes, polygon)
-    nodes_outside_polygon = gdf_nodes[~gdf_nodes.index.isin(points_within_geometry.index)]    
+    if truncate_by_edge:
+        # also retain nodes outside the polygon if any of their neighbors are within it
+        if isinstance(G, CompactGraph):
+            u_rows, v_rows = G.sources(), G.targets
+        else:
+            u_rows, v_rows = get_edge_rows(G, {node:row for row, node in enumerate(nodes)})
+        keep |= get_neighbor_mask(u_rows, v_rows, keep.copy())
     
-    # now remove from the graph all those nodes that lie outside the place polygon
+    # now take the nodes within the polygon in one batch, copying only them and their edges
     start_time = time.time()
-    G.remove_nodes_from(nodes_outside_polygon['node'])
-    log('Removed {:,} nodes outside polygon in {:,.2f} seconds'.format(len(nodes_outside_polygon), time.time()-start_time))
+    if isinstance(G, CompactGraph):
+        G = G.subgraph(keep)
+    else:
+        G = get_subgraph_copy(G, [node for node, retain in zip(nodes, keep.tolist()) if retain])
+    log('Removed {:,} nodes outside polygon in {:,.2f} seconds'.format(len(keep) - int(keep.sum()), time.time()-start_time))
     
     # remove any isolated nodes and retain only the largest component (if retain_all is True)
     if not retain_all:
         G = remove_isolated_nodes(G)
-        G = get_largest_component(G)
+        G = get_largest_compact_component(G) if isinstance(G, CompactGraph) else get_largest_component(G)
     
     return G
     
@@ -992,29 +1610,52 @@ def add_edge_lengths(G):
     
     Parameters
     ----------
-    G : networkx multidigraph
+    G : networkx multidigraph or CompactGraph
     
     Returns
     -------
-    G : networkx multidigraph
+    G : networkx multidigraph or CompactGraph
     """    
     
     start_time = time.time()
     
-    # first load all the edges' origin and destination coordinates as a dataframe indexed by u, v, key
-    coords = np.array([[u, v, k, G.node[u]['y'], G.node[u]['x'], G.node[v]['y'], G.node[v]['x']] for u, v, k in G.edges(keys=True)])
-    df_coords = pd.DataFrame(coords, columns=['u', 'v', 'k', 'u_y', 'u_x', 'v_y', 'v_x'])
-    df_coords[['u', 'v', 'k']] = df_coords[['u', 'v', 'k']].astype(np.int64)
-    df_coords = df_coords.set_index(['u', 'v', 'k'])
-
-    # then calculate the great circle distance with the vectorized function
-    gc_distances = great_circle_vec(lat1=df_coords['u_y'], 
-                                    lng1=df_coords['u_x'],
-                                    lat2=df_coords['v_y'], 
-                                    lng2=df_coords['v_x'])
-
-    gc_distances = gc_distances.fillna(value=0)
-    nx.set_edge_attributes(G, 'length', gc_distances.to_dict())
+    if isinstance(G, CompactGraph):
+        # compact graphs already hold their coordinates and edges in arrays, so just look them up by row
+        y = G.node_values('y').astype(np.float64)
+        x = G.node_values('x').astype(np.float64)
+        u_rows = G.sources()
+        v_rows = G.targets
+        gc_distances = great_circle_vec(lat1=y[u_rows], lng1=x[u_rows], lat2=y[v_rows], lng2=x[v_rows])
+        G.edge_columns['length'] = make_float_column(gc_distances)
+        log('Added edge lengths to compact graph in {:,.2f} seconds'.format(time.time()-start_time))
+        return G
+    
+    # gather the nodes' coordinates into contiguous arrays, then look up each edge's endpoints in 
+    # them by row, so osmids are never cast to float (which would lose precision above 2**53)
+    nodes = G.nodes()
+    node_rows = {node:row for row, node in enumerate(nodes)}
+    y = np.array([G.node[node]['y'] for node in nodes], dtype=np.float64)
+    x = np.array([G.node[node]['x'] for node in nodes], dtype=np.float64)
+    u_rows = []
+    v_rows = []
+    edge_data = []
+    for u, neighbors in G.adj.items():
+        u_row = node_rows[u]
+        for v, keydict in neighbors.items():
+            v_row = node_rows[v]
+            for data in keydict.values():
+                u_rows.append(u_row)
+                v_rows.append(v_row)
+                edge_data.append(data)
+    u_rows = np.array(u_rows, dtype=np.int64)
+    v_rows = np.array(v_rows, dtype=np.int64)
+    
+    # then calculate the great circle distances with the vectorized function, in one call
+    gc_distances = great_circle_vec(lat1=y[u_rows], lng1=x[u_rows], lat2=y[v_rows], lng2=x[v_rows])
+    
+    # and write them straight into the edges' attribute dicts
+    for data, length in zip(edge_data, gc_distances.tolist()):
+        data['length'] = length
     
     log('Added edge lengths to graph in {:,.2f} seconds'.format(time.time()-start_time))
     return G
@@ -1028,7 +1669,7 @@ def add_path(G, data, one_way):
     ----------
     G : networkx multidigraph
     data : dict
-        the attributes of the path
+        the attributes of the path, left unchanged
     one_way : bool
         if this path is one-way or if it is bi-directional
     
@@ -1037,59 +1678,119 @@ def add_path(G, data, one_way):
     None
     """
     
-    # extract the ordered list of nodes from this path element, then delete it so we don't add it as an attribute to the edge later
+    # the edges get every attribute of the path but its ordered list of nodes, and the oneway attribute 
+    # set to the passed-in value, to make it consistent True/False values
     path_nodes = data['nodes']
-    del data['nodes']
-    
-    # set the oneway attribute to the passed-in value, to make it consistent True/False values
-    data['oneway'] = one_way
+    edge_data = {key:value for key, value in data.items() if key != 'nodes'}
+    edge_data['oneway'] = one_way
     
     # zip together the path nodes so you get tuples like (0,1), (1,2), (2,3) and so on
     path_edges = list(zip(path_nodes[:-1], path_nodes[1:]))
-    G.add_edges_from(path_edges, **data)
+    G.add_edges_from(path_edges, **edge_data)
     
     # if the path is NOT one-way
     if not one_way:
         # reverse the direction of each edge and add this path going the opposite direction
         path_edges_opposite_direction = [(v, u) for u, v in path_edges]
-        G.add_edges_from(path_edges_opposite_direction, **data)
+        G.add_edges_from(path_edges_opposite_direction, **edge_data)
 
 
-def add_paths(G, paths, network_type):
+def get_paths_edge_arrays(paths, network_type):
     """
-    Add a collection of paths to the graph.
+    Convert a collection of paths into flat arrays of the directed edges they make up.
+    
+    Edges are ordered as add_path would add them, path by path: each path's edges in order (in 
+    reverse order for paths tagged oneway=-1), then, if the path is not one-way, the same edges 
+    going the opposite direction.
     
     Parameters
     ----------
-    G : networkx multidigraph
     paths : dict
-        the paths from OSM
+        the paths from OSM, left unchanged
     network_type : string
         {'all', 'walk', 'drive', etc}, what type of network
     
     Returns
     -------
-    None
+    u, v, path_index, path_data : tuple
+        arrays of the from and to nodes of each edge and the index of the path it belongs to, and 
+        the list of each path's edge attributes (all its attributes but nodes, with oneway as a bool)
     """
     
     # the list of values OSM uses in its 'oneway' tag to denote True
     osm_oneway_values = ['yes', 'true', '1', '-1']
     
+    path_data = []
+    path_nodes = []
+    one_way = []
+    reverse = []
     for data in paths.values():
-        
-        # if this path is tagged as one-way and if it is not a walking network, then we'll add the path in one direction only
-        if ('oneway' in data and data['oneway'] in osm_oneway_values) and not network_type=='walk':
-            if data['oneway'] == '-1':
-                # paths with a one-way value of -1 are one-way, but in the reverse direction of the nodes' order, see osm documentation
-                data['nodes'] = list(reversed(data['nodes']))
-            # add this path (in only one direction) to the graph
-            add_path(G, data, one_way=True)
-        
+        # if this path is tagged as one-way and if it is not a walking network, then we'll add the path in one direction only.
         # else, this path is not tagged as one-way or it is a walking network (you can walk both directions on a one-way street)
-        else:
-            # add this path (in both directions) to the graph and set its 'oneway' attribute to False
-            # if this is a walking network, this may very well be a one-way street (as cars/bikes go), but in a walking-only network it is a bi-directional edge
-            add_path(G, data, one_way=False)
+        this_one_way = ('oneway' in data and data['oneway'] in osm_oneway_values) and not network_type=='walk'
+        edge_data = {key:value for key, value in data.items() if key != 'nodes'}
+        edge_data['oneway'] = this_one_way
+        path_data.append(edge_data)
+        path_nodes.append(data['nodes'])
+        one_way.append(this_one_way)
+        # paths with a one-way value of -1 are one-way, but in the reverse direction of the nodes' order, see osm documentation
+        reverse.append(this_one_way and data['oneway'] == '-1')
+    
+    if len(path_nodes) < 1:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, path_data
+    
+    # concatenate every path's nodes, then every position but the last of each path starts an edge
+    counts = np.array([len(nodes) for nodes in path_nodes], dtype=np.int64)
+    nodes = np.array([node for nodes in path_nodes for node in nodes])
+    edge_counts = np.maximum(counts - 1, 0)
+    path_index = np.repeat(np.arange(len(path_nodes)), edge_counts)
+    path_starts = np.cumsum(counts) - counts
+    position = np.arange(edge_counts.sum()) - np.repeat(np.cumsum(edge_counts) - edge_counts, edge_counts)
+    u = nodes[path_starts[path_index] + position]
+    v = nodes[path_starts[path_index] + position + 1]
+    
+    # reversed paths run from their last node to their first
+    reverse = np.array(reverse, dtype=bool)[path_index]
+    u, v = np.where(reverse, v, u), np.where(reverse, u, v)
+    order_in_path = np.where(reverse, -position, position)
+    
+    # bi-directional paths get a second copy of their edges, going the opposite direction
+    both_ways = ~np.array(one_way, dtype=bool)[path_index]
+    u, v = np.concatenate([u, v[both_ways]]), np.concatenate([v, u[both_ways]])
+    path_index = np.concatenate([path_index, path_index[both_ways]])
+    order_in_path = np.concatenate([order_in_path, order_in_path[both_ways]])
+    direction = np.concatenate([np.zeros(len(both_ways), dtype=np.int8), np.ones(both_ways.sum(), dtype=np.int8)])
+    
+    order = np.lexsort((order_in_path, direction, path_index))
+    return u[order], v[order], path_index[order], path_data
+
+
+def add_paths(G, paths, network_type):
+    """
+    Add a collection of paths to the graph.
+    
+    All the paths' edges are built at once as arrays by get_paths_edge_arrays, then added to the 
+    graph in a single add_edges_from call. Each edge still gets its own copy of its path's 
+    attributes, as edge attributes like length are set per edge later on.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    paths : dict
+        the paths from OSM, left unchanged
+    network_type : string
+        {'all', 'walk', 'drive', etc}, what type of network
+    
+    Returns
+    -------
+    None
+    """
+    
+    u, v, path_index, path_data = get_paths_edge_arrays(paths, network_type)
+    
+    # tolist turns numpy integers back into python ints, so they match the osmids of the graph's nodes
+    G.add_edges_from((u, v, path_data[index]) for u, v, index in zip(u.tolist(), v.tolist(), path_index.tolist()))
     
     return G
 
@@ -1101,7 +1802,8 @@ def create_graph(response_jsons, name='unnamed', retain_all=False, network_type=
     Parameters
     ----------
     response_jsons : list
-        list of dicts of JSON responses from from the Overpass API
+        list of dicts of JSON responses from from the Overpass API, or of iterables of their elements 
+        (such as the generators returned by cache.iter_cache_elements), which are consumed only once
     name : string
         the name of the graph
     retain_all : bool
@@ -1117,29 +1819,28 @@ def create_graph(response_jsons, name='unnamed', retain_all=False, network_type=
     log('Creating networkx graph from downloaded OSM data...')
     start_time = time.time()
     
-    # make sure we got data back from the server requests
-    elements = []
-    for response_json in response_jsons:
-        elements.extend(response_json['elements'])
-    if len(elements) < 1:
-        raise ValueError('There are no data elements in the response JSON objects')
-    
     # create the graph as a MultiDiGraph and set the original CRS to EPSG 4326
     G = nx.MultiDiGraph(name=name, crs={'init':'epsg:4326'})
     
-    # extract nodes and paths from the downloaded osm data
-    nodes = {}
+    # make a single pass over the elements of all the responses: nodes go straight into the graph in 
+    # bulk as they stream past, and ways are collected by osmid (which also drops the duplicates that 
+    # overlapping sub-queries return) to be added as paths once all their nodes are known
     paths = {}
-    for osm_data in response_jsons:
-        nodes_temp, paths_temp = parse_osm_nodes_paths(osm_data)
-        for key, value in nodes_temp.items():
-            nodes[key] = value
-        for key, value in paths_temp.items():
-            paths[key] = value  
-    
-    # add each osm node to the graph
-    for node, data in nodes.items():
-        G.add_node(node, **data)
+    element_count = [0]
+    def iter_nodes():
+        for response_json in response_jsons:
+            elements = response_json['elements'] if isinstance(response_json, dict) else response_json
+            for element in elements:
+                element_count[0] += 1
+                if element['type'] == 'node':
+                    yield element['id'], get_node(element)
+                elif element['type'] == 'way': #osm calls network paths 'ways'
+                    paths[element['id']] = get_path(element)
+    G.add_nodes_from(iter_nodes())
+    
+    # make sure we got data back from the server requests
+    if element_count[0] < 1:
+        raise ValueError('There are no data elements in the response JSON objects')
     
     # add each osm way (aka, path) to the graph
     G = add_paths(G, paths, network_type)
@@ -17,6 +17,50 @@ cache_folder = 'cache'
 # cache server responses
 use_cache = False
 
+# where to cache server responses: 'folder' saves each response as its own json file in cache_folder,
+# 'sqlite' saves all responses compressed in the single database file cache_db_filename in cache_folder
+cache_backend = 'folder'
+cache_db_filename = 'cache.sqlite'
+
+# compress cached responses: None (folder cache saves plain json), 'gzip', or 'zstd' (requires the zstandard package)
+cache_compression = None
+
+# evict cached responses saved more than cache_max_age seconds ago, and evict the least-recently used
+# responses when the cache grows beyond cache_max_size bytes. None means no limit.
+cache_max_age = None
+cache_max_size = None
+
+# base URLs of the Overpass and Nominatim APIs (add mirrors to these lists), and whether to try them in
+# order ('failover') or start each request at the next one in turn ('round_robin')
+overpass_endpoints = ['http://www.overpass-api.de/api']
+nominatim_endpoints = ['https://nominatim.openstreetmap.org']
+endpoint_strategy = 'failover'
+
+# the Overpass API keeps a query slot blocked for a while after the query finishes: the slot scheduler expects
+# a slot to be free again this many times the query's duration after it finishes
+overpass_slot_cooldown_factor = 1.
+
+# if an endpoint's /status cannot be fetched, the slot scheduler assumes a single slot and fetches the
+# status again once this many seconds have passed
+overpass_status_ttl = 60
+
+# when an API is overloaded (429/504), drops the connection or times out, re-try a request up to retry_max_attempts
+# times in total, backing off exponentially from retry_backoff_base seconds (with random jitter) up to
+# retry_backoff_max seconds per pause, and give up once the next retry would end more than retry_deadline seconds
+# (None means no deadline) after the first attempt. hosts that cannot be connected to at all are not re-tried
+retry_max_attempts = 8
+retry_backoff_base = 5
+retry_backoff_max = 300
+retry_deadline = 600
+
+# how many keep-alive connections the shared http session holds open to each host
+http_pool_size = 10
+
+# how many Overpass queries to send at the same time when a query geometry is subdivided,
+# and the max number of requests per second to send to the endpoint (None means no limit)
+overpass_max_workers = 1
+overpass_rate_limit = None
+
 # write log to file and/or to console
 log_file = False
 log_console = False
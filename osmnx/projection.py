@@ -5,23 +5,152 @@
 # Web: https://github.com/gboeing/osmnx
 ###################################################################################################
 
+import copy
 import time
 import math
 import numpy as np
 import geopandas as gpd
+import pyproj
+import shapely
 import networkx as nx
-from shapely.geometry import Point
+from threading import Lock
+from shapely.geometry import LineString
+from shapely.ops import transform as shapely_transform
 
-from .utils import log, make_str
+from .utils import log, make_str, copy_attributes, clear_nearest_indexes
+from .compact import CompactGraph, make_column, make_float_column, get_column_list
+
+
+# transform functions for each pair of (crs, to_crs) seen so far, see get_transform_function
+transform_functions = {}
+transform_functions_lock = Lock()
+
+
+def get_crs_key(crs):
+    """
+    Get a hashable key for a CRS, which may be a dict.
+    
+    Parameters
+    ----------
+    crs : dict or string
+    
+    Returns
+    -------
+    hashable
+    """
+    
+    if isinstance(crs, dict):
+        return tuple(sorted((key, str(value)) for key, value in crs.items()))
+    return str(crs)
+
+
+def get_utm_crs(longitude):
+    """
+    Get the CRS of the UTM zone that a longitude falls in.
+    
+    The simple calculation in this function works well for most latitudes, but won't 
+    work for some far northern locations like Svalbard and parts of far northern Norway.
+    
+    Parameters
+    ----------
+    longitude : float
+    
+    Returns
+    -------
+    dict
+    """
+    
+    utm_zone = int(math.floor((longitude + 180) / 6.) + 1)
+    return {'datum': 'NAD83',
+            'ellps': 'GRS80',
+            'proj' : 'utm',
+            'zone' : utm_zone,
+            'units': 'm'}
+
+
+def is_utm(crs):
+    """
+    Check if a CRS is a UTM zone.
+    
+    Parameters
+    ----------
+    crs : dict or pyproj CRS
+    
+    Returns
+    -------
+    bool
+    """
+    
+    if isinstance(crs, dict):
+        return crs.get('proj') == 'utm'
+    return getattr(crs, 'utm_zone', None) is not None
+
+
+def get_transform_function(crs, to_crs):
+    """
+    Get a function that transforms arrays of x and y coordinates from one CRS to another.
+    
+    Setting up a transformation is much slower than running it, so each pair of CRSs' function is 
+    cached and reused.
+    
+    Parameters
+    ----------
+    crs : dict
+        the CRS to transform coordinates from
+    to_crs : dict
+        the CRS to transform coordinates to
+    
+    Returns
+    -------
+    function
+        takes arrays of x and y coordinates, and returns a tuple of arrays of the transformed x and y coordinates
+    """
+    
+    key = (get_crs_key(crs), get_crs_key(to_crs))
+    with transform_functions_lock:
+        if key in transform_functions:
+            return transform_functions[key]
+        
+        if hasattr(pyproj, 'Transformer'):
+            transformer = pyproj.Transformer.from_crs(pyproj.CRS.from_user_input(crs), pyproj.CRS.from_user_input(to_crs), always_xy=True)
+            transform = transformer.transform
+        else:
+            # older versions of pyproj transform between a pair of Proj objects
+            proj = pyproj.Proj(crs)
+            to_proj = pyproj.Proj(to_crs)
+            transform = lambda x, y: pyproj.transform(proj, to_proj, x, y)
+        transform_functions[key] = transform
+        return transform
+
+
+def transform_geometry(geometry, transform):
+    """
+    Transform the coordinates of a shapely geometry of any type.
+    
+    Parameters
+    ----------
+    geometry : shapely geometry
+    transform : function
+        see get_transform_function
+    
+    Returns
+    -------
+    shapely geometry
+    """
+    
+    if int(shapely.__version__.split('.')[0]) >= 2:
+        # shapely 2 passes all the geometry's coordinates in one array
+        return shapely.transform(geometry, lambda coords: np.column_stack(transform(coords[:, 0], coords[:, 1])))
+    return shapely_transform(transform, geometry)
 
 
 def project_geometry(geometry, crs={'init':'epsg:4326'}, to_crs=None, to_latlong=False):
     """
-    Project a shapely Polygon or MultiPolygon from lat-long to UTM, or vice-versa
+    Project a shapely geometry from lat-long to UTM, or vice-versa
     
     Parameters
     ----------
-    geometry : shapely Polygon or MultiPolygon
+    geometry : shapely geometry
         the geometry to project
     crs : dict
         the starting coordinate reference system of the passed-in geometry (default is lat-long)
@@ -35,19 +164,25 @@ def project_geometry(geometry, crs={'init':'epsg:4326'}, to_crs=None, to_latlong
     tuple
         (geometry_proj, crs), the projected shapely geometry and the crs of the projected geometry
     """
-    gdf = gpd.GeoDataFrame()
-    gdf.crs = crs
-    gdf.gdf_name = 'geometry to project'
-    gdf['geometry'] = None
-    gdf.loc[0, 'geometry'] = geometry
-    gdf_proj = project_gdf(gdf, to_crs=to_crs, to_latlong=to_latlong)
-    geometry_proj = gdf_proj['geometry'].iloc[0]
-    return geometry_proj, gdf_proj.crs
+    
+    if to_crs is None:
+        if to_latlong:
+            to_crs = {'init':'epsg:4326'}
+        elif is_utm(crs):
+            # if the geometry is already in UTM, just return it
+            return geometry, crs
+        else:
+            # choose the UTM zone from the middle of the geometry's bounds
+            west, south, east, north = geometry.bounds
+            to_crs = get_utm_crs((west + east) / 2.)
+    
+    geometry_proj = transform_geometry(geometry, get_transform_function(crs, to_crs))
+    return geometry_proj, to_crs
 
 
 def project_gdf(gdf, to_crs=None, to_latlong=False):
     """
-    Project a GeoDataFrame to the UTM zone appropriate for its geometries' centroid. 
+    Project a GeoDataFrame to the UTM zone appropriate for its geometries' bounds. 
     
     The simple calculation in this function works well for most latitudes, but won't 
     work for some far northern locations like Svalbard and parts of far northern Norway.
@@ -76,7 +211,7 @@ def project_gdf(gdf, to_crs=None, to_latlong=False):
     if to_crs is not None:
         projected_gdf = gdf.to_crs(to_crs)
         
-    # if to_crs was not passed-in, calculate the centroid of the geometry to determine UTM zone
+    # if to_crs was not passed-in, calculate the middle of the gdf's bounds to determine UTM zone
     else:
         if to_latlong:
             # if to_latlong is True, project the gdf to latlong
@@ -86,109 +221,354 @@ def project_gdf(gdf, to_crs=None, to_latlong=False):
         else:
             # else, project the gdf to UTM
             # if GeoDataFrame is already in UTM, just return it
-            if (not gdf.crs is None) and ('proj' in gdf.crs) and (gdf.crs['proj'] == 'utm'):
+            if is_utm(gdf.crs):
                 return gdf
             
-            # calculate the centroid of the union of all the geometries in the GeoDataFrame
-            avg_longitude = gdf['geometry'].unary_union.centroid.x
-            
-            # calculate the UTM zone from this avg longitude and define the UTM CRS to project
-            utm_zone = int(math.floor((avg_longitude + 180) / 6.) + 1)
-            utm_crs = {'datum': 'NAD83',
-                       'ellps': 'GRS80',
-                       'proj' : 'utm',
-                       'zone' : utm_zone,
-                       'units': 'm'}
+            # calculate the UTM zone from the middle of the bounds of all the geometries in the GeoDataFrame
+            west, south, east, north = gdf['geometry'].total_bounds
+            utm_crs = get_utm_crs((west + east) / 2.)
         
             # project the GeoDataFrame to the UTM CRS
             projected_gdf = gdf.to_crs(utm_crs)
-            log('Projected the GeoDataFrame "{}" to UTM-{} in {:,.2f} seconds'.format(gdf.gdf_name, utm_zone, time.time()-start_time))
+            log('Projected the GeoDataFrame "{}" to UTM-{} in {:,.2f} seconds'.format(gdf.gdf_name, utm_crs['zone'], time.time()-start_time))
     
     projected_gdf.gdf_name = gdf.gdf_name
     return projected_gdf
 
     
-def project_graph(G, to_crs=None):
+def project_graph(G, to_crs=None, to_latlong=False):
     """
     Project a graph from lat-long to the UTM zone appropriate for its geographic location.
     
+    The nodes' coordinates and the vertices of all the edges' geometries are gathered into arrays 
+    and transformed in one bulk call each, then written into a new graph.
+    
     Parameters
     ----------
-    G : networkx multidigraph
-        the networkx graph to be projected
+    G : networkx multidigraph or CompactGraph
+        the graph to be projected
     to_crs : dict
         if not None, just project to this CRS instead of to UTM
+    to_latlong : bool
+        if True, project from the graph's crs to lat-long instead of to UTM
     
     Returns
     -------
-    networkx multidigraph
+    networkx multidigraph or CompactGraph
     """
     
-    G_proj = G.copy()
     start_time = time.time()
+    compact = isinstance(G, CompactGraph)
     
-    # create a GeoDataFrame of the nodes, name it, convert osmid to str
-    nodes = {node:data for node, data in G_proj.nodes(data=True)}
-    gdf_nodes = gpd.GeoDataFrame(nodes).T
-    gdf_nodes.crs = G_proj.graph['crs']
-    gdf_nodes.gdf_name = '{}_nodes'.format(G_proj.name)
-    gdf_nodes['osmid'] = gdf_nodes['osmid'].astype(np.int64).map(make_str)
-    
-    # create new lat/lon columns just to save that data for later, and create a geometry column from x/y
-    gdf_nodes['lon'] = gdf_nodes['x']
-    gdf_nodes['lat'] = gdf_nodes['y']
-    gdf_nodes['geometry'] = gdf_nodes.apply(lambda row: Point(row['x'], row['y']), axis=1)
-    log('Created a GeoDataFrame from graph in {:,.2f} seconds'.format(time.time()-start_time))
-    
-    # project the nodes GeoDataFrame to UTM
-    gdf_nodes_utm = project_gdf(gdf_nodes, to_crs=to_crs)
-    
-    # extract data for all edges that have geometry attribute
-    edges_with_geom = []
-    for u, v, key, data in G_proj.edges(keys=True, data=True):
-        if 'geometry' in data:
-            edges_with_geom.append({'u':u, 'v':v, 'key':key, 'geometry':data['geometry']})
+    # gather the nodes' coordinates into arrays
+    if compact:
+        nodes = None
+        x = G.node_values('x').astype(np.float64)
+        y = G.node_values('y').astype(np.float64)
+    else:
+        nodes = G.nodes()
+        x = np.array([G.node[node]['x'] for node in nodes], dtype=np.float64)
+        y = np.array([G.node[node]['y'] for node in nodes], dtype=np.float64)
+    assert len(x) > 0, 'You cannot project an empty graph.'
+    
+    # choose the CRS to project to, calculating the UTM zone from the nodes' average longitude if not specified
+    crs = G.graph['crs']
+    graph_name = G.graph.get('name', 'unnamed')
+    if to_crs is not None:
+        projected_crs = to_crs
+    elif to_latlong:
+        projected_crs = {'init':'epsg:4326'}
+        if graph_name.endswith('_UTM'):
+            graph_name = graph_name[:-len('_UTM')]
+    else:
+        projected_crs = get_utm_crs(x.mean())
+    
+    # if the graph is already in UTM (and was not asked to go elsewhere), its coordinates stay as they are
+    already_utm = to_crs is None and not to_latlong and is_utm(crs)
+    if already_utm:
+        projected_crs = crs
+        transform = lambda x, y: (x, y)
+    else:
+        transform = get_transform_function(crs, projected_crs)
     
-    # create an edges GeoDataFrame and project to UTM, if there were any edges with a geometry attribute
-    # geom attr only exists if graph has been simplified, otherwise you don't have to project anything for the edges because the nodes still contain all spatial data
-    if len(edges_with_geom) > 0:
-        gdf_edges = gpd.GeoDataFrame(edges_with_geom)
-        gdf_edges.crs = G_proj.graph['crs']
-        gdf_edges.gdf_name = '{}_edges'.format(G_proj.name)
-        gdf_edges_utm = project_gdf(gdf_edges, to_crs=to_crs)
+    # project the nodes' coordinates in one bulk call
+    x_proj, y_proj = transform(x, y)
+    x_proj = np.asarray(x_proj, dtype=np.float64)
+    y_proj = np.asarray(y_proj, dtype=np.float64)
+    log('Projected {:,} nodes in {:,.2f} seconds'.format(len(x), time.time()-start_time))
     
-    # extract projected x and y values from the nodes' geometry column
     start_time = time.time()
-    gdf_nodes_utm['x'] = gdf_nodes_utm['geometry'].map(lambda point: point.x)
-    gdf_nodes_utm['y'] = gdf_nodes_utm['geometry'].map(lambda point: point.y)
-    gdf_nodes_utm = gdf_nodes_utm.drop('geometry', axis=1)
-    log('Extracted projected node geometries from GeoDataFrame in {:,.2f} seconds'.format(time.time()-start_time))
+    if compact:
+        G_proj = project_compact_graph(G, x, y, x_proj, y_proj, transform, to_latlong)
+    else:
+        G_proj = project_networkx_graph(G, nodes, x, y, x_proj, y_proj, transform, to_latlong)
     
-    # clear the graph to make it a blank slate for the projected data
-    start_time = time.time()
-    edges = list(G_proj.edges(keys=True, data=True))
-    graph_name = G_proj.graph['name']
-    G_proj.clear()
-    
-    # add the projected nodes and all their attributes to the graph
-    G_proj.add_nodes_from(gdf_nodes_utm.index)
-    attributes = gdf_nodes_utm.to_dict()
-    for name in gdf_nodes_utm.columns:
-        nx.set_node_attributes(G_proj, name, attributes[name])
-
-    # add the edges and all their attributes (including reconstructed geometry, when it exists) to the graph
-    for u, v, key, attributes in edges:
-        if 'geometry' in attributes:
-            row = gdf_edges_utm[(gdf_edges_utm['u']==u) & (gdf_edges_utm['v']==v) & (gdf_edges_utm['key']==key)]
-            attributes['geometry'] = row['geometry'].iloc[0]
-        G_proj.add_edge(u, v, key=key, **attributes)
-    
-    # set the graph's CRS attribute to the new, projected CRS and return the projected graph
-    G_proj.graph['crs'] = gdf_nodes_utm.crs
-    G_proj.graph['name'] = '{}_UTM'.format(graph_name)
-    if 'streets_per_node' in G.graph:
-        G_proj.graph['streets_per_node'] = G.graph['streets_per_node']
+    # set the graph's CRS attribute to the new, projected CRS and return the projected graph, 
+    # without the coordinate views of the original graph
+    G_proj.graph.pop('crs_views', None)
+    G_proj.graph['crs'] = projected_crs
+    G_proj.graph['name'] = graph_name if to_latlong else '{}_UTM'.format(graph_name)
     log('Rebuilt projected graph in {:,.2f} seconds'.format(time.time()-start_time))
     return G_proj
 
-    
\ No newline at end of file
+
+def project_linestrings(geometries, transform):
+    """
+    Project a list of LineStrings, transforming all their vertices in one bulk call.
+    
+    Parameters
+    ----------
+    geometries : list
+        the LineStrings to project
+    transform : function
+        see get_transform_function
+    
+    Returns
+    -------
+    list
+        the projected LineStrings
+    """
+    
+    column = make_column(geometries)
+    if column['kind'] == 'geometry':
+        # all of the geometries are 2D LineStrings, so transform their coordinates in one flat array
+        x_proj, y_proj = transform(column['coords'][:, 0], column['coords'][:, 1])
+        column['coords'] = np.column_stack([x_proj, y_proj])
+        return get_column_list(column)
+    else:
+        # otherwise, fall back to transforming each geometry's coordinates
+        return [transform_geometry(geometry, transform) for geometry in geometries]
+
+
+def project_networkx_graph(G, nodes, x, y, x_proj, y_proj, transform, to_latlong):
+    """
+    Build a projected copy of a networkx graph, given its nodes' original and projected coordinates.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    nodes : list
+        the graph's nodes, in the order of the coordinate arrays
+    x : numpy array
+    y : numpy array
+    x_proj : numpy array
+    y_proj : numpy array
+    transform : function
+        see get_transform_function, for the edges' geometries
+    to_latlong : bool
+        if False, keep the original coordinates as lon and lat attributes
+    
+    Returns
+    -------
+    networkx multidigraph
+    """
+    
+    G_proj = G.__class__()
+    G_proj.graph.update(copy.deepcopy({key:value for key, value in G.graph.items() if key != 'crs_views'}))
+    
+    # copy each node's attributes (see copy_attributes), with its projected coordinates and osmid converted to str
+    node_data = []
+    for node, node_x, node_y, node_x_proj, node_y_proj in zip(nodes, x.tolist(), y.tolist(), x_proj.tolist(), y_proj.tolist()):
+        data = copy_attributes(G.node[node])
+        if 'osmid' in data:
+            data['osmid'] = make_str(int(data['osmid']))
+        if not to_latlong:
+            # save the lat/lon data for later
+            data['lon'] = node_x
+            data['lat'] = node_y
+        data['x'] = node_x_proj
+        data['y'] = node_y_proj
+        node_data.append((node, data))
+    G_proj.add_nodes_from(node_data)
+    
+    # project all the edges' geometries at once, then add the edges with copies of their attributes
+    edges = list(G.edges(keys=True, data=True))
+    edges_with_geom = [data for u, v, key, data in edges if 'geometry' in data]
+    projected_geoms = iter(project_linestrings([data['geometry'] for data in edges_with_geom], transform))
+    edge_data = []
+    for u, v, key, data in edges:
+        data = copy_attributes(data)
+        if 'geometry' in data:
+            data['geometry'] = next(projected_geoms)
+        edge_data.append((u, v, key, data))
+    G_proj.add_edges_from(edge_data)
+    return G_proj
+
+
+def project_compact_graph(C, x, y, x_proj, y_proj, transform, to_latlong):
+    """
+    Build a projected copy of a CompactGraph, given its nodes' original and projected coordinates.
+    
+    Parameters
+    ----------
+    C : CompactGraph
+    x : numpy array
+    y : numpy array
+    x_proj : numpy array
+    y_proj : numpy array
+    transform : function
+        see get_transform_function, for the edges' geometries
+    to_latlong : bool
+        if False, keep the original coordinates as lon and lat columns
+    
+    Returns
+    -------
+    CompactGraph
+    """
+    
+    C_proj = C.copy()
+    if 'osmid' in C_proj.node_columns:
+        osmids = get_column_list(C_proj.node_columns['osmid'])
+        C_proj.node_columns['osmid'] = make_column([make_str(int(osmid)) if osmid is not None else None for osmid in osmids])
+    if not to_latlong:
+        C_proj.node_columns['lon'] = make_float_column(x)
+        C_proj.node_columns['lat'] = make_float_column(y)
+    C_proj.node_columns['x'] = make_float_column(x_proj)
+    C_proj.node_columns['y'] = make_float_column(y_proj)
+    
+    # transform the flat array of all the edges' geometries' vertices at once
+    if 'geometry' in C_proj.edge_columns:
+        column = C_proj.edge_columns['geometry']
+        if column['kind'] == 'geometry':
+            if len(column['coords']) > 0:
+                coords_x, coords_y = transform(column['coords'][:, 0], column['coords'][:, 1])
+                column['coords'] = np.column_stack([coords_x, coords_y])
+        else:
+            C_proj.edge_columns['geometry'] = make_column([transform_geometry(geometry, transform) if geometry is not None else None 
+                                                           for geometry in get_column_list(column)])
+    return C_proj
+
+
+def add_crs_view(G, to_crs=None):
+    """
+    Attach a graph's node coordinates in another CRS to it, as arrays, without changing its active CRS.
+    
+    The graph keeps a view of its coordinates in each CRS added, in G.graph['crs_views'], so 
+    set_graph_crs can switch between them without reprojecting the nodes or copying the graph.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    to_crs : dict
+        the CRS to add, if None, add the UTM zone appropriate for a lat-long graph, or lat-long for a projected one
+    
+    Returns
+    -------
+    dict
+        the CRS added
+    """
+    
+    start_time = time.time()
+    crs = G.graph['crs']
+    nodes = G.nodes()
+    x = np.array([G.node[node]['x'] for node in nodes], dtype=np.float64)
+    y = np.array([G.node[node]['y'] for node in nodes], dtype=np.float64)
+    if to_crs is None:
+        to_crs = {'init':'epsg:4326'} if is_utm(crs) else get_utm_crs(x.mean())
+    
+    # the view of the active CRS is just the current coordinates, and the other is transformed from them in one bulk call
+    x_proj, y_proj = get_transform_function(crs, to_crs)(x, y)
+    views = G.graph.setdefault('crs_views', {})
+    views[get_crs_key(crs)] = {'crs':crs, 'nodes':nodes, 'x':x, 'y':y, 'geometries':{}}
+    views[get_crs_key(to_crs)] = {'crs':to_crs, 'nodes':nodes, 'x':np.asarray(x_proj, dtype=np.float64), 
+                                  'y':np.asarray(y_proj, dtype=np.float64), 'geometries':{}}
+    log('Added a view of the graph in {} in {:,.2f} seconds'.format(to_crs, time.time()-start_time))
+    return to_crs
+
+
+def set_graph_crs(G, crs):
+    """
+    Switch a graph's active CRS, in place, by writing its coordinate view in that CRS into the nodes' x and y.
+    
+    The view is added with add_crs_view first if the graph does not have it yet (or its nodes have 
+    changed since), and the nodes whose coordinates were edited since the last switch are reprojected 
+    into it. The edges' geometry attributes are switched too, so everything that reads them 
+    gets them in the active CRS: each view keeps the geometries it was last switched to, so only the 
+    geometries added or edited since then (or never in that CRS before) are reprojected, in one bulk call.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    crs : dict
+        the CRS to switch to
+    
+    Returns
+    -------
+    networkx multidigraph
+    """
+    
+    start_time = time.time()
+    key = get_crs_key(crs)
+    active_crs = G.graph['crs']
+    if key == get_crs_key(active_crs):
+        return G
+    
+    view = G.graph.get('crs_views', {}).get(key)
+    if view is None or len(view['nodes']) != len(G) or not all(node in G.node for node in view['nodes']):
+        add_crs_view(G, crs)
+        view = G.graph['crs_views'][key]
+    active_view = G.graph['crs_views'].setdefault(get_crs_key(active_crs), {'crs':active_crs, 'geometries':{}})
+    
+    # refresh the view of the CRS being switched away from, and reproject the nodes whose coordinates were 
+    # edited since it was (so differ from its stored ones) into the view being switched to
+    x = np.array([G.node[node]['x'] for node in view['nodes']], dtype=np.float64)
+    y = np.array([G.node[node]['y'] for node in view['nodes']], dtype=np.float64)
+    if active_view.get('nodes') == view['nodes'] and 'x' in active_view:
+        edited = (x != active_view['x']) | (y != active_view['y'])
+    else:
+        edited = np.ones(len(x), dtype=bool)
+    if edited.any():
+        x_proj, y_proj = get_transform_function(active_crs, crs)(x[edited], y[edited])
+        view['x'][edited] = x_proj
+        view['y'][edited] = y_proj
+    active_view['nodes'] = view['nodes']
+    active_view['x'] = x
+    active_view['y'] = y
+    for node, x, y in zip(view['nodes'], view['x'].tolist(), view['y'].tolist()):
+        data = G.node[node]
+        data['x'] = x
+        data['y'] = y
+    
+    # a geometry that is not the one the active view was switched to was added or edited since, so the 
+    # view's geometry of that edge is stale: reproject those and the ones the view does not have
+    edges = [((u, v, edge_key), data) for u, v, edge_key, data in G.edges(keys=True, data=True) if 'geometry' in data]
+    active_geometries = active_view['geometries']
+    geometries = view['geometries']
+    missing = [edge for edge, data in edges if not edge in geometries or active_geometries.get(edge) is not data['geometry']]
+    geometries.update(zip(missing, project_linestrings([G.edge[u][v][edge_key]['geometry'] for u, v, edge_key in missing], 
+                                                       get_transform_function(active_crs, crs))))
+    active_view['geometries'] = {}
+    view['geometries'] = {}
+    for edge, data in edges:
+        active_view['geometries'][edge] = data['geometry']
+        data['geometry'] = view['geometries'][edge] = geometries[edge]
+    
+    G.graph['crs'] = view['crs']
+    clear_nearest_indexes(G)
+    log('Switched the graph to {} ({:,} edge geometries reprojected) in {:,.2f} seconds'.format(view['crs'], len(missing), time.time()-start_time))
+    return G
+
+
+def get_edge_geometry(G, u, v, key=0):
+    """
+    Get an edge's geometry in the graph's CRS, or a straight line between its nodes if it has no geometry attribute.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    u : int
+        the edge's origin node
+    v : int
+        the edge's destination node
+    key : int
+        the edge's key
+    
+    Returns
+    -------
+    shapely LineString
+    """
+    
+    data = G.edge[u][v][key]
+    if 'geometry' in data:
+        return data['geometry']
+    return LineString([(G.node[u]['x'], G.node[u]['y']), (G.node[v]['x'], G.node[v]['y'])])
@@ -9,15 +9,28 @@ import re
 import time
 import os
 import ast
+import copy
+import json
 import numpy as np
 import pandas as pd
 import geopandas as gpd
 import networkx as nx
+import pyproj
 from shapely.geometry import Point, LineString
 from shapely import wkt
+from shapely.wkb import loads as wkb_loads
+
+# pyarrow is only needed to save and load graphs as Parquet
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError as e:
+    pa = None
+    pq = None
 
 from . import globals
-from .utils import log, make_str
+from .utils import log, make_str, get_node_id_array
+from .compact import CompactGraph, graph_to_compact, compact_to_graph, make_column, take_column
 
 
 def save_gdf_shapefile(gdf, filename=None, folder=None):
@@ -154,8 +167,10 @@ def save_graphml(G, filename='graph.graphml', folder=None):
     if folder is None:
         folder = globals.data_folder
     
-    # create a copy and convert all the node/edge attribute values to string or it won't save
+    # create a copy and convert all the node/edge attribute values to string or it won't save, 
+    # leaving out the graph's coordinate views in other CRSs, which can be rebuilt with add_crs_view
     G_save = G.copy()
+    G_save.graph.pop('crs_views', None)
     for dict_key in G_save.graph:
         # convert all the graph attribute values to strings
         G_save.graph[dict_key] = make_str(G_save.graph[dict_key])
@@ -243,6 +258,760 @@ def load_graphml(filename, folder=None):
     return G
     
 
+def save_binary_array(array, folder, name, allow_pickle=False):
+    """
+    Save an array as a .npy file, and return its file name.
+    
+    Parameters
+    ----------
+    array : numpy array
+    folder : string
+    name : string
+        the file name, without extension
+    allow_pickle : bool
+        if True, allow saving arrays of python objects (which cannot be memory-mapped)
+    
+    Returns
+    -------
+    string
+    """
+    
+    filename = '{}.npy'.format(name)
+    np.save(os.path.join(folder, filename), np.asarray(array), allow_pickle=allow_pickle)
+    return filename
+
+
+def save_binary_column(column, folder, name):
+    """
+    Save a CompactGraph column as .npy files, and return its metadata.
+    
+    Object columns are dictionary-encoded: each unique value is stored once as JSON, and each row 
+    as an integer code. Objects that cannot be stored as JSON are pickled instead.
+    
+    Parameters
+    ----------
+    column : dict
+        see CompactGraph
+    folder : string
+    name : string
+        the prefix of the column's file names
+    
+    Returns
+    -------
+    dict
+    """
+    
+    meta = {'kind':column['kind'], 'files':{'mask':save_binary_array(column['mask'], folder, '{}_mask'.format(name))}}
+    if column['kind'] == 'category':
+        meta['files']['codes'] = save_binary_array(column['codes'], folder, '{}_codes'.format(name))
+        meta['categories'] = column['categories']
+    elif column['kind'] == 'geometry':
+        meta['files']['coords'] = save_binary_array(column['coords'], folder, '{}_coords'.format(name))
+        meta['files']['offsets'] = save_binary_array(column['offsets'], folder, '{}_offsets'.format(name))
+    elif column['kind'] == 'object':
+        try:
+            categories = []
+            category_codes = {}
+            codes = np.full(len(column['values']), -1, dtype=np.int32)
+            for position, (value, present) in enumerate(zip(column['values'], column['mask'].tolist())):
+                if present:
+                    value_json = json.dumps(value)
+                    if not value_json in category_codes:
+                        category_codes[value_json] = len(categories)
+                        categories.append(value_json)
+                    codes[position] = category_codes[value_json]
+            meta['kind'] = 'json'
+            meta['files']['codes'] = save_binary_array(codes, folder, '{}_codes'.format(name))
+            meta['categories'] = categories
+        except TypeError:
+            meta['files']['values'] = save_binary_array(column['values'], folder, '{}_values'.format(name), allow_pickle=True)
+    else:
+        meta['files']['values'] = save_binary_array(column['values'], folder, '{}_values'.format(name))
+    return meta
+
+
+def decode_json_codes(categories, codes):
+    """
+    Decode a dictionary-encoded column of JSON strings into an array of objects.
+    
+    Each unique value is decoded once, but each row gets its own copy of a mutable value, such as a 
+    list of osmids, so that editing one edge's value does not change the others'.
+    
+    Parameters
+    ----------
+    categories : list
+        the unique JSON strings
+    codes : numpy array
+        each row's position in categories, or -1 if it has no value
+    
+    Returns
+    -------
+    numpy array
+    """
+    
+    decoded = [json.loads(category) for category in categories]
+    values = np.empty(len(codes), dtype=object)
+    for row, code in enumerate(np.asarray(codes).tolist()):
+        if code >= 0:
+            value = decoded[code]
+            values[row] = copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+    return values
+
+
+def load_binary_column(meta, folder, mmap_mode='r'):
+    """
+    Load a CompactGraph column saved with save_binary_column.
+    
+    Parameters
+    ----------
+    meta : dict
+        the column's metadata
+    folder : string
+    mmap_mode : string
+        how to memory-map the column's arrays, see numpy.load, if None, read them into memory
+    
+    Returns
+    -------
+    dict
+    """
+    
+    arrays = {}
+    for array_name, filename in meta['files'].items():
+        if meta['kind'] == 'object':
+            # pickled arrays of objects cannot be memory-mapped
+            arrays[array_name] = np.load(os.path.join(folder, filename), allow_pickle=True)
+        else:
+            arrays[array_name] = np.load(os.path.join(folder, filename), mmap_mode=mmap_mode)
+    
+    if meta['kind'] == 'json':
+        return {'kind':'object', 'mask':arrays['mask'], 'values':decode_json_codes(meta['categories'], arrays['codes'])}
+    
+    column = dict(arrays, kind=meta['kind'])
+    if meta['kind'] == 'category':
+        column['categories'] = meta['categories']
+    return column
+
+
+def get_graph_literals(graph):
+    """
+    Convert a graph's attributes to python literal strings, to save them to disk.
+    
+    The graph's coordinate views in other CRSs are left out, as they can be rebuilt with add_crs_view.
+    
+    Parameters
+    ----------
+    graph : dict
+        the graph's attributes
+    
+    Returns
+    -------
+    dict
+    """
+    
+    return {key:repr(value) for key, value in graph.items() if key != 'crs_views'}
+
+
+def parse_graph_literals(literals):
+    """
+    Parse a graph's attributes from python literal strings, leaving any that are not literals as strings.
+    
+    Parameters
+    ----------
+    literals : dict
+    
+    Returns
+    -------
+    dict
+    """
+    
+    graph = {}
+    for key, value in literals.items():
+        try:
+            graph[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            graph[key] = value
+    return graph
+
+
+def save_graph_binary(G, filename='graph', folder=None):
+    """
+    Save graph to disk in a binary, columnar format: a folder of .npy files and a JSON metadata file.
+    
+    The graph's adjacency and its attributes are stored as the arrays of its CompactGraph: typed 
+    arrays of numbers and bools, dictionary-encoded tags, and edge geometries as one flat array of 
+    coordinates plus offsets. Loading it with load_graph_binary is much faster than loading GraphML, 
+    and can memory-map the arrays instead of reading them.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph or CompactGraph
+    filename : string
+        the name of the folder to save the graph's files in
+    folder : string
+        the folder to contain it, if None, use default data folder
+    
+    Returns
+    -------
+    None
+    """
+    
+    start_time = time.time()
+    if folder is None:
+        folder = globals.data_folder
+    path = os.path.join(folder, filename)
+    if not os.path.exists(path):
+        os.makedirs(path)
+    
+    C = G if isinstance(G, CompactGraph) else graph_to_compact(G)
+    
+    meta = {'format_version':1,
+            'graph':get_graph_literals(C.graph),
+            'nodes':save_binary_column({'kind':'int' if C.node_ids.dtype.kind in 'iu' else 'object', 
+                                        'mask':np.ones(len(C.node_ids), dtype=bool), 'values':C.node_ids}, path, 'node_ids'),
+            'keys':save_binary_column({'kind':'int' if C.keys.dtype.kind in 'iu' else 'object', 
+                                       'mask':np.ones(len(C.keys), dtype=bool), 'values':C.keys}, path, 'keys'),
+            'indptr':save_binary_array(C.indptr, path, 'indptr'),
+            'targets':save_binary_array(C.targets, path, 'targets'),
+            'node_columns':[],
+            'edge_columns':[]}
+    for position, (name, column) in enumerate(C.node_columns.items()):
+        column_meta = save_binary_column(column, path, 'node_column_{}'.format(position))
+        column_meta['name'] = name
+        meta['node_columns'].append(column_meta)
+    for position, (name, column) in enumerate(C.edge_columns.items()):
+        column_meta = save_binary_column(column, path, 'edge_column_{}'.format(position))
+        column_meta['name'] = name
+        meta['edge_columns'].append(column_meta)
+    
+    with open(os.path.join(path, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    log('Saved graph "{}" to disk as binary at "{}" in {:,.2f} seconds'.format(C.graph.get('name'), path, time.time()-start_time))
+
+
+def load_graph_binary(filename='graph', folder=None, compact=False, mmap_mode='r'):
+    """
+    Load a graph saved with save_graph_binary.
+    
+    Parameters
+    ----------
+    filename : string
+        the name of the folder the graph's files are in
+    folder : string
+        the folder containing it, if None, use default data folder
+    compact : bool
+        if True, return a CompactGraph whose arrays are memory-mapped, which is nearly instant, 
+        else convert it into a networkx multidigraph
+    mmap_mode : string
+        how to memory-map the arrays, see numpy.load, if None, read them into memory
+    
+    Returns
+    -------
+    networkx multidigraph or CompactGraph
+    """
+    
+    start_time = time.time()
+    if folder is None:
+        folder = globals.data_folder
+    path = os.path.join(folder, filename)
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    
+    node_ids = load_binary_column(meta['nodes'], path, mmap_mode)['values']
+    keys = load_binary_column(meta['keys'], path, mmap_mode)['values']
+    C = CompactGraph(node_ids=node_ids,
+                     indptr=np.load(os.path.join(path, meta['indptr']), mmap_mode=mmap_mode),
+                     targets=np.load(os.path.join(path, meta['targets']), mmap_mode=mmap_mode),
+                     keys=keys,
+                     node_columns={column_meta['name']:load_binary_column(column_meta, path, mmap_mode) for column_meta in meta['node_columns']},
+                     edge_columns={column_meta['name']:load_binary_column(column_meta, path, mmap_mode) for column_meta in meta['edge_columns']},
+                     graph=parse_graph_literals(meta['graph']))
+    log('Loaded compact graph with {:,} nodes and {:,} edges in {:,.2f} seconds from "{}"'.format(len(C), C.number_of_edges(), time.time()-start_time, path))
+    
+    if compact:
+        return C
+    return compact_to_graph(C)
+
+
+def get_point_wkb(x, y):
+    """
+    Encode points as well-known binary, straight from arrays of their coordinates.
+    
+    Parameters
+    ----------
+    x : numpy array
+    y : numpy array
+    
+    Returns
+    -------
+    tuple
+        (wkb, byte_offsets), a uint8 array of all the points' WKB, point i's from byte_offsets[i] to byte_offsets[i+1]
+    """
+    
+    # each point is a byte order flag (1, little endian), a uint32 geometry type (1, point), and two float64s
+    wkb = np.zeros((len(x), 21), dtype=np.uint8)
+    wkb[:, 0] = 1
+    wkb[:, 1:5] = np.array([1], dtype='<u4').view(np.uint8)
+    wkb[:, 5:] = np.column_stack([x, y]).astype('<f8').view(np.uint8).reshape(-1, 16)
+    return wkb.ravel(), np.arange(len(x) + 1, dtype=np.int64) * 21
+
+
+def get_linestring_wkb(coords, offsets):
+    """
+    Encode LineStrings as well-known binary, straight from a flat array of their coordinates.
+    
+    Parameters
+    ----------
+    coords : numpy array
+        the x, y coordinates of all the LineStrings, one row per vertex
+    offsets : numpy array
+        the rows of each LineString's first vertex, plus the number of rows at the end
+    
+    Returns
+    -------
+    tuple
+        (wkb, byte_offsets), a uint8 array of all the LineStrings' WKB, LineString i's from byte_offsets[i] to byte_offsets[i+1]
+    """
+    
+    # each LineString is a byte order flag (1, little endian), a uint32 geometry type (2, LineString), 
+    # a uint32 count of vertices, then two float64s per vertex
+    counts = np.diff(offsets)
+    byte_offsets = np.concatenate([[0], np.cumsum(9 + 16 * counts)]).astype(np.int64)
+    wkb = np.empty(byte_offsets[-1], dtype=np.uint8)
+    headers = np.zeros((len(counts), 9), dtype=np.uint8)
+    headers[:, 0] = 1
+    headers[:, 1:5] = np.array([2], dtype='<u4').view(np.uint8)
+    headers[:, 5:] = counts.astype('<u4').view(np.uint8).reshape(-1, 4)
+    wkb[(byte_offsets[:-1, None] + np.arange(9)).ravel()] = headers.ravel()
+    
+    # then write each vertex's coordinates after its LineString's header
+    coord_starts = np.repeat(byte_offsets[:-1] + 9 - 16 * offsets[:-1], counts) + 16 * np.arange(len(coords))
+    wkb[(coord_starts[:, None] + np.arange(16)).ravel()] = np.ascontiguousarray(coords, dtype='<f8').view(np.uint8).ravel()
+    return wkb, byte_offsets
+
+
+def parse_linestring_wkb(wkb, byte_offsets, mask):
+    """
+    Decode well-known binary LineStrings into a flat array of their coordinates, without shapely.
+    
+    Parameters
+    ----------
+    wkb : numpy array
+        a uint8 array of all the geometries' WKB
+    byte_offsets : numpy array
+        the position of each geometry's first byte, plus the number of bytes at the end
+    mask : numpy array
+        which geometries are present
+    
+    Returns
+    -------
+    tuple
+        (coords, offsets) as in get_linestring_wkb, or None if the geometries are not all little endian 2D LineStrings
+    """
+    
+    starts = byte_offsets[:-1][mask]
+    sizes = np.diff(byte_offsets)[mask]
+    if (sizes < 9).any():
+        return None
+    headers = wkb[(starts[:, None] + np.arange(9)).ravel()].reshape(-1, 9)
+    types = np.ascontiguousarray(headers[:, 1:5]).view('<u4').ravel()
+    counts = np.ascontiguousarray(headers[:, 5:]).view('<u4').ravel().astype(np.int64)
+    if not ((headers[:, 0] == 1).all() and (types == 2).all() and (sizes == 9 + 16 * counts).all()):
+        return None
+    
+    all_counts = np.zeros(len(mask), dtype=np.int64)
+    all_counts[mask] = counts
+    offsets = np.concatenate([[0], np.cumsum(all_counts)]).astype(np.int64)
+    coord_starts = np.repeat(starts + 9 - 16 * offsets[:-1][mask], counts) + 16 * np.arange(offsets[-1])
+    coords = wkb[(coord_starts[:, None] + np.arange(16)).ravel()].view('<f8').reshape(-1, 2)
+    return coords, offsets
+
+
+def get_filled_edge_geometry(C):
+    """
+    Get the coordinates of every edge's geometry in a CompactGraph, filling in a straight line between 
+    the edge's nodes where it has no geometry.
+    
+    Parameters
+    ----------
+    C : CompactGraph
+    
+    Returns
+    -------
+    tuple
+        (coords, offsets) as in get_linestring_wkb
+    """
+    
+    if 'geometry' in C.edge_columns and C.edge_columns['geometry']['kind'] == 'geometry':
+        column = C.edge_columns['geometry']
+        mask = column['mask']
+        geometry_coords = column['coords']
+        geometry_counts = np.diff(column['offsets'])
+    else:
+        mask = np.zeros(C.number_of_edges(), dtype=bool)
+        geometry_coords = np.zeros((0, 2), dtype=np.float64)
+        geometry_counts = np.zeros(C.number_of_edges(), dtype=np.int64)
+    
+    # copy the existing geometries' coordinates into place, then add the missing ones' two vertices
+    counts = np.where(mask, geometry_counts, 2)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    coords = np.empty((offsets[-1], 2), dtype=np.float64)
+    geometry_offsets = np.concatenate([[0], np.cumsum(geometry_counts)]).astype(np.int64)
+    coords[np.repeat(offsets[:-1] - geometry_offsets[:-1], geometry_counts) + np.arange(len(geometry_coords))] = geometry_coords
+    missing = np.flatnonzero(~mask)
+    node_coords = np.column_stack([C.node_values('x'), C.node_values('y')]).astype(np.float64)
+    coords[offsets[missing]] = node_coords[C.sources()[missing]]
+    coords[offsets[missing] + 1] = node_coords[C.targets[missing]]
+    return coords, offsets
+
+
+def get_wkb_arrow_array(wkb, byte_offsets, mask=None):
+    """
+    Wrap WKB bytes and their offsets in an Arrow binary array, without copying them.
+    
+    Parameters
+    ----------
+    wkb : numpy array
+    byte_offsets : numpy array
+    mask : numpy array
+        which geometries are present, if None, all of them
+    
+    Returns
+    -------
+    pyarrow Array
+    """
+    
+    validity = None
+    if mask is not None and not mask.all():
+        # Arrow's validity bitmaps are least significant bit first, so reverse the bits of each byte
+        bits = np.concatenate([mask, np.zeros(-len(mask) % 8, dtype=bool)]).reshape(-1, 8)[:, ::-1]
+        validity = pa.py_buffer(np.packbits(bits))
+    return pa.Array.from_buffers(pa.large_binary(), len(byte_offsets) - 1, 
+                                 [validity, pa.py_buffer(byte_offsets.astype(np.int64)), pa.py_buffer(wkb)])
+
+
+def compact_column_to_arrow(column):
+    """
+    Convert a CompactGraph column to an Arrow array.
+    
+    Category columns become dictionary-encoded arrays, and object columns (such as lists of osmids) 
+    dictionary-encoded arrays of JSON strings.
+    
+    Parameters
+    ----------
+    column : dict
+    
+    Returns
+    -------
+    tuple
+        (array, is_json), the Arrow array and whether its values are JSON strings
+    """
+    
+    mask = np.asarray(column['mask'])
+    if column['kind'] == 'category':
+        indices = pa.array(np.asarray(column['codes']), mask=~mask)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(column['categories'], type=pa.string())), False
+    elif column['kind'] == 'geometry':
+        wkb, byte_offsets = get_linestring_wkb(column['coords'], column['offsets'])
+        return get_wkb_arrow_array(wkb, byte_offsets, mask), False
+    elif column['kind'] == 'object':
+        values = [json.dumps(value) if present else None for value, present in zip(column['values'], mask.tolist())]
+        return pa.array(values, type=pa.string()).dictionary_encode(), True
+    else:
+        return pa.array(np.asarray(column['values']), mask=~mask), False
+
+
+def arrow_to_compact_column(array, is_json=False, is_geometry=False):
+    """
+    Convert an Arrow array to a CompactGraph column.
+    
+    Parameters
+    ----------
+    array : pyarrow Array or ChunkedArray
+    is_json : bool
+        if True, the array's values are JSON strings to decode
+    is_geometry : bool
+        if True, the array's values are WKB geometries
+    
+    Returns
+    -------
+    dict
+    """
+    
+    if isinstance(array, pa.ChunkedArray):
+        array = array.combine_chunks() if array.num_chunks > 0 else pa.array([], type=array.type)
+    mask = array.is_valid().to_numpy(zero_copy_only=False).astype(bool)
+    
+    if is_geometry:
+        # decode WKB LineStrings straight from the array's buffers, else with shapely
+        if pa.types.is_binary(array.type) or pa.types.is_large_binary(array.type):
+            offset_type = np.int64 if pa.types.is_large_binary(array.type) else np.int32
+            buffers = array.buffers()
+            byte_offsets = np.frombuffer(buffers[1], dtype=offset_type)[array.offset:array.offset + len(array) + 1].astype(np.int64)
+            wkb = np.frombuffer(buffers[2], dtype=np.uint8) if buffers[2] is not None else np.zeros(0, dtype=np.uint8)
+            parsed = parse_linestring_wkb(wkb, byte_offsets, mask)
+            if parsed is not None:
+                return {'kind':'geometry', 'mask':mask, 'coords':parsed[0], 'offsets':parsed[1]}
+        return make_column([wkb_loads(value) if value is not None else None for value in array.to_pylist()])
+    
+    if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+        array = array.dictionary_encode()
+    
+    if pa.types.is_dictionary(array.type):
+        codes = array.indices.fill_null(0).to_numpy(zero_copy_only=False).astype(np.int32)
+        codes[~mask] = -1
+        categories = array.dictionary.to_pylist()
+        if is_json:
+            return {'kind':'object', 'mask':mask, 'values':decode_json_codes(categories, codes)}
+        return {'kind':'category', 'mask':mask, 'codes':codes, 'categories':categories}
+    
+    if pa.types.is_integer(array.type):
+        return {'kind':'int', 'mask':mask, 'values':array.fill_null(0).to_numpy(zero_copy_only=False).astype(np.int64)}
+    if pa.types.is_floating(array.type):
+        return {'kind':'float', 'mask':mask, 'values':array.fill_null(np.nan).to_numpy(zero_copy_only=False).astype(np.float64)}
+    if pa.types.is_boolean(array.type):
+        return {'kind':'bool', 'mask':mask, 'values':array.fill_null(False).to_numpy(zero_copy_only=False).astype(bool)}
+    return make_column(array.to_pylist())
+
+
+def get_geoparquet_metadata(crs, geometry_type):
+    """
+    Get the GeoParquet metadata for a table with one WKB geometry column named geometry.
+    
+    Parameters
+    ----------
+    crs : dict
+        the geometries' CRS
+    geometry_type : string
+        'Point' or 'LineString'
+    
+    Returns
+    -------
+    dict
+    """
+    
+    column = {'encoding':'WKB', 'geometry_types':[geometry_type]}
+    try:
+        column['crs'] = pyproj.CRS.from_user_input(crs).to_json_dict()
+    except Exception:
+        # leave the CRS out if pyproj cannot describe it
+        pass
+    return {'version':'1.0.0', 'primary_column':'geometry', 'columns':{'geometry':column}}
+
+
+def graph_to_arrow(G, fill_edge_geometry=False):
+    """
+    Convert a graph into Arrow tables of its nodes and edges, built straight from its CompactGraph arrays.
+    
+    Both tables have a WKB geometry column and GeoParquet metadata, so they can be saved as GeoParquet.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph or CompactGraph
+    fill_edge_geometry : bool
+        if True, fill in missing edge geometries with a straight line between the edge's nodes, which 
+        then convert back to geometry attributes of those edges
+    
+    Returns
+    -------
+    tuple
+        (nodes_table, edges_table)
+    """
+    
+    if pa is None:
+        raise ImportError('The pyarrow package must be installed to convert graphs to Arrow tables')
+    start_time = time.time()
+    C = G if isinstance(G, CompactGraph) else graph_to_compact(G)
+    osmnx_meta = {'graph':get_graph_literals(C.graph), 'json_columns':[]}
+    crs = C.graph.get('crs')
+    
+    def add_columns(names, arrays, columns):
+        for name, column in columns:
+            array, is_json = compact_column_to_arrow(column)
+            names.append(name)
+            arrays.append(array)
+            if is_json:
+                osmnx_meta['json_columns'].append(name)
+    
+    # the nodes' ids, attributes, and point geometries
+    node_count = len(C.node_ids)
+    node_id_kind = 'int' if np.asarray(C.node_ids).dtype.kind in 'iu' else 'object'
+    node_names = []
+    node_arrays = []
+    add_columns(node_names, node_arrays, [('node', {'kind':node_id_kind, 'mask':np.ones(node_count, dtype=bool), 'values':C.node_ids})])
+    add_columns(node_names, node_arrays, [(name, column) for name, column in C.node_columns.items() if name != 'geometry'])
+    wkb, byte_offsets = get_point_wkb(C.node_values('x').astype(np.float64), C.node_values('y').astype(np.float64))
+    node_names.append('geometry')
+    node_arrays.append(get_wkb_arrow_array(wkb, byte_offsets))
+    
+    # the edges' nodes, keys, attributes, and LineString geometries
+    edge_count = C.number_of_edges()
+    key_kind = 'int' if np.asarray(C.keys).dtype.kind in 'iu' else 'object'
+    edge_names = []
+    edge_arrays = []
+    add_columns(edge_names, edge_arrays, [('u', {'kind':node_id_kind, 'mask':np.ones(edge_count, dtype=bool), 'values':C.node_ids[C.sources()]}),
+                                          ('v', {'kind':node_id_kind, 'mask':np.ones(edge_count, dtype=bool), 'values':C.node_ids[C.targets]}),
+                                          ('key', {'kind':key_kind, 'mask':np.ones(edge_count, dtype=bool), 'values':C.keys})])
+    add_columns(edge_names, edge_arrays, [(name, column) for name, column in C.edge_columns.items() if name != 'geometry'])
+    if fill_edge_geometry:
+        coords, offsets = get_filled_edge_geometry(C)
+        wkb, byte_offsets = get_linestring_wkb(coords, offsets)
+        geometry_array = get_wkb_arrow_array(wkb, byte_offsets)
+    elif 'geometry' in C.edge_columns:
+        geometry_array = compact_column_to_arrow(C.edge_columns['geometry'])[0]
+    else:
+        geometry_array = pa.nulls(edge_count, type=pa.large_binary())
+    edge_names.append('geometry')
+    edge_arrays.append(geometry_array)
+    
+    metadata = {b'osmnx':json.dumps(osmnx_meta).encode('utf-8')}
+    nodes_table = pa.Table.from_arrays(node_arrays, names=node_names)
+    nodes_table = nodes_table.replace_schema_metadata(dict(metadata, geo=json.dumps(get_geoparquet_metadata(crs, 'Point')).encode('utf-8')))
+    edges_table = pa.Table.from_arrays(edge_arrays, names=edge_names)
+    edges_table = edges_table.replace_schema_metadata(dict(metadata, geo=json.dumps(get_geoparquet_metadata(crs, 'LineString')).encode('utf-8')))
+    log('Converted graph to Arrow tables in {:,.2f} seconds'.format(time.time()-start_time))
+    return nodes_table, edges_table
+
+
+def arrow_to_graph(nodes_table, edges_table, compact=False):
+    """
+    Convert Arrow tables of a graph's nodes and edges (see graph_to_arrow) into a graph.
+    
+    Parameters
+    ----------
+    nodes_table : pyarrow Table
+        must have a node column of node ids, and x and y columns
+    edges_table : pyarrow Table
+        must have u, v and key columns
+    compact : bool
+        if True, return a CompactGraph, else a networkx multidigraph
+    
+    Returns
+    -------
+    networkx multidigraph or CompactGraph
+    """
+    
+    if pa is None:
+        raise ImportError('The pyarrow package must be installed to convert Arrow tables to graphs')
+    start_time = time.time()
+    metadata = nodes_table.schema.metadata or {}
+    osmnx_meta = json.loads(metadata[b'osmnx'].decode('utf-8')) if b'osmnx' in metadata else {'graph':{}, 'json_columns':[]}
+    json_columns = set(osmnx_meta['json_columns'])
+    
+    # the nodes' point geometries are left out, as their x and y columns hold the same coordinates
+    node_ids = arrow_to_compact_column(nodes_table.column('node'), is_json='node' in json_columns)['values']
+    node_columns = {name:arrow_to_compact_column(nodes_table.column(name), is_json=name in json_columns) 
+                    for name in nodes_table.column_names if not name in ['node', 'geometry']}
+    
+    # look up the rows of the edges' nodes, then sort the edges by origin row into a CSR adjacency
+    u = arrow_to_compact_column(edges_table.column('u'), is_json='u' in json_columns)['values']
+    v = arrow_to_compact_column(edges_table.column('v'), is_json='v' in json_columns)['values']
+    keys = arrow_to_compact_column(edges_table.column('key'), is_json='key' in json_columns)['values']
+    if node_ids.dtype.kind in 'iu':
+        sorter = np.argsort(node_ids)
+        u_rows = sorter[np.searchsorted(node_ids, u, sorter=sorter)]
+        v_rows = sorter[np.searchsorted(node_ids, v, sorter=sorter)]
+    else:
+        node_rows = {node:row for row, node in enumerate(node_ids.tolist())}
+        u_rows = np.array([node_rows[node] for node in u.tolist()], dtype=np.int64)
+        v_rows = np.array([node_rows[node] for node in v.tolist()], dtype=np.int64)
+    order = np.argsort(u_rows, kind='mergesort')
+    edge_columns = {}
+    for name in edges_table.column_names:
+        if not name in ['u', 'v', 'key']:
+            column = arrow_to_compact_column(edges_table.column(name), is_json=name in json_columns, is_geometry=name == 'geometry')
+            edge_columns[name] = take_column(column, order)
+    
+    C = CompactGraph(node_ids=node_ids,
+                     indptr=np.concatenate([[0], np.cumsum(np.bincount(u_rows, minlength=len(node_ids)))]).astype(np.int64),
+                     targets=v_rows[order].astype(np.int64),
+                     keys=get_node_id_array(keys[order].tolist()),
+                     node_columns=node_columns,
+                     edge_columns=edge_columns,
+                     graph=parse_graph_literals(osmnx_meta['graph']))
+    log('Converted Arrow tables to graph in {:,.2f} seconds'.format(time.time()-start_time))
+    return C if compact else compact_to_graph(C)
+
+
+def save_graph_parquet(G, filename='graph', folder=None, fill_edge_geometry=False, row_group_size=None, compression='snappy'):
+    """
+    Save a graph's nodes and edges to disk as GeoParquet files, built straight from its arrays.
+    
+    Saves filename_nodes.parquet and filename_edges.parquet, each with a WKB geometry column.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph or CompactGraph
+    filename : string
+        the name of the files, not including the _nodes/_edges suffix and file extension
+    folder : string
+        the folder to contain the files, if None, use default data folder
+    fill_edge_geometry : bool
+        if True, fill in missing edge geometries with a straight line between the edge's nodes, for 
+        GIS readers, which then load as geometry attributes of those edges
+    row_group_size : int
+        the maximum number of rows in each row group of the files, to read large graphs in chunks, 
+        if None, use pyarrow's default
+    compression : string
+        the compression codec to use, see pyarrow.parquet.write_table
+    
+    Returns
+    -------
+    None
+    """
+    
+    if pq is None:
+        raise ImportError('The pyarrow package must be installed to save graphs as Parquet')
+    start_time = time.time()
+    if folder is None:
+        folder = globals.data_folder
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    
+    nodes_table, edges_table = graph_to_arrow(G, fill_edge_geometry=fill_edge_geometry)
+    pq.write_table(nodes_table, os.path.join(folder, '{}_nodes.parquet'.format(filename)), row_group_size=row_group_size, compression=compression)
+    pq.write_table(edges_table, os.path.join(folder, '{}_edges.parquet'.format(filename)), row_group_size=row_group_size, compression=compression)
+    log('Saved graph to disk as GeoParquet at "{}/{}_*.parquet" in {:,.2f} seconds'.format(folder, filename, time.time()-start_time))
+
+
+def load_graph_parquet(filename='graph', folder=None, node_columns=None, edge_columns=None, compact=False):
+    """
+    Load a graph saved with save_graph_parquet, reading only some of its columns if specified.
+    
+    Parameters
+    ----------
+    filename : string
+        the name of the files, not including the _nodes/_edges suffix and file extension
+    folder : string
+        the folder containing the files, if None, use default data folder
+    node_columns : list
+        the node attributes to read (x and y are always read), if None, read all of them
+    edge_columns : list
+        the edge attributes to read, if None, read all of them
+    compact : bool
+        if True, return a CompactGraph, else a networkx multidigraph
+    
+    Returns
+    -------
+    networkx multidigraph or CompactGraph
+    """
+    
+    if pq is None:
+        raise ImportError('The pyarrow package must be installed to load graphs from Parquet')
+    start_time = time.time()
+    if folder is None:
+        folder = globals.data_folder
+    
+    if node_columns is not None:
+        node_columns = ['node', 'x', 'y'] + [name for name in node_columns if not name in ['node', 'x', 'y']]
+    if edge_columns is not None:
+        edge_columns = ['u', 'v', 'key'] + [name for name in edge_columns if not name in ['u', 'v', 'key']]
+    nodes_table = pq.read_table(os.path.join(folder, '{}_nodes.parquet'.format(filename)), columns=node_columns)
+    edges_table = pq.read_table(os.path.join(folder, '{}_edges.parquet'.format(filename)), columns=edge_columns)
+    G = arrow_to_graph(nodes_table, edges_table, compact=compact)
+    log('Loaded graph from GeoParquet at "{}/{}_*.parquet" in {:,.2f} seconds'.format(folder, filename, time.time()-start_time))
+    return G
+
+
 def get_undirected(G):
     """
     Convert a directed graph to an undirected graph that maintains parallel edges in opposite directions if geometries differ.
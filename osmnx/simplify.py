@@ -7,9 +7,12 @@
 
 import time
 import logging as lg
+import numpy as np
+from multiprocessing import Pool, cpu_count
 from shapely.geometry import Point, LineString
 
-from .utils import log   
+from .utils import log, great_circle_vec, is_projected, clear_nearest_indexes, get_edge_vertex_index, add_to_edge_vertex_index
+from .compact import CompactGraph, graph_to_compact, compact_to_graph
 
 
 def is_endpoint(G, node, strict=True):
@@ -76,9 +79,92 @@ def is_endpoint(G, node, strict=True):
         return False
             
 
+def identify_endpoints(G, strict=True):
+    """
+    Identify all the nodes in the graph that are "real" endpoints of an edge, by the rules of is_endpoint.
+    
+    Classifies every node at once: a single pass over the graph's adjacency collects its edges into 
+    arrays, from which each node's in-degree, out-degree, number of unique neighbors, self-loops and 
+    (if strict is False) number of unique edge OSM IDs are counted with grouped array operations.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    strict : bool
+        if False, allow nodes to be end points even if they fail all other rules but have edges with different OSM IDs
+    
+    Returns
+    -------
+    list
+        the endpoint nodes, in the graph's node order
+    """
+    
+    nodes = G.nodes()
+    node_rows = {node:row for row, node in enumerate(nodes)}
+    node_count = len(nodes)
+    
+    # one entry per pair of adjacent nodes, with how many parallel edges join them, and one entry per edge 
+    # with its OSM ID interned as an integer code
+    u_rows = []
+    v_rows = []
+    edge_counts = []
+    osmid_codes = {}
+    edge_u_rows = []
+    edge_v_rows = []
+    edge_osmids = []
+    for u, neighbors in G.adj.items():
+        u_row = node_rows[u]
+        for v, keydict in neighbors.items():
+            v_row = node_rows[v]
+            u_rows.append(u_row)
+            v_rows.append(v_row)
+            edge_counts.append(len(keydict))
+            if not strict:
+                for data in keydict.values():
+                    osmid = data['osmid']
+                    if isinstance(osmid, list):
+                        osmid = tuple(osmid)
+                    edge_u_rows.append(u_row)
+                    edge_v_rows.append(v_row)
+                    edge_osmids.append(osmid_codes.setdefault(osmid, len(osmid_codes)))
+    u_rows = np.array(u_rows, dtype=np.int64)
+    v_rows = np.array(v_rows, dtype=np.int64)
+    edge_counts = np.array(edge_counts, dtype=np.int64)
+    
+    out_degree = np.bincount(u_rows, weights=edge_counts, minlength=node_count)
+    in_degree = np.bincount(v_rows, weights=edge_counts, minlength=node_count)
+    degree = in_degree + out_degree
+    
+    # if the node appears in its list of neighbors, it self-loops. this is always an endpoint.
+    self_loops = np.zeros(node_count, dtype=bool)
+    self_loops[u_rows[u_rows == v_rows]] = True
+    
+    # count each node's unique neighbors, whether predecessors or successors
+    neighbor_pairs = np.unique(np.concatenate([u_rows * node_count + v_rows, v_rows * node_count + u_rows]))
+    neighbor_count = np.bincount(neighbor_pairs // node_count, minlength=node_count) if node_count > 0 else np.zeros(0)
+    
+    # if node has no incoming edges or no outgoing edges, it must be an end point. else, if it does NOT have 
+    # 2 neighbors AND either 2 or 4 directed edges, it is an endpoint (see is_endpoint)
+    endpoints = self_loops | (out_degree == 0) | (in_degree == 0)
+    endpoints |= ~((neighbor_count == 2) & ((degree == 2) | (degree == 4)))
+    
+    if not strict:
+        # non-strict mode: if there is more than 1 OSM ID among a node's incoming and outgoing edges, it is an endpoint
+        edge_osmids = np.array(edge_osmids, dtype=np.int64)
+        osmid_count = max(len(osmid_codes), 1)
+        node_osmids = np.unique(np.concatenate([np.array(edge_u_rows, dtype=np.int64) * osmid_count + edge_osmids, 
+                                                np.array(edge_v_rows, dtype=np.int64) * osmid_count + edge_osmids]))
+        endpoints |= np.bincount(node_osmids // osmid_count, minlength=node_count) > 1
+    
+    return [node for node, is_endpoint in zip(nodes, endpoints.tolist()) if is_endpoint]
+
+
 def build_path(G, node, endpoints, path):
     """
-    Recursively build a path of nodes until you hit an endpoint node.
+    Build a path of nodes until you hit an endpoint node.
+    
+    Walks from node to each next unvisited successor in turn, tracking the nodes already in the path 
+    in a set, so the path is built in time linear in its length however long it is.
     
     Parameters
     ----------
@@ -94,17 +180,22 @@ def build_path(G, node, endpoints, path):
     -------
     paths_to_simplify : list
     """
-    # for each successor in the passed-in node
-    for successor in G.successors(node):
-        if not successor in path:
-            # if this successor is already in the path, ignore it, otherwise add it to the path
-            path.append(successor)
-            if not successor in endpoints:
-                # if this successor is not an endpoint, recursively call build_path until you find an endpoint
-                path = build_path(G, successor, endpoints, path)
-            else:
-                # if this successor is an endpoint, we've completed the path, so return it
-                return path
+    visited = set(path)
+    while True:
+        # step to the first successor of the current node that is not already in the path
+        for successor in G.successors(node):
+            if not successor in visited:
+                path.append(successor)
+                visited.add(successor)
+                break
+        else:
+            # the path cannot go any further without repeating a node
+            break
+        
+        if successor in endpoints:
+            # if this successor is an endpoint, we've completed the path, so return it
+            return path
+        node = successor
     
     if (not path[-1] in endpoints) and (path[0] in G.successors(path[-1])):
         # if the end of the path is not actually an endpoint and the path's first node is a successor of the 
@@ -114,12 +205,80 @@ def build_path(G, node, endpoints, path):
     return path
     
     
+def get_endpoint_paths(G, start_endpoints, endpoints):
+    """
+    Build the paths to simplify that start from some of the graph's endpoints.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    start_endpoints : list
+        the endpoints to build paths from, in order
+    endpoints : set
+        the set of all nodes in the graph that are endpoints
+    
+    Returns
+    -------
+    paths_to_simplify : list
+    """
+    
+    paths_to_simplify = []
+    
+    # for each endpoint node, look at each of its successor nodes
+    for node in start_endpoints:
+        for successor in G.successors(node):
+            if not successor in endpoints:
+                # if the successor is not an endpoint, build a path from the endpoint node to the next endpoint node
+                path = build_path(G, successor, endpoints, path=[node, successor])
+                paths_to_simplify.append(path)
+    return paths_to_simplify
+
+
+def get_ring_paths(G, endpoints, visited, nodes=None):
+    """
+    Build the paths to simplify around the graph's self-contained rings, in which no node is an endpoint.
+    
+    Any interstitial node no endpoint path passes through is on such a ring: walk around each ring 
+    once, then make its lowest-id node an endpoint and build its paths from there, around the ring 
+    and back to it.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    endpoints : set
+        the set of all nodes in the graph that are endpoints, to which the rings' endpoints are added
+    visited : set
+        the nodes the paths built from the endpoints pass through, to which the rings' nodes are added
+    nodes : list
+        the nodes that may be on rings, if None, all the graph's nodes
+    
+    Returns
+    -------
+    paths_to_simplify : list
+    """
+    
+    paths_to_simplify = []
+    for node in (G.nodes() if nodes is None else nodes):
+        if not (node in visited or node in endpoints):
+            ring = build_path(G, node, endpoints, path=[node])
+            ring_endpoint = min(ring)
+            endpoints.add(ring_endpoint)
+            for successor in G.successors(ring_endpoint):
+                path = build_path(G, successor, endpoints, path=[ring_endpoint, successor])
+                paths_to_simplify.append(path)
+                visited.update(path)
+    if len(paths_to_simplify) > 0:
+        log('Found self-contained rings with no endpoints, adding {:,} paths around them'.format(len(paths_to_simplify)))
+    return paths_to_simplify
+
+
 def get_paths_to_simplify(G, strict=True):
     """
     Create a list of all the paths to be simplified between endpoint nodes.
     
     The path is ordered from the first endpoint, through the interstitial nodes, 
-    to the second endpoint.
+    to the second endpoint. Self-contained rings, in which no node is an endpoint, 
+    become paths from their lowest-id node around the ring and back to it.
     
     Parameters
     ----------
@@ -134,25 +293,14 @@ def get_paths_to_simplify(G, strict=True):
     
     # first identify all the nodes that are endpoints
     start_time = time.time()
-    endpoints = set([node for node in G.nodes() if is_endpoint(G, node, strict=strict)])
+    endpoints_ordered = identify_endpoints(G, strict=strict)
+    endpoints = set(endpoints_ordered)
     log('Identified {:,} edge endpoints in {:,.2f} seconds'.format(len(endpoints), time.time()-start_time))
     
     start_time = time.time()
-    paths_to_simplify = []
-    
-    # for each endpoint node, look at each of its successor nodes
-    for node in endpoints:
-        for successor in G.successors(node):
-            if not successor in endpoints:
-                # if the successor is not an endpoint, build a path from the endpoint node to the next endpoint node
-                try:
-                    path = build_path(G, successor, endpoints, path=[node, successor])
-                    paths_to_simplify.append(path)
-                except RuntimeError:
-                    log('Recursion error: exceeded max depth, moving on to next endpoint successor', level=lg.WARNING)
-                    # recursion errors occur if some connected component is a self-contained ring in which all nodes are not end points
-                    # handle it by just ignoring that component and letting its topology remain intact (this should be a rare occurrence)
-                    # RuntimeError is what Python <3.5 will throw, Py3.5+ throws RecursionError but it is a subtype of RuntimeError so it still gets handled
+    paths_to_simplify = get_endpoint_paths(G, endpoints_ordered, endpoints)
+    visited = set(node for path in paths_to_simplify for node in path)
+    paths_to_simplify.extend(get_ring_paths(G, endpoints, visited))
     
     log('Constructed all paths to simplify in {:,.2f} seconds'.format(time.time()-start_time))
     return paths_to_simplify
@@ -176,87 +324,582 @@ def is_simplified(G):
     return len(edges_with_geometry) > 0
     
     
-def simplify_graph(G_, strict=True):
+def get_path_edge_attributes(G, path):
+    """
+    Consolidate the attributes of the edges along a path into the attributes of the single edge that replaces them.
+    
+    Each attribute with a single unique value along the path keeps that value, others become the list 
+    of their unique values in the order they appear. Lengths are summed, and the geometry is the line 
+    through the path's nodes, following the geometries of any edges along it that were simplified before.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    path : list
+        the nodes of the path, in order
+    
+    Returns
+    -------
+    dict
+    """
+    
+    # walk the interstitial edges we're removing once, merging their attributes as we go: each attribute keeps 
+    # its first value until a different one turns up, then becomes the list of its unique values
+    edge_attributes = {}
+    unique_values = {}
+    length = 0
+    coords = [(G.node[path[0]]['x'], G.node[path[0]]['y'])]
+    for u, v in zip(path[:-1], path[1:]):
+
+        # there shouldn't be multiple edges between interstitial nodes
+        edges = G.edge[u][v]
+        if not len(edges) == 1:
+            log('Multiple edges between "{}" and "{}" found when simplifying'.format(u, v), level=lg.WARNING)
+
+        # the only element in this dict as long as above assertion is True (its key is usually, but not always, 0)
+        edge = edges[min(edges)]
+        if 'geometry' in edge:
+            # an edge that was simplified before: follow its geometry to v, rather than a straight line
+            coords.extend(list(edge['geometry'].coords)[1:])
+        else:
+            coords.append((G.node[v]['x'], G.node[v]['y']))
+        
+        for key, value in edge.items():
+            if key == 'length':
+                # sum the lengths of the segments
+                length += value
+            elif not key == 'geometry':
+                # edges that were simplified before may already have lists of values: merge them value by value
+                for value in (value if isinstance(value, list) else [value]):
+                    if key in unique_values:
+                        if not value in unique_values[key]:
+                            unique_values[key].add(value)
+                            edge_attributes[key].append(value)
+                    elif not key in edge_attributes:
+                        edge_attributes[key] = value
+                    elif value != edge_attributes[key]:
+                        unique_values[key] = set([edge_attributes[key], value])
+                        edge_attributes[key] = [edge_attributes[key], value]
+
+    # construct the geometry straight from the coordinates
+    edge_attributes['geometry'] = LineString(coords)
+    edge_attributes['length'] = length
+    return edge_attributes
+
+
+# the graph and endpoints each simplify_graph worker process builds paths in, set by init_simplify_worker
+simplify_worker_state = {}
+
+
+def init_simplify_worker(G, endpoints):
+    """
+    Set up a simplify_graph worker process with the graph and its endpoints.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    endpoints : set
+        the set of all nodes in the graph that are endpoints
+    
+    Returns
+    -------
+    None
+    """
+    simplify_worker_state['G'] = G
+    simplify_worker_state['endpoints'] = endpoints
+
+
+def simplify_endpoint_paths(start_endpoints):
+    """
+    Build the paths starting from some endpoints and consolidate their edges' attributes, in a simplify_graph worker process.
+    
+    Parameters
+    ----------
+    start_endpoints : list
+        the endpoints to build paths from, in order
+    
+    Returns
+    -------
+    list
+        a (path, edge attributes) tuple per path
+    """
+    G = simplify_worker_state['G']
+    paths = get_endpoint_paths(G, start_endpoints, simplify_worker_state['endpoints'])
+    return [(path, get_path_edge_attributes(G, path)) for path in paths]
+
+
+def simplify_graph(G_, strict=True, processes=1, copy=True):
     """
     Simplify a graph's topology by removing all nodes that are not intersections or dead-ends.
     
     Create an edge directly between the end points that encapsulate them,
     but retain the geometry of the original edges, saved as attribute in new edge
     
+    Paths never cross endpoints, so with more than one process, the endpoints are split into 
+    consecutive chunks whose paths are built and consolidated in parallel, then merged in the order 
+    of the chunks. The result is identical to simplifying in a single process.
+    
     Parameters
     ----------
-    G_ : graph
+    G_ : networkx multidigraph or CompactGraph
     strict : bool
         if False, allow nodes to be end points even if they fail all other rules but have edges with different OSM IDs
+    processes : int
+        how many worker processes to build and consolidate paths in, if None, as many as there are CPUs
+    copy : bool
+        if False, simplify G_ in place instead of a copy of it, so memory use stays close to one copy of the graph
     
     Returns
     -------
-    networkx multidigraph
+    networkx multidigraph or CompactGraph
     """
     
+    if isinstance(G_, CompactGraph):
+        return graph_to_compact(simplify_graph(compact_to_graph(G_), strict=strict, processes=processes, copy=False))
+    
     if is_simplified(G_):
         raise Exception('This graph has already been simplified, cannot simplify it again.')
     
     log('Begin topologically simplifying the graph...')
-    G = G_.copy()
+    G = G_.copy() if copy else G_
     initial_node_count = len(list(G.nodes()))
     initial_edge_count = len(list(G.edges()))
-    all_nodes_to_remove = []
-    all_edges_to_add = []
+    if processes is None:
+        processes = cpu_count()
     
-    # construct a list of all the paths that need to be simplified
-    paths = get_paths_to_simplify(G, strict=strict)
-        
+    # first identify all the nodes that are endpoints
     start_time = time.time()
-    for path in paths:
+    endpoints_ordered = identify_endpoints(G, strict=strict)
+    endpoints = set(endpoints_ordered)
+    log('Identified {:,} edge endpoints in {:,.2f} seconds'.format(len(endpoints), time.time()-start_time))
     
-        # add the interstitial edges we're removing to a list so we can retain their spatial geometry
-        edge_attributes = {}
-        for u, v in zip(path[:-1], path[1:]):
-
-            # there shouldn't be multiple edges between interstitial nodes
-            edges = G.edge[u][v]
-            if not len(edges) == 1:
-                log('Multiple edges between "{}" and "{}" found when simplifying'.format(u, v), level=lg.WARNING)
-
-            # the only element in this list as long as above assertion is True (MultiGraphs use keys (the 0 here), indexed with ints from 0 and up)
-            edge = edges[0]
-            for key in edge:
-                if key in edge_attributes:
-                    # if this key already exists in the dict, append it to the value list
-                    edge_attributes[key].append(edge[key])
-                else:
-                    # if this key doesn't already exist, set the value to a list containing the one value
-                    edge_attributes[key] = [edge[key]]
-
-        for key in edge_attributes:
-            # don't touch the length attribute, we'll sum it at the end
-            if len(set(edge_attributes[key])) == 1 and not key == 'length':
-                # if there's only 1 unique value in this attribute list, consolidate it to the single value (the zero-th)
-                edge_attributes[key] = edge_attributes[key][0]
-            elif not key == 'length':
-                # otherwise, if there are multiple values, keep one of each value
-                edge_attributes[key] = list(set(edge_attributes[key]))
-
-        # construct the geometry and sum the lengths of the segments
-        edge_attributes['geometry'] = LineString([Point((G.node[node]['x'], G.node[node]['y'])) for node in path])
-        edge_attributes['length'] = sum(edge_attributes['length'])
-
-        # add the nodes and edges to their lists for processing at the end
-        all_nodes_to_remove.extend(path[1:-1])
-        all_edges_to_add.append({'origin':path[0], 
-                                 'destination':path[-1], 
-                                 'attr_dict':edge_attributes})
-    
-    # for each edge to add in the list we assembled, create a new edge between the origin and destination
-    for edge in all_edges_to_add:
-        G.add_edge(edge['origin'], edge['destination'], **edge['attr_dict'])
-
-    # finally remove all the interstitial nodes between the new edges
-    G.remove_nodes_from(set(all_nodes_to_remove))
+    # construct all the paths that need to be simplified, consolidate the attributes of the edges along 
+    # each, and create a new edge between its origin and destination. the interstitial nodes are only 
+    # removed at the end, as paths in opposite directions along a street share them
+    start_time = time.time()
+    visited = set()
+    if processes > 1 and len(endpoints_ordered) > 0:
+        chunk_size = int(np.ceil(len(endpoints_ordered) / float(processes * 4)))
+        chunks = [endpoints_ordered[start:start + chunk_size] for start in range(0, len(endpoints_ordered), chunk_size)]
+        pool = Pool(processes, initializer=init_simplify_worker, initargs=(G_, endpoints))
+        try:
+            # add each chunk's edges as it arrives, in the order of the chunks
+            for paths_edges in pool.imap(simplify_endpoint_paths, chunks):
+                G.add_edges_from((path[0], path[-1], edge_attributes) for path, edge_attributes in paths_edges)
+                visited.update(node for path, edge_attributes in paths_edges for node in path)
+        finally:
+            pool.close()
+            pool.join()
+        log('Built paths from {:,} chunks of endpoints in {:,} processes'.format(len(chunks), processes))
+    else:
+        # new edges only join endpoints, which paths never walk through, so each endpoint's paths' 
+        # edges can be added as soon as they are built
+        for node in endpoints_ordered:
+            paths = get_endpoint_paths(G, [node], endpoints)
+            G.add_edges_from((path[0], path[-1], get_path_edge_attributes(G, path)) for path in paths)
+            visited.update(node for path in paths for node in path)
+    
+    # self-contained rings are rare: build their paths in this process, after all the others
+    for path in get_ring_paths(G, endpoints, visited):
+        G.add_edge(path[0], path[-1], **get_path_edge_attributes(G, path))
+    log('Constructed all paths to simplify in {:,.2f} seconds'.format(time.time()-start_time))
+    
+    # finally remove all the interstitial nodes between the new edges, all at once: they are the nodes 
+    # the paths pass through that are not endpoints
+    start_time = time.time()
+    G.remove_nodes_from([node for node in visited if not node in endpoints])
+    clear_nearest_indexes(G)
     
     msg = 'Simplified graph (from {:,} to {:,} nodes and from {:,} to {:,} edges) in {:,.2f} seconds'
     log(msg.format(initial_node_count, len(list(G.nodes())), initial_edge_count, len(list(G.edges())), time.time()-start_time))
     return G
+
+
+def split_edge_at_vertices(G, u, v, key, split_nodes):
+    """
+    Split a simplified edge into consecutive edges at nodes that lie on vertices of its geometry.
+    
+    Each new edge gets a copy of the edge's attributes, its piece of the geometry, and the share of 
+    its length that the piece's (great-circle, for lat-long graphs) length is of the geometry's.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    u : int
+        the edge's origin node
+    v : int
+        the edge's destination node
+    key : int
+        the edge's key
+    split_nodes : list
+        (vertex index, node) tuples of the nodes to split the edge at, already in the graph
+    
+    Returns
+    -------
+    list
+        the (u, v) node pairs of the new edges
+    """
+    
+    data = G.edge[u][v][key]
+    coords = np.array(data['geometry'].coords, dtype=np.float64)[:, :2]
+    if is_projected(G.graph.get('crs')):
+        segment_lengths = np.hypot(*(coords[1:] - coords[:-1]).T)
+    else:
+        segment_lengths = great_circle_vec(coords[:-1, 1], coords[:-1, 0], coords[1:, 1], coords[1:, 0])
+    lengths_along = np.concatenate([[0], np.cumsum(segment_lengths)])
+    total_length = lengths_along[-1]
+    
+    G.remove_edge(u, v, key=key)
+    pieces = []
+    breaks = [(0, u)] + sorted(set(split_nodes), key=lambda split_node: split_node[0]) + [(len(coords) - 1, v)]
+    for (start, start_node), (end, end_node) in zip(breaks[:-1], breaks[1:]):
+        piece = dict(data)
+        if end - start > 1:
+            piece['geometry'] = LineString(coords[start:end + 1])
+        else:
+            # a single segment is a plain edge between adjacent nodes, which has no geometry
+            del piece['geometry']
+        if 'length' in data:
+            share = (lengths_along[end] - lengths_along[start]) / total_length if total_length > 0 else 0
+            piece['length'] = data['length'] * share
+        G.add_edge(start_node, end_node, **piece)
+        pieces.append((start_node, end_node))
+    return pieces
+
+
+def get_vertex_splits(data, vertex_nodes):
+    """
+    Find the interior vertices of a simplified edge's geometry that some nodes lie exactly on.
+    
+    Parameters
+    ----------
+    data : dict
+        the edge's attributes
+    vertex_nodes : dict
+        node ids, keyed by their (x, y) coordinates
+    
+    Returns
+    -------
+    list
+        (vertex index, node) tuples, at most one per node
+    """
+    
+    split_nodes = {}
+    for vertex, vertex_coords in enumerate(list(data['geometry'].coords)[1:-1], start=1):
+        node = vertex_nodes.get(tuple(vertex_coords[:2]))
+        if node is not None and not node in split_nodes:
+            split_nodes[node] = vertex
+    return [(vertex, node) for node, vertex in split_nodes.items()]
+
+
+def split_edges_at_new_nodes(G, nodes):
+    """
+    Split the graph's simplified edges at any of some nodes not in the graph that lie on their geometries.
+    
+    A new node exactly on a vertex of a simplified edge's geometry is an interstitial node that was 
+    simplified away, eg where a newly added street joins an existing one: it is added to the graph, 
+    and each edge (in either direction) whose geometry passes through it is split there. The edges are 
+    looked up by the new nodes' coordinates in the graph's edge vertex index (see get_edge_vertex_index), 
+    which is built on first use and then kept up to date, so later calls only do work for the new nodes.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    nodes : dict
+        the attributes of the new nodes, keyed by node id
+    
+    Returns
+    -------
+    list
+        the nodes the graph's edges were split at
+    """
+    
+    if len(nodes) < 1:
+        return []
+    
+    # find the vertex of each simplified edge through the new nodes' coordinates that each new node is on
+    vertex_nodes = {(data['x'], data['y']):node for node, data in nodes.items()}
+    vertices = get_edge_vertex_index(G)['vertices']
+    splits = {}
+    for xy in vertex_nodes:
+        for u, v in vertices.get(xy, []):
+            for key, data in G.edge[u].get(v, {}).items() if u in G.edge else []:
+                if 'geometry' in data and not (u, v, key) in splits:
+                    split_nodes = get_vertex_splits(data, vertex_nodes)
+                    if len(split_nodes) > 0:
+                        splits[(u, v, key)] = split_nodes
+    
+    split_nodes = set(node for split_nodes in splits.values() for vertex, node in split_nodes)
+    G.add_nodes_from((node, nodes[node]) for node in split_nodes)
+    pieces = []
+    for (u, v, key), split_nodes_on_edge in splits.items():
+        pieces.extend(split_edge_at_vertices(G, u, v, key, split_nodes_on_edge))
+    if len(splits) > 0:
+        clear_nearest_indexes(G, edge_vertices=False)
+        add_to_edge_vertex_index(G, pieces)
+        log('Split {:,} simplified edges at {:,} new nodes'.format(len(splits), len(split_nodes)))
+    return list(split_nodes)
+
+
+def get_edge_osmids(data):
+    """
+    Get the OSM IDs of the ways an edge belongs to, as a list, whether or not it was simplified.
+    
+    Parameters
+    ----------
+    data : dict
+        the edge's attributes
+    
+    Returns
+    -------
+    list
+    """
+    osmid = data.get('osmid')
+    return osmid if isinstance(osmid, list) else [osmid]
+
+
+def is_straight_edge(data):
+    """
+    Determine if an edge runs straight between its nodes, with no interior vertices it was simplified through.
+    
+    Parameters
+    ----------
+    data : dict
+        the edge's attributes
+    
+    Returns
+    -------
+    bool
+    """
+    return not 'geometry' in data or len(data['geometry'].coords) <= 2
+
+
+def is_existing_edge(data, existing):
+    """
+    Determine if an edge of the graph already carries a raw edge's OSM ID and tags.
+    
+    A simplified edge (or a piece of one) may hold lists of the values of several ways: each of
+    the raw edge's values must be one of them. An edge of a single way must also have no tags the
+    raw edge lacks, and an edge whose geometry has interior vertices passes through other nodes,
+    so it is not the same as a raw edge between adjacent nodes.
+    
+    Parameters
+    ----------
+    data : dict
+        the raw edge's attributes
+    existing : dict
+        the graph's edge's attributes
+    
+    Returns
+    -------
+    bool
+    """
+    
+    if not is_straight_edge(existing):
+        return False
+    if len(get_edge_osmids(existing)) == 1 and len(set(existing.keys()) - set(data.keys()) - set(['length', 'geometry'])) > 0:
+        return False
+    
+    for key, value in data.items():
+        if key in ['length', 'geometry']:
+            continue
+        if not key in existing:
+            return False
+        existing_values = existing[key] if isinstance(existing[key], list) else [existing[key]]
+        if not all(value in existing_values for value in (value if isinstance(value, list) else [value])):
+            return False
+    return True
+
+
+def get_way_edges(G, osmid, nodes, walk=True):
+    """
+    Find the edges of the graph that belong to a way, walking along them from some of its nodes.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    osmid : int
+        the way's OSM ID
+    nodes : iterable
+        nodes of the graph to start from
+    walk : bool
+        if False, only find the way's edges of the nodes themselves
+    
+    Returns
+    -------
+    set
+        (u, v, key) tuples
+    """
+    
+    edges = set()
+    seen = set(nodes)
+    stack = list(seen)
+    while len(stack) > 0:
+        node = stack.pop()
+        adjacent = [(node, v) for v in G.successors(node)] + [(u, node) for u in G.predecessors(node)]
+        for u, v in adjacent:
+            for key, data in G.edge[u][v].items():
+                if osmid in get_edge_osmids(data) and not (u, v, key) in edges:
+                    edges.add((u, v, key))
+                    for next_node in ([u, v] if walk else []):
+                        if not next_node in seen:
+                            seen.add(next_node)
+                            stack.append(next_node)
+    return edges
+
+
+def remove_changed_ways(G, G_new, osmids):
+    """
+    Remove the parts of the graph's edges that belong to the old versions of some changed ways.
     
-    
\ No newline at end of file
+    The edges of each way are found by walking along them from the way's new nodes the graph has.
+    Edges of that way alone are removed, as are the pieces of chains of several ways (see
+    split_edges_at_new_nodes) that are edges of the way's new version, unless they are edges of
+    another of their ways in G_new too. The other edges keep their other ways' OSM IDs.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    G_new : networkx multidigraph
+        the new versions of the ways
+    osmids : set
+        the OSM IDs of the changed ways
+    
+    Returns
+    -------
+    set
+        the graph's nodes whose edges were removed
+    """
+    
+    way_nodes = {}
+    edge_ways = {}
+    for u, v, data in G_new.edges(data=True):
+        for osmid in get_edge_osmids(data):
+            edge_ways.setdefault((u, v), set()).add(osmid)
+            if osmid in osmids:
+                way_nodes.setdefault(osmid, set()).update([u, v])
+    
+    affected = set()
+    for osmid, nodes in way_nodes.items():
+        for u, v, key in get_way_edges(G, osmid, [node for node in nodes if node in G]):
+            data = G.edge[u][v][key]
+            edge_osmids = get_edge_osmids(data)
+            ways = edge_ways.get((u, v), set())
+            is_way_piece = osmid in ways and is_straight_edge(data) and ways.intersection(edge_osmids) == set([osmid])
+            if set(edge_osmids) == set([osmid]) or is_way_piece:
+                G.remove_edge(u, v, key=key)
+                affected.update([u, v])
+            else:
+                edge_osmids = [edge_osmid for edge_osmid in edge_osmids if edge_osmid != osmid]
+                data['osmid'] = edge_osmids if len(edge_osmids) > 1 else edge_osmids[0]
+    
+    # drop the old ways' nodes that are left with no edges and are not in the new data
+    G.remove_nodes_from([node for node in affected if G.degree(node) == 0 and not node in G_new])
+    return set(node for node in affected if node in G)
+
+
+def simplify_graph_incremental(G_, G_new, strict=True, copy=False):
+    """
+    Merge new or changed raw nodes and edges into a simplified graph, re-simplifying only the chains they affect.
+    
+    The simplified edges are first split at the new nodes that were simplified away (see
+    split_edges_at_new_nodes). The raw edges of G_new that the graph already has, with the same
+    OSM ID and tags, are skipped, so overlapping tiles merge cleanly. A way with any other edge
+    (or with a node that moved) has changed: the edges of its old version are removed (see
+    remove_changed_ways) and all of its new edges are added. Only the new nodes, and the nodes
+    whose edges were removed, can change from endpoints to interstitial nodes, so only they are
+    re-classified, and only the paths through those that are now interstitial are rebuilt. These
+    paths can run along edges simplified before, whose geometries and attributes are merged into
+    the new edges. The work done scales with G_new and the chains it touches, not with the graph.
+    
+    Parameters
+    ----------
+    G_ : networkx multidigraph
+        a simplified graph
+    G_new : networkx multidigraph
+        the new or changed nodes and edges, not simplified (eg, a graph created from newly downloaded OSM data)
+    strict : bool
+        if False, allow nodes to be end points even if they fail all other rules but have edges with different OSM IDs
+    copy : bool
+        if True, merge into and re-simplify a copy of G_ instead of G_ itself, which takes time and memory
+        proportional to the whole graph
+    
+    Returns
+    -------
+    networkx multidigraph
+    """
+    
+    log('Begin incrementally simplifying the graph...')
+    start_time = time.time()
+    G = G_.copy() if copy else G_
+    initial_node_count = len(G)
+    
+    # split the simplified edges at any new nodes that were simplified away
+    split_edges_at_new_nodes(G, {node:data for node, data in G_new.nodes(data=True) if not node in G})
+    
+    # the new edges the graph lacks. a way with such an edge between two of the graph's nodes has changed, as has 
+    # a way with an edge of its own in the graph between two of its new nodes that are no longer adjacent, or with a 
+    # node that moved. the other edges the graph lacks extend their ways (eg into a new tile) and are just added
+    raw_edges = list(G_new.edges(data=True))
+    is_new = []
+    changed = set()
+    way_nodes = {}
+    way_edges = set()
+    for u, v, data in raw_edges:
+        osmids = get_edge_osmids(data)
+        for osmid in osmids:
+            way_nodes.setdefault(osmid, set()).update([u, v])
+            way_edges.add((osmid, u, v))
+        is_new.append(not (u in G.edge and v in G.edge[u] and any(is_existing_edge(data, existing) for existing in G.edge[u][v].values())))
+        if is_new[-1] and u in G and v in G:
+            changed.update(osmids)
+        elif any(node in G and (G.node[node].get('x'), G.node[node].get('y')) != (G_new.node[node].get('x'), G_new.node[node].get('y'))
+                 for node in [u, v]):
+            changed.update(osmids)
+    for osmid, nodes in way_nodes.items():
+        if not osmid in changed:
+            for u, v, key in get_way_edges(G, osmid, [node for node in nodes if node in G], walk=False):
+                if u in nodes and v in nodes and len(get_edge_osmids(G.edge[u][v][key])) == 1 and not (osmid, u, v) in way_edges:
+                    changed.add(osmid)
+                    break
+    
+    # replace the changed ways' old edges with all their new ones, and merge the new nodes and edges into the graph
+    affected = remove_changed_ways(G, G_new, changed)
+    G.add_nodes_from(G_new.nodes(data=True))
+    G.add_edges_from((u, v, data) for (u, v, data), edge_is_new in zip(raw_edges, is_new)
+                     if edge_is_new or len(changed.intersection(get_edge_osmids(data))) > 0)
+    
+    # all the other nodes of the simplified graph were endpoints, and their edges did not change: so classify
+    # only these, in the subgraph of them and their neighbors, which holds all their edges
+    candidates = G_new.nodes() + [node for node in affected if not node in G_new]
+    neighborhood = set(candidates)
+    for node in candidates:
+        neighborhood.update(G.predecessors(node))
+        neighborhood.update(G.successors(node))
+    H = G.subgraph(neighborhood)
+    candidate_endpoints = set(identify_endpoints(H, strict=strict))
+    interstitial = [node for node in candidates if not node in candidate_endpoints]
+    endpoints = neighborhood.difference(interstitial)
+    
+    # the paths through the interstitial nodes only ever reach their neighbors, so build them in the subgraph
+    # too: from the endpoints next to the interstitial nodes, then around any new rings
+    start_endpoints = []
+    visited = set()
+    for node in interstitial:
+        for predecessor in H.predecessors(node):
+            if predecessor in endpoints and not predecessor in visited:
+                visited.add(predecessor)
+                start_endpoints.append(predecessor)
+    paths = get_endpoint_paths(H, start_endpoints, endpoints)
+    visited.update(node for path in paths for node in path)
+    paths.extend(get_ring_paths(H, endpoints, visited, nodes=interstitial))
+    
+    for path in paths:
+        G.add_edge(path[0], path[-1], **get_path_edge_attributes(H, path))
+    G.remove_nodes_from([node for node in visited if not node in endpoints])
+    clear_nearest_indexes(G, edge_vertices=False)
+    add_to_edge_vertex_index(G, ((path[0], path[-1]) for path in paths))
+    
+    msg = 'Incrementally simplified graph (from {:,} to {:,} nodes, replacing {:,} changed or new ways and re-simplifying {:,} paths) in {:,.2f} seconds'
+    log(msg.format(initial_node_count, len(G), len(changed), len(paths), time.time()-start_time))
+    return G
@@ -9,12 +9,11 @@ from __future__ import division
 from itertools import chain
 from collections import Counter
 import time
-import warnings
 import networkx as nx
 import numpy as np
-import pandas as pd
 
 from .utils import log, get_largest_component, great_circle_vec
+from .compact import CompactGraph, compact_to_graph
 
 
 def basic_stats(G, area=None):
@@ -23,7 +22,7 @@ def basic_stats(G, area=None):
     
     Parameters
     ----------
-    G : networkx multidigraph
+    G : networkx multidigraph or CompactGraph
     area : numeric
         the area covered by the street network, in square meters (typically land area); if none, will skip all density-based metrics
     
@@ -53,6 +52,9 @@ def basic_stats(G, area=None):
           
     """
     
+    if isinstance(G, CompactGraph):
+        G = compact_to_graph(G)
+    
     sq_m_in_sq_km = 1e6 #there are 1 million sq meters in 1 sq km
     G_undirected = None
     
@@ -118,17 +120,9 @@ def basic_stats(G, area=None):
         street_density_km = None
     
     # average circuity: sum of edge lengths divided by sum of great circle distance between edge endpoints
-    # first load all the edges origin and destination coordinates as a dataframe, then calculate the great circle distance with the vectorized function
-    coords = np.array([[G.node[u]['y'], G.node[u]['x'], G.node[v]['y'], G.node[v]['x']] for u, v, k in G.edges(keys=True)])
-    df_coords = pd.DataFrame(coords, columns=['u_y', 'u_x', 'v_y', 'v_x'])
-    # ignore warnings during this calculation because numpy warns it cannot calculate arccos for self-loops since u==v
-    warnings.filterwarnings('ignore')
-    gc_distances = great_circle_vec(lat1=df_coords['u_y'], 
-                                    lng1=df_coords['u_x'],
-                                    lat2=df_coords['v_y'], 
-                                    lng2=df_coords['v_x'])
-    warnings.filterwarnings('default')
-    gc_distances = gc_distances.fillna(value=0)
+    # first load all the edges origin and destination coordinates as an array, then calculate the great circle distance with the vectorized function
+    coords = np.array([[G.node[u]['y'], G.node[u]['x'], G.node[v]['y'], G.node[v]['x']] for u, v, k in G.edges(keys=True)]).reshape(-1, 4)
+    gc_distances = great_circle_vec(lat1=coords[:, 0], lng1=coords[:, 1], lat2=coords[:, 2], lng2=coords[:, 3])
     try:
         circuity_avg = edge_length_total / gc_distances.sum()
     except ZeroDivisionError:
@@ -7,6 +7,7 @@
 
 import os
 import sys
+import copy
 import time
 import unicodedata
 import logging as lg
@@ -16,14 +17,68 @@ import numpy as np
 import pandas as pd
 import requests
 
+from collections import OrderedDict
+from threading import Lock
+from weakref import WeakKeyDictionary
 from . import globals
 
+import shapely
+from shapely.geometry import Point, LineString, box
+from shapely.strtree import STRtree
+
+# scipy is optional: without it, nearest nodes are found by brute force
+try:
+    from scipy.spatial import cKDTree
+except ImportError as e:
+    cKDTree = None
+
+
+# the shared http session, created on first use by get_session
+session = None
+session_lock = Lock()
+
+# how many requests have been sent to each API, to rotate through its endpoints in round-robin order
+endpoint_request_counts = {}
+
+# the earliest time each endpoint's rate limit allows the next request to be sent, see wait_for_rate_limit
+rate_limit_next_send = {}
+rate_limit_lock = Lock()
+
+# the nearest-node index of each graph, built on first use by get_nearest_node_index
+nearest_node_indexes = WeakKeyDictionary()
+nearest_node_indexes_lock = Lock()
+
+# the nearest-edge index of each graph, built on first use by get_nearest_edge_index
+nearest_edge_indexes = WeakKeyDictionary()
+nearest_edge_indexes_lock = Lock()
+
+# the index of each graph's edge geometry vertices, built on first use by get_edge_vertex_index
+edge_vertex_indexes = WeakKeyDictionary()
+edge_vertex_indexes_lock = Lock()
+
 
 def config(data_folder=globals.data_folder, 
            logs_folder=globals.logs_folder, 
            imgs_folder=globals.imgs_folder, 
            cache_folder=globals.cache_folder, 
            use_cache=globals.use_cache,
+           cache_backend=globals.cache_backend,
+           cache_db_filename=globals.cache_db_filename,
+           cache_compression=globals.cache_compression,
+           cache_max_age=globals.cache_max_age,
+           cache_max_size=globals.cache_max_size,
+           overpass_endpoints=globals.overpass_endpoints,
+           nominatim_endpoints=globals.nominatim_endpoints,
+           endpoint_strategy=globals.endpoint_strategy,
+           http_pool_size=globals.http_pool_size,
+           retry_max_attempts=globals.retry_max_attempts,
+           retry_backoff_base=globals.retry_backoff_base,
+           retry_backoff_max=globals.retry_backoff_max,
+           retry_deadline=globals.retry_deadline,
+           overpass_max_workers=globals.overpass_max_workers,
+           overpass_rate_limit=globals.overpass_rate_limit,
+           overpass_slot_cooldown_factor=globals.overpass_slot_cooldown_factor,
+           overpass_status_ttl=globals.overpass_status_ttl,
            log_file=globals.log_file, 
            log_console=globals.log_console, 
            log_level=globals.log_level, 
@@ -46,6 +101,48 @@ def config(data_folder=globals.data_folder,
         where to save the http response cache
     use_cache : bool
         if True, use a local cache to save/retrieve http responses instead of calling API repetitively for the same request URL
+    cache_backend : string
+        {'folder', 'sqlite'} or the name of a backend registered with register_cache_backend: 'folder' saves each
+        response as a json file in cache_folder, 'sqlite' saves compressed responses in a single database file
+    cache_db_filename : string
+        name of the sqlite cache database file inside cache_folder
+    cache_compression : string
+        {None, 'gzip', 'zstd'} how to compress cached responses, written and read as a stream. the sqlite
+        backend always compresses, with gzip if this is None. 'zstd' requires the zstandard package
+    cache_max_age : numeric
+        evict cached responses saved more than this many seconds ago, if None, never expire responses
+    cache_max_size : int
+        evict least-recently used responses when the sqlite cache exceeds this many bytes, if None, no size limit
+    overpass_endpoints : list
+        base URLs of the Overpass API and its mirrors, whose /interpreter and /status endpoints are queried
+    nominatim_endpoints : list
+        base URLs of the Nominatim API and its mirrors, whose /search endpoint is queried
+    endpoint_strategy : string
+        {'failover', 'round_robin'} how to choose among multiple endpoints: 'failover' always tries them in order,
+        'round_robin' starts each request at the next endpoint in turn. either way, if an endpoint cannot be reached
+        or returns a server error, the request moves on to the next endpoint
+    http_pool_size : int
+        how many keep-alive connections the shared http session holds open to each host
+    retry_max_attempts : int
+        how many times in total to send a request that fails because the API is overloaded, drops the 
+        connection or times out (hosts that cannot be connected to at all are not re-tried)
+    retry_backoff_base : numeric
+        seconds to pause before the first retry, doubling (with random jitter) for each further retry
+    retry_backoff_max : numeric
+        the longest pause in seconds before any retry
+    retry_deadline : numeric
+        give up re-trying a request once the next retry would end more than this many seconds after 
+        the first attempt, if None, no deadline
+    overpass_max_workers : int
+        how many Overpass queries to send at the same time when a query geometry is subdivided into several
+    overpass_rate_limit : numeric
+        max requests per second to send to the Overpass API, if None, no limit
+    overpass_slot_cooldown_factor : numeric
+        the Overpass API slot scheduler expects a slot to be free again this many times a query's duration
+        after the query finishes
+    overpass_status_ttl : numeric
+        if an endpoint's status cannot be fetched, the slot scheduler assumes a single slot and tries 
+        fetching the status again after this many seconds
     log_file : bool
         if true, save log output to a log file in logs_folder
     log_console : bool
@@ -67,6 +164,23 @@ def config(data_folder=globals.data_folder,
     # set each global variable to the passed-in parameter value
     globals.use_cache = use_cache
     globals.cache_folder = cache_folder
+    globals.cache_backend = cache_backend
+    globals.cache_db_filename = cache_db_filename
+    globals.cache_compression = cache_compression
+    globals.cache_max_age = cache_max_age
+    globals.cache_max_size = cache_max_size
+    globals.overpass_endpoints = overpass_endpoints
+    globals.nominatim_endpoints = nominatim_endpoints
+    globals.endpoint_strategy = endpoint_strategy
+    globals.http_pool_size = http_pool_size
+    globals.retry_max_attempts = retry_max_attempts
+    globals.retry_backoff_base = retry_backoff_base
+    globals.retry_backoff_max = retry_backoff_max
+    globals.retry_deadline = retry_deadline
+    globals.overpass_max_workers = overpass_max_workers
+    globals.overpass_rate_limit = overpass_rate_limit
+    globals.overpass_slot_cooldown_factor = overpass_slot_cooldown_factor
+    globals.overpass_status_ttl = overpass_status_ttl
     globals.data_folder = data_folder
     globals.imgs_folder = imgs_folder
     globals.logs_folder = logs_folder
@@ -78,6 +192,9 @@ def config(data_folder=globals.data_folder,
     globals.useful_tags_node = useful_tags_node
     globals.useful_tags_path = useful_tags_path
     
+    # discard the current http session so the next request creates one with the new settings
+    reset_session()
+    
     # if logging is turned on, log that we are configured
     if globals.log_file or globals.log_console:
         log('Configured osmnx')
@@ -206,6 +323,22 @@ def make_str(value):
         return str(value)
 
             
+def copy_attributes(data):
+    """
+    Copy an attribute dict and its mutable values, such as lists of osmids, but not its immutable 
+    ones, such as strings, numbers and shapely geometries.
+    
+    Parameters
+    ----------
+    data : dict
+    
+    Returns
+    -------
+    dict
+    """
+    return {key:(copy.deepcopy(value) if isinstance(value, (list, dict, set)) else value) for key, value in data.items()}
+
+
 def get_largest_component(G, strongly=False):
     """
     Return the largest weakly or strongly connected component from a directed graph.
@@ -238,9 +371,14 @@ def get_largest_component(G, strongly=False):
     return G
 
     
-def great_circle_vec(lat1, lng1, lat2, lng2, earth_radius=6371009):
+def great_circle_vec(lat1, lng1, lat2, lng2, earth_radius=6371009, out=None, dtype=None):
     """
     Vectorized function to calculate the great-circle distance between two points or between vectors of points.
+    
+    Uses the haversine formula, which is numerically stable for nearby and identical points (where 
+    the spherical law of cosines takes the arccos of a value rounded above 1 and returns NaN). Inputs 
+    are broadcast against each other, and the calculation runs in place in the output array plus two 
+    temporary arrays of the same shape.
 
     Parameters
     ----------
@@ -250,36 +388,330 @@ def great_circle_vec(lat1, lng1, lat2, lng2, earth_radius=6371009):
     lng2 : float or array of float
     earth_radius : numeric
         radius of earth in units in which distance will be returned (default is meters)
+    out : numpy array
+        optionally, a preallocated array of the broadcast shape of the inputs to write the distances into
+    dtype : numpy dtype
+        the float type to calculate in, if None, the type of the inputs (eg, pass float32 arrays to halve the 
+        memory a large batch needs, at a precision of about 7 significant digits)
     
     Returns
     -------
     distance : float or array of float
-        distance or vector of distances from (lat1, lng1) to (lat2, lng2) in units of earth_radius
+        distance or vector of distances from (lat1, lng1) to (lat2, lng2) in units of earth_radius, as a 
+        pandas series with the same index if any of the inputs is a series
     """
     
-    phi1 = np.deg2rad(90 - lat1)
-    phi2 = np.deg2rad(90 - lat2)
+    index = None
+    for values in (lat1, lng1, lat2, lng2):
+        if isinstance(values, pd.Series):
+            index = values.index
+            break
+    
+    lat1, lng1, lat2, lng2 = [np.asarray(values) for values in (lat1, lng1, lat2, lng2)]
+    if dtype is None:
+        dtype = out.dtype if out is not None else np.result_type(lat1, lng1, lat2, lng2)
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+    shape = np.broadcast(lat1, lng1, lat2, lng2).shape
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    temp = np.empty(shape, dtype=dtype)
+    cos_lat = np.empty(shape, dtype=dtype)
     
-    theta1 = np.deg2rad(lng1)
-    theta2 = np.deg2rad(lng2)
+    # haversine of the difference in latitude
+    np.subtract(lat2, lat1, out=out)
+    np.deg2rad(out, out=out)
+    out *= 0.5
+    np.sin(out, out=out)
+    np.square(out, out=out)
     
-    cos = (np.sin(phi1) * np.sin(phi2) * np.cos(theta1 - theta2) + np.cos(phi1) * np.cos(phi2))
-    arc = np.arccos(cos)
+    # plus the product of the cosines of the latitudes and the haversine of the difference in longitude
+    np.subtract(lng2, lng1, out=temp)
+    np.deg2rad(temp, out=temp)
+    temp *= 0.5
+    np.sin(temp, out=temp)
+    np.square(temp, out=temp)
+    np.deg2rad(lat1, out=cos_lat)
+    np.cos(cos_lat, out=cos_lat)
+    temp *= cos_lat
+    np.deg2rad(lat2, out=cos_lat)
+    np.cos(cos_lat, out=cos_lat)
+    temp *= cos_lat
+    out += temp
+    
+    # is the squared sine of half the central angle: clip rounding errors before taking the arcsin
+    np.clip(out, 0, 1, out=out)
+    np.sqrt(out, out=out)
+    np.arcsin(out, out=out)
     
     # return distance in units of earth_radius
-    distance = arc * earth_radius
-    return distance
+    out *= 2 * earth_radius
+    if index is not None:
+        return pd.Series(out, index=index)
+    if out.ndim == 0:
+        return out[()]
+    return out
+
+
+def great_circle_matrix(lats1, lngs1, lats2, lngs2, earth_radius=6371009, dtype=None, chunk_size=None):
+    """
+    Calculate the great-circle distances between every point of one vector and every point of another.
+    
+    The matrix is filled a block of origins at a time with great_circle_vec, so its temporary arrays 
+    stay small however many origins there are.
+    
+    Parameters
+    ----------
+    lats1 : array of float
+        the latitudes of the origins
+    lngs1 : array of float
+        the longitudes of the origins
+    lats2 : array of float
+        the latitudes of the destinations
+    lngs2 : array of float
+        the longitudes of the destinations
+    earth_radius : numeric
+        radius of earth in units in which distance will be returned (default is meters)
+    dtype : numpy dtype
+        the float type of the matrix, if None, the type of the inputs
+    chunk_size : int
+        how many origins to calculate at a time, if None, enough that each block holds about a million distances
+    
+    Returns
+    -------
+    numpy array
+        the matrix of distances, with a row per origin and a column per destination
+    """
+    
+    lats1, lngs1, lats2, lngs2 = [np.asarray(values).ravel() for values in (lats1, lngs1, lats2, lngs2)]
+    if dtype is None:
+        dtype = np.result_type(lats1, lngs1, lats2, lngs2)
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+    if chunk_size is None:
+        chunk_size = max(int(1e6 // max(len(lats2), 1)), 1)
+    
+    distances = np.empty((len(lats1), len(lats2)), dtype=dtype)
+    for start in range(0, len(lats1), chunk_size):
+        end = start + chunk_size
+        great_circle_vec(lats1[start:end, np.newaxis], lngs1[start:end, np.newaxis], lats2, lngs2, 
+                         earth_radius=earth_radius, out=distances[start:end])
+    return distances
+
+
+def is_projected(crs):
+    """
+    Determine if a coordinate reference system is projected or if it is unprojected lat-long.
+    
+    Parameters
+    ----------
+    crs : dict or string
+        the crs, eg a graph's G.graph['crs']; None means lat-long
+    
+    Returns
+    -------
+    bool
+    """
+    
+    if crs is None:
+        return False
+    if isinstance(crs, dict):
+        return not (str(crs.get('init', '')).lower() == 'epsg:4326' or crs.get('proj') in ['longlat', 'latlong', 'lonlat', 'latlon'])
+    crs = str(crs).lower()
+    return not ('epsg:4326' in crs or 'proj=longlat' in crs or 'proj=latlong' in crs)
+
+
+def get_nearest_node_index(G):
+    """
+    Get a spatial index of a graph's nodes to find their nearest neighbors, building it on first use.
+    
+    For lat-long graphs, the index is a KD-tree of the nodes on the unit sphere in 3D, in which the 
+    straight-line (chord) distance between two points is a monotonic function of their great-circle 
+    distance. For projected graphs, it is a KD-tree of the nodes' planar coordinates. The index is 
+    cached per graph (and dropped when the graph is garbage collected), and rebuilt if the graph's 
+    number of nodes or crs have changed since. Other edits, such as moving nodes, are not detected: 
+    call clear_nearest_indexes after them. It requires scipy.
     
+    Parameters
+    ----------
+    G : networkx multidigraph
+    
+    Returns
+    -------
+    dict
+        'tree' (the scipy cKDTree), 'nodes' (array of node ids, in the tree's order) and 'projected' (bool)
+    """
     
+    signature = (len(G), repr(G.graph.get('crs')))
+    with nearest_node_indexes_lock:
+        index = nearest_node_indexes.get(G)
+    if index is not None and index['signature'] == signature:
+        return index
+    
+    if cKDTree is None:
+        raise ImportError('get_nearest_node_index requires the scipy package')
+    
+    start_time = time.time()
+    nodes = G.nodes()
+    y = np.array([G.node[node]['y'] for node in nodes], dtype=np.float64)
+    x = np.array([G.node[node]['x'] for node in nodes], dtype=np.float64)
+    projected = is_projected(G.graph.get('crs'))
+    if projected:
+        tree = cKDTree(np.column_stack([x, y]))
+    else:
+        tree = cKDTree(latlng_to_unit_sphere(y, x))
+    
+    index = {'tree':tree, 'nodes':get_node_id_array(nodes), 'projected':projected, 'signature':signature}
+    with nearest_node_indexes_lock:
+        nearest_node_indexes[G] = index
+    log('Built nearest node index of {:,} nodes in {:,.2f} seconds'.format(len(nodes), time.time()-start_time))
+    return index
+
+
+def clear_nearest_indexes(G, edge_vertices=True):
+    """
+    Drop a graph's cached nearest-node, nearest-edge and edge vertex indexes, so they are rebuilt from the graph on next use.
+    
+    Call this after editing a graph's nodes or edges in place, eg changing their coordinates or 
+    geometries or replacing them with the same number of others. The osmnx functions that modify 
+    graphs in place call it themselves.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    edge_vertices : bool
+        if False, keep the edge vertex index, for functions that keep it up to date themselves 
+        (see add_to_edge_vertex_index)
+    
+    Returns
+    -------
+    None
+    """
+    
+    with nearest_node_indexes_lock:
+        nearest_node_indexes.pop(G, None)
+    with nearest_edge_indexes_lock:
+        nearest_edge_indexes.pop(G, None)
+    if edge_vertices:
+        with edge_vertex_indexes_lock:
+            edge_vertex_indexes.pop(G, None)
+
+
+def get_node_id_array(nodes):
+    """
+    Convert a list of node ids into a numpy array: of integers if they all are (as osmids are), else of objects.
+    
+    Parameters
+    ----------
+    nodes : list
+    
+    Returns
+    -------
+    numpy array
+    """
+    
+    node_ids = np.array(nodes)
+    if node_ids.ndim != 1 or node_ids.dtype.kind not in 'iu':
+        node_ids = np.empty(len(nodes), dtype=object)
+        for position, node in enumerate(nodes):
+            node_ids[position] = node
+    return node_ids
+
+
+def latlng_to_unit_sphere(lat, lng):
+    """
+    Convert lat-long coordinates to 3D cartesian coordinates on the unit sphere.
+    
+    Parameters
+    ----------
+    lat : array of float
+    lng : array of float
+    
+    Returns
+    -------
+    numpy array
+        an array with an (x, y, z) row per point
+    """
+    
+    lat = np.deg2rad(np.asarray(lat, dtype=np.float64))
+    lng = np.deg2rad(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.column_stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)])
+
+
+def get_nearest_nodes(G, points, return_dist=False, earth_radius=6371009):
+    """
+    Return the graph nodes nearest to each of an array of points, in one vectorized query.
+    
+    Queries the graph's cached nearest-node index (see get_nearest_node_index) if scipy is installed, 
+    else compares every point to every node with great_circle_matrix.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    points : array-like
+        the (lat, lon) points (or (y, x) points in the graph's crs, if it is projected) for which we 
+        will find the nearest nodes in the graph, one per row
+    return_dist : bool
+        optionally also return the distances between the points and their nearest nodes
+    earth_radius : numeric
+        radius of earth in units in which distances to lat-long graphs' nodes will be returned (default is meters)
+    
+    Returns
+    -------
+    numpy array or tuple
+        array of node ids or optionally (array of node ids, array of distances)
+    """
+    
+    start_time = time.time()
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    
+    if cKDTree is not None:
+        index = get_nearest_node_index(G)
+        if index['projected']:
+            distances, positions = index['tree'].query(points[:, ::-1])
+        else:
+            # turn the chord distances on the unit sphere into great-circle distances
+            chords, positions = index['tree'].query(latlng_to_unit_sphere(points[:, 0], points[:, 1]))
+            distances = 2 * earth_radius * np.arcsin(np.clip(chords / 2, 0, 1))
+        nearest_nodes = index['nodes'][positions]
+    else:
+        nodes = get_node_id_array(G.nodes())
+        y = np.array([G.node[node]['y'] for node in nodes], dtype=np.float64)
+        x = np.array([G.node[node]['x'] for node in nodes], dtype=np.float64)
+        nearest_nodes = np.empty(len(points), dtype=nodes.dtype)
+        distances = np.empty(len(points), dtype=np.float64)
+        # a block of points at a time, so the distance matrix stays small
+        chunk_size = max(int(1e6 // max(len(nodes), 1)), 1)
+        for start in range(0, len(points), chunk_size):
+            end = start + chunk_size
+            if is_projected(G.graph.get('crs')):
+                matrix = np.hypot(points[start:end, 0:1] - y, points[start:end, 1:2] - x)
+            else:
+                matrix = great_circle_matrix(points[start:end, 0], points[start:end, 1], y, x, earth_radius=earth_radius)
+            positions = np.argmin(matrix, axis=1)
+            nearest_nodes[start:end] = nodes[positions]
+            distances[start:end] = matrix[np.arange(len(positions)), positions]
+    
+    log('Found nearest nodes to {:,} points in {:,.2f} seconds'.format(len(points), time.time()-start_time))
+    if return_dist:
+        return nearest_nodes, distances
+    else:
+        return nearest_nodes
+
+
 def get_nearest_node(G, point, return_dist=False):
     """
     Return the graph node nearest to some specified point.
     
+    To find the nearest nodes to many points, get_nearest_nodes is much faster than calling this once per point.
+    
     Parameters
     ----------
     G : networkx multidigraph
     point : tuple
-        the (lat, lon) point for which we will find the nearest node in the graph
+        the (lat, lon) point for which we will find the nearest node in the graph (or (y, x) in the graph's 
+        crs, if it is projected)
     return_dist : bool
         optionally also return the distance between the point and the nearest node
     
@@ -290,31 +722,436 @@ def get_nearest_node(G, point, return_dist=False):
     """    
     start_time = time.time()
     
-    # dump graph node coordinates into a pandas dataframe indexed by node id with x and y columns
-    coords = np.array([[node, data['x'], data['y']] for node, data in G.nodes(data=True)])
-    df = pd.DataFrame(coords, columns=['node', 'x', 'y']).set_index('node')
-    
-    # add columns to the dataframe representing the (constant) coordinates of the reference point
-    df['reference_y'] = point[0]
-    df['reference_x'] = point[1]
-    
-    # calculate the distance between each node and the reference point
-    distances = great_circle_vec(lat1=df['reference_y'], 
-                                 lng1=df['reference_x'],
-                                 lat2=df['y'], 
-                                 lng2=df['x'])
-    
-    # nearest node's ID is the index label of the minimum distance
-    nearest_node = int(distances.idxmin())
+    nearest_nodes, distances = get_nearest_nodes(G, [point], return_dist=True)
+    # return the node's id as a python object, rather than as a numpy scalar
+    nearest_node = nearest_nodes[0]
+    if isinstance(nearest_node, np.generic):
+        nearest_node = nearest_node.item()
     log('Found nearest node ({}) to point {} in {:,.2f} seconds'.format(nearest_node, point, time.time()-start_time))
     
     # if caller requested return_dist, return distance between the point and the nearest node as well
     if return_dist:
-        return nearest_node, distances.loc[nearest_node]
+        return nearest_node, distances[0]
     else:
         return nearest_node
         
 
+def get_nearest_edge_index(G, earth_radius=6371009):
+    """
+    Get a spatial index of a graph's edge geometries to snap points to their nearest edges, building it on first use.
+    
+    The index is a shapely STRtree of the edges' geometries (or of straight lines between their nodes, 
+    for edges without one). Lat-long graphs' coordinates are first scaled by an equirectangular 
+    projection centered on the graph, so that distances in the index are approximately meters. The 
+    index is cached per graph, and rebuilt if the graph's number of nodes or edges or its crs have 
+    changed since. Other edits, such as new geometries, are not detected: call clear_nearest_indexes 
+    after them.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    earth_radius : numeric
+        radius of earth in units in which lat-long graphs' distances will be returned (default is meters)
+    
+    Returns
+    -------
+    dict
+        'tree' (the STRtree), 'edges' (list of (u, v, key) tuples, in the tree's order), 'geometries' 
+        (list of the scaled LineStrings), 'coords', 'offsets' and 'lengths_along' (their coordinates 
+        as flat arrays) and 'scale' ((x, y) scaled units per unit)
+    """
+    
+    signature = (len(G), G.number_of_edges(), repr(G.graph.get('crs')), earth_radius)
+    with nearest_edge_indexes_lock:
+        index = nearest_edge_indexes.get(G)
+    if index is not None and index['signature'] == signature:
+        return index
+    
+    start_time = time.time()
+    if is_projected(G.graph.get('crs')) or len(G) < 1:
+        x_scale, y_scale = 1., 1.
+    else:
+        # meters per degree of latitude, and per degree of longitude at the graph's mean latitude
+        y_scale = np.deg2rad(1) * earth_radius
+        x_scale = y_scale * np.cos(np.deg2rad(np.mean([data['y'] for node, data in G.nodes(data=True)])))
+    
+    edges = []
+    geometries = []
+    edge_coords = []
+    for u, v, key, data in G.edges(keys=True, data=True):
+        if 'geometry' in data:
+            coords = np.array(data['geometry'].coords, dtype=np.float64)[:, :2]
+        else:
+            coords = np.array([[G.node[u]['x'], G.node[u]['y']], [G.node[v]['x'], G.node[v]['y']]], dtype=np.float64)
+        coords = coords * [x_scale, y_scale]
+        edges.append((u, v, key))
+        geometries.append(LineString(coords))
+        edge_coords.append(coords)
+    
+    # all the edges' scaled coordinates in one array, edge i's running from offsets[i] to offsets[i+1], 
+    # with the length along its edge of each coordinate
+    counts = np.array([len(coords) for coords in edge_coords], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    coords = np.concatenate(edge_coords) if len(edge_coords) > 0 else np.empty((0, 2))
+    segment_lengths = np.hypot(*(coords[1:] - coords[:-1]).T) if len(coords) > 0 else np.empty(0)
+    lengths_along = np.concatenate([[0], np.cumsum(segment_lengths)])
+    lengths_along -= np.repeat(lengths_along[offsets[:-1]], counts)
+    
+    index = {'tree':STRtree(geometries), 'edges':edges, 'geometries':geometries, 'coords':coords, 
+             'offsets':offsets, 'lengths_along':lengths_along, 'scale':(x_scale, y_scale), 'signature':signature}
+    if len(geometries) > 0:
+        # a typical edge's extent, to start the search for each point's nearest edge from
+        bounds = np.array([geometry.bounds for geometry in geometries])
+        index['search_radius'] = max(float(np.median(np.hypot(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1]))), 1e-9)
+    if int(shapely.__version__.split('.')[0]) < 2:
+        # shapely 1.x trees return the geometries themselves: look up their positions by identity
+        index['positions'] = {id(geometry):position for position, geometry in enumerate(geometries)}
+    
+    with nearest_edge_indexes_lock:
+        nearest_edge_indexes[G] = index
+    log('Built nearest edge index of {:,} edges in {:,.2f} seconds'.format(len(edges), time.time()-start_time))
+    return index
+
+
+def get_edge_vertex_index(G):
+    """
+    Get an index of the interior vertices of a graph's edge geometries by their coordinates, building it on first use.
+    
+    Each vertex's (x, y) tuple maps to the (u, v) node pairs of the edges whose geometries have an 
+    interior vertex there, eg to find the simplified edges that an interstitial node was merged into. 
+    Functions that add edges with geometries can add them to the index with add_to_edge_vertex_index 
+    instead of it being rebuilt. Entries are not removed with their edges, so callers must check that 
+    an edge still exists and still has the vertex. The index is cached per graph, and rebuilt if the 
+    graph's number of nodes or crs have changed since it was last built or added to.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    
+    Returns
+    -------
+    dict
+        'vertices' (dict of lists of (u, v) tuples, keyed by (x, y) tuple)
+    """
+    
+    signature = (len(G), repr(G.graph.get('crs')))
+    with edge_vertex_indexes_lock:
+        index = edge_vertex_indexes.get(G)
+    if index is not None and index['signature'] == signature:
+        return index
+    
+    start_time = time.time()
+    index = {'vertices':{}, 'signature':signature}
+    add_to_edge_vertex_index(G, ((u, v) for u, v, data in G.edges(data=True) if 'geometry' in data), index=index)
+    with edge_vertex_indexes_lock:
+        edge_vertex_indexes[G] = index
+    log('Built edge vertex index of {:,} vertices in {:,.2f} seconds'.format(len(index['vertices']), time.time()-start_time))
+    return index
+
+
+def add_to_edge_vertex_index(G, edges, index=None):
+    """
+    Add the interior vertices of some edges' geometries to a graph's edge vertex index, if it has one.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    edges : iterable
+        the (u, v) node pairs of the edges, all of whose geometries are added
+    index : dict
+        the index to add to, if None, the graph's cached index (see get_edge_vertex_index)
+    
+    Returns
+    -------
+    None
+    """
+    
+    if index is None:
+        with edge_vertex_indexes_lock:
+            index = edge_vertex_indexes.get(G)
+        if index is None:
+            return
+    
+    vertices = index['vertices']
+    for u, v in set(edges):
+        for data in G.edge[u][v].values():
+            if 'geometry' in data:
+                for vertex_coords in list(data['geometry'].coords)[1:-1]:
+                    pairs = vertices.setdefault(tuple(vertex_coords[:2]), [])
+                    if not (u, v) in pairs:
+                        pairs.append((u, v))
+    index['signature'] = (len(G), repr(G.graph.get('crs')))
+
+
+def query_nearest_edge(index, point):
+    """
+    Find the position in a nearest-edge index of the edge nearest to a point, with shapely 1.x.
+    
+    Searches the tree within a growing box around the point until it finds edges, then once more within 
+    the distance to the nearest of those, as only edges that close can be nearer.
+    
+    Parameters
+    ----------
+    index : dict
+        a nearest-edge index from get_nearest_edge_index
+    point : shapely Point
+        the point, in the index's scaled coordinates
+    
+    Returns
+    -------
+    int
+    """
+    
+    radius = index['search_radius']
+    while True:
+        candidates = index['tree'].query(box(point.x - radius, point.y - radius, point.x + radius, point.y + radius))
+        if len(candidates) > 0:
+            break
+        radius *= 4
+    
+    radius = min(geometry.distance(point) for geometry in candidates)
+    candidates = index['tree'].query(point.buffer(radius * (1 + 1e-9) + 1e-12).envelope)
+    nearest = min(candidates, key=lambda geometry: geometry.distance(point))
+    return index['positions'][id(nearest)]
+
+
+def get_nearest_edges(G, points, earth_radius=6371009):
+    """
+    Snap each of an array of points to its nearest edge in the graph.
+    
+    Uses the graph's cached nearest-edge index (see get_nearest_edge_index) to find each point's nearest 
+    edge (in one vectorized query with shapely 2), then projects all the points onto their edges at once. For lat-long graphs, distances are great-circle 
+    approximations (by an equirectangular projection centered on the graph) in units of earth_radius; for 
+    projected graphs, they are in the graph's units.
+    
+    Parameters
+    ----------
+    G : networkx multidigraph
+    points : array-like
+        the (lat, lon) points (or (y, x) points in the graph's crs, if it is projected) to snap, one per row
+    earth_radius : numeric
+        radius of earth in units in which lat-long graphs' distances will be returned (default is meters)
+    
+    Returns
+    -------
+    edges, projected_points, distances_along, offsets : tuple
+        the (u, v, key) of each point's nearest edge, a (y, x) row per point of where it projects onto 
+        that edge, how far along the edge (from u) that is, and the point's distance from the edge, 
+        positive if the point is to the left of the edge's direction of travel and negative if it is to the right
+    """
+    
+    start_time = time.time()
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    index = get_nearest_edge_index(G, earth_radius=earth_radius)
+    if len(index['edges']) < 1:
+        raise ValueError('Graph has no edges to snap points to')
+    x_scale, y_scale = index['scale']
+    xy = np.column_stack([points[:, 1] * x_scale, points[:, 0] * y_scale])
+    
+    # find each point's nearest edge
+    if int(shapely.__version__.split('.')[0]) >= 2:
+        positions = index['tree'].nearest(shapely.points(xy))
+    elif hasattr(index['tree'], 'nearest'):
+        positions = np.array([index['positions'][id(index['tree'].nearest(Point(x, y)))] for x, y in xy.tolist()], dtype=np.int64)
+    else:
+        positions = np.array([query_nearest_edge(index, Point(x, y)) for x, y in xy.tolist()], dtype=np.int64)
+    positions = np.asarray(positions, dtype=np.int64)
+    
+    # then project each point onto every segment of its nearest edge at once, and keep the nearest segment
+    coords = index['coords']
+    starts = index['offsets'][positions]
+    segment_counts = index['offsets'][positions + 1] - starts - 1
+    group_starts = np.cumsum(segment_counts) - segment_counts
+    segment_points = np.repeat(np.arange(len(points)), segment_counts)
+    segments = np.repeat(starts - group_starts, segment_counts) + np.arange(segment_counts.sum())
+    segment_starts = coords[segments]
+    segment_vectors = coords[segments + 1] - segment_starts
+    point_vectors = xy[segment_points] - segment_starts
+    squared_lengths = (segment_vectors ** 2).sum(axis=1)
+    fractions = np.clip((point_vectors * segment_vectors).sum(axis=1) / np.where(squared_lengths > 0, squared_lengths, 1), 0, 1)
+    projected = segment_starts + fractions[:, np.newaxis] * segment_vectors
+    squared_distances = ((xy[segment_points] - projected) ** 2).sum(axis=1)
+    nearest = np.lexsort((squared_distances, segment_points))[group_starts]
+    
+    projected = projected[nearest]
+    distances_along = index['lengths_along'][segments[nearest]] + fractions[nearest] * np.sqrt(squared_lengths[nearest])
+    
+    # the offset's sign is the side of the segment's direction of travel the point is on
+    offsets = np.sqrt(squared_distances[nearest])
+    segment_vectors = segment_vectors[nearest]
+    point_vectors = point_vectors[nearest]
+    cross = segment_vectors[:, 0] * point_vectors[:, 1] - segment_vectors[:, 1] * point_vectors[:, 0]
+    offsets = np.where(cross < 0, -offsets, offsets)
+    
+    edges = [index['edges'][position] for position in positions.tolist()]
+    projected_points = np.column_stack([projected[:, 1] / y_scale, projected[:, 0] / x_scale])
+    log('Found nearest edges to {:,} points in {:,.2f} seconds'.format(len(points), time.time()-start_time))
+    return edges, projected_points, distances_along, offsets
+
+
+def get_session():
+    """
+    Get the http session shared by all requests to the APIs, creating it if it does not exist yet.
+    
+    The session keeps connections alive and pools them (up to globals.http_pool_size per host), 
+    so consecutive requests to the same host skip the TCP/TLS handshake, and it asks servers 
+    for gzip-compressed responses.
+    
+    Returns
+    -------
+    requests.Session
+    """
+    global session
+    with session_lock:
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=globals.http_pool_size, pool_maxsize=globals.http_pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers.update({'Accept-Encoding':'gzip, deflate'})
+        return session
+
+
+def reset_session():
+    """
+    Close the shared http session, so the next request opens a new one.
+    
+    Returns
+    -------
+    None
+    """
+    global session
+    with session_lock:
+        if session is not None:
+            session.close()
+            session = None
+
+
+def get_endpoints(api):
+    """
+    Get the configured endpoints of an API, in the order a request should try them.
+    
+    Parameters
+    ----------
+    api : string
+        {'overpass', 'nominatim'} which API to get the endpoints of
+    
+    Returns
+    -------
+    list
+        the endpoints' base URLs
+    """
+    if api == 'overpass':
+        endpoints = list(globals.overpass_endpoints)
+    elif api == 'nominatim':
+        endpoints = list(globals.nominatim_endpoints)
+    else:
+        raise ValueError('unknown api "{}"'.format(api))
+    
+    if globals.endpoint_strategy == 'round_robin':
+        # rotate the list so each request starts at the endpoint after the one the previous request started at
+        with session_lock:
+            count = endpoint_request_counts.get(api, 0)
+            endpoint_request_counts[api] = count + 1
+        start = count % len(endpoints)
+        endpoints = endpoints[start:] + endpoints[:start]
+    elif not globals.endpoint_strategy == 'failover':
+        raise ValueError('unknown endpoint_strategy "{}"'.format(globals.endpoint_strategy))
+    
+    return endpoints
+
+
+def wait_for_rate_limit(endpoint, rate_limit):
+    """
+    Block until the rate limit allows another request to be sent to this endpoint.
+    
+    Each caller reserves the next free send time under a lock, then sleeps until it 
+    arrives, so concurrent threads space their requests evenly instead of bursting.
+    
+    Parameters
+    ----------
+    endpoint : string
+        the API endpoint the request will be sent to
+    rate_limit : numeric
+        max requests per second to send to the endpoint, if None, do not wait
+    
+    Returns
+    -------
+    None
+    """
+    if not rate_limit:
+        return
+    
+    with rate_limit_lock:
+        now = time.time()
+        send_time = max(now, rate_limit_next_send.get(endpoint, now))
+        rate_limit_next_send[endpoint] = send_time + 1. / rate_limit
+    
+    if send_time > now:
+        time.sleep(send_time - now)
+
+
+def request_endpoint(api, path, method='GET', params=None, data=None, timeout=180, endpoint=None, send_wrapper=None):
+    """
+    Send a request to an API through the shared http session, failing over across its endpoints.
+    
+    If an endpoint cannot be reached or returns a 5xx server error, the request is sent to 
+    the API's next endpoint. If every endpoint fails, the last response is returned (or the 
+    last connection error is raised).
+    
+    Parameters
+    ----------
+    api : string
+        {'overpass', 'nominatim'} which API to send the request to
+    path : string
+        the path to request, relative to the endpoint's base URL (e.g., 'interpreter')
+    method : string
+        {'GET', 'POST'} the http method
+    params : dict
+        the query string parameters
+    data : dict
+        the form data to post
+    timeout : int
+        the timeout interval for the requests library
+    endpoint : string
+        if not None, send the request to this endpoint only, without failing over
+    send_wrapper : function
+        if not None, function taking an endpoint and a function with no arguments that sends the 
+        request to that endpoint, which must call the function and return its response (e.g., to 
+        hold one of the endpoint's query slots while the request is in flight)
+    
+    Returns
+    -------
+    requests.Response
+    """
+    if api == 'overpass':
+        rate_limit = globals.overpass_rate_limit
+    else:
+        rate_limit = None
+    
+    endpoints = get_endpoints(api) if endpoint is None else [endpoint]
+    response = None
+    for i, endpoint in enumerate(endpoints):
+        url = '{}/{}'.format(endpoint, path)
+        def send():
+            wait_for_rate_limit(endpoint, rate_limit)
+            return get_session().request(method, url, params=params, data=data, timeout=timeout)
+        try:
+            response = send() if send_wrapper is None else send_wrapper(endpoint, send)
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if i == len(endpoints) - 1:
+                raise
+            log('Could not reach {} ({}), failing over to {}'.format(endpoint, e, endpoints[i+1]), level=lg.WARNING)
+            continue
+        
+        if response.status_code >= 500 and i < len(endpoints) - 1:
+            log('{} returned status code {}, failing over to {}'.format(endpoint, response.status_code, endpoints[i+1]), level=lg.WARNING)
+            continue
+        break
+    
+    return response
+
+
 def geocode(query):
     """
     Geocode a query string to (lat, lon) with the Nominatim geocoder
@@ -331,9 +1168,8 @@ def geocode(query):
     """
     
     # send the query to the nominatim geocoder and parse the json response
-    url_template = 'https://nominatim.openstreetmap.org/search?format=json&limit=1&q={}'
-    url = url_template.format(query)
-    response = requests.get(url, timeout=60)
+    params = OrderedDict([('format', 'json'), ('limit', 1), ('q', query)])
+    response = request_endpoint('nominatim', 'search', params=params, timeout=60)
     results = response.json()
     
     # if results were returned, parse lat and long out of the result
@@ -50,7 +50,7 @@ setup(name='osmnx',
       data_files = [('', ['LICENSE.txt'])],
       packages=['osmnx'],
       install_requires=['requests>=2.11',
-                        'numpy>=1.11',
+                        'numpy>=1.13',
                         'pandas>=0.19',
                         'geopandas>=0.2.1',
                         'networkx>=1.11',
@@ -58,5 +58,8 @@ setup(name='osmnx',
                         'Shapely>=1.5',
                         'descartes>=1.0',
                         'Rtree>=0.8.3'],
-      extras_require={'folium':['folium>=0.2']})
+      extras_require={'folium':['folium>=0.2'],
+                      'cache':['ijson>=3.1', 'zstandard>=0.11'],
+                      'nearest':['scipy>=0.17'],
+                      'parquet':['pyarrow>=0.15']})
 
@@ -0,0 +1,254 @@
+###################################################################################################
+# Module: benchmarks.py
+# Description: Time osmnx functions against reference copies of the implementations they replaced
+# License: MIT, see full license in LICENSE.txt
+# Web: https://github.com/gboeing/osmnx
+###################################################################################################
+#
+# Run from the repository root with: python tests/benchmarks.py
+# Nothing here needs network access.
+
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import networkx as nx
+import osmnx as ox
+from shapely.geometry import Point
+
+
+def make_grid_graph(size=300, base_osmid=2**60):
+    """
+    Make a bi-directional street grid of size x size nodes, with osmids too large to round-trip through floats.
+    """
+    G = nx.MultiDiGraph(name='grid', crs={'init':'epsg:4326'})
+    for i in range(size):
+        for j in range(size):
+            G.add_node(base_osmid + i * size + j, y=37.7 + i * 1e-3, x=-122.4 + j * 1e-3, osmid=base_osmid + i * size + j)
+    for i in range(size):
+        for j in range(size):
+            node = base_osmid + i * size + j
+            if j + 1 < size:
+                G.add_edge(node, node + 1, osmid=i, oneway=False)
+                G.add_edge(node + 1, node, osmid=i, oneway=False)
+            if i + 1 < size:
+                G.add_edge(node, node + size, osmid=size + j, oneway=False)
+                G.add_edge(node + size, node, osmid=size + j, oneway=False)
+    return G
+
+
+def reference_add_edge_lengths(G):
+    """
+    add_edge_lengths as of osmnx 0.4: a float array of [u, v, k, coords] per edge, then a MultiIndex dataframe.
+    """
+    coords = np.array([[u, v, k, G.node[u]['y'], G.node[u]['x'], G.node[v]['y'], G.node[v]['x']] for u, v, k in G.edges(keys=True)])
+    df_coords = pd.DataFrame(coords, columns=['u', 'v', 'k', 'u_y', 'u_x', 'v_y', 'v_x'])
+    df_coords[['u', 'v', 'k']] = df_coords[['u', 'v', 'k']].astype(np.int64)
+    df_coords = df_coords.set_index(['u', 'v', 'k'])
+    gc_distances = ox.great_circle_vec(lat1=df_coords['u_y'], lng1=df_coords['u_x'],
+                                       lat2=df_coords['v_y'], lng2=df_coords['v_x'])
+    gc_distances = gc_distances.fillna(value=0)
+    nx.set_edge_attributes(G, 'length', gc_distances.to_dict())
+    return G
+
+
+def make_chains_graph(count=200, length=800, base_osmid=0):
+    """
+    Make count bi-directional chains of length nodes, each running from a dead end to a shared hub node.
+    """
+    G = nx.MultiDiGraph(name='chains', crs={'init':'epsg:4326'})
+    hub = base_osmid
+    G.add_node(hub, y=37.7, x=-122.4, osmid=hub)
+    for i in range(count):
+        previous = hub
+        for j in range(length):
+            node = base_osmid + 1 + i * length + j
+            G.add_node(node, y=37.7 + (j + 1) * 1e-4, x=-122.4 + i * 1e-3, osmid=node)
+            G.add_edge(previous, node, osmid=i, oneway=False)
+            G.add_edge(node, previous, osmid=i, oneway=False)
+            previous = node
+    return G
+
+
+def reference_build_path(G, node, endpoints, path):
+    """
+    build_path as of osmnx 0.4: recursive, checking membership in the path list.
+    """
+    for successor in G.successors(node):
+        if not successor in path:
+            path.append(successor)
+            if not successor in endpoints:
+                path = reference_build_path(G, successor, endpoints, path)
+            else:
+                return path
+    if (not path[-1] in endpoints) and (path[0] in G.successors(path[-1])):
+        path.append(path[0])
+    return path
+
+
+def reference_get_paths_to_simplify(G, endpoints):
+    """
+    The path building loop of get_paths_to_simplify as of osmnx 0.4.
+    """
+    paths_to_simplify = []
+    for node in endpoints:
+        for successor in G.successors(node):
+            if not successor in endpoints:
+                try:
+                    paths_to_simplify.append(reference_build_path(G, successor, endpoints, path=[node, successor]))
+                except RuntimeError:
+                    pass
+    return paths_to_simplify
+
+
+def reference_truncate_graph_bbox(G, north, south, east, west, truncate_by_edge=False):
+    """
+    truncate_graph_bbox as of osmnx 0.4 (with retain_all=True): copy the graph, then test each node in a loop.
+    """
+    G = G.copy()
+    nodes_outside_bbox = []
+    for node, data in G.nodes(data=True):
+        if data['y'] > north or data['y'] < south or data['x'] > east or data['x'] < west:
+            if not truncate_by_edge:
+                nodes_outside_bbox.append(node)
+            else:
+                any_neighbors_in_bbox = False
+                for neighbor in list(G.successors(node)) + list(G.predecessors(node)):
+                    x = G.node[neighbor]['x']
+                    y = G.node[neighbor]['y']
+                    if y < north and y > south and x < east and x > west:
+                        any_neighbors_in_bbox = True
+                if not any_neighbors_in_bbox:
+                    nodes_outside_bbox.append(node)
+    G.remove_nodes_from(nodes_outside_bbox)
+    return G
+
+
+def reference_truncate_graph_polygon(G, polygon, quadrat_width=0.025, buffer_amount=1e-9):
+    """
+    truncate_graph_polygon as of osmnx 0.4 (with retain_all=True): a GeoDataFrame of node Points, 
+    then an r-tree query and DataFrame.append per quadrat of the polygon.
+    """
+    G = G.copy()
+    node_geom = [Point(data['x'], data['y']) for _, data in G.nodes(data=True)]
+    gdf_nodes = gpd.GeoDataFrame({'node':pd.Series(G.nodes()), 'geometry':node_geom})
+    points_within_geometry = pd.DataFrame()
+    multipoly = ox.quadrat_cut_geometry(polygon, quadrat_width=quadrat_width, buffer_amount=buffer_amount)
+    sindex = gdf_nodes['geometry'].sindex
+    for poly in getattr(multipoly, 'geoms', [multipoly]):
+        poly = poly.buffer(quadrat_width * buffer_amount).buffer(0)
+        possible_matches = gdf_nodes.iloc[list(sindex.intersection(poly.bounds))]
+        points_within_geometry = points_within_geometry.append(possible_matches[possible_matches.intersects(poly)])
+    points_within_geometry = points_within_geometry.drop_duplicates(subset='node')
+    G.remove_nodes_from(gdf_nodes[~gdf_nodes.index.isin(points_within_geometry.index)]['node'])
+    return G
+
+
+def benchmark(name, function, *args, **kwargs):
+    """
+    Print how long a call takes, and return its result.
+    """
+    start_time = time.time()
+    result = function(*args, **kwargs)
+    print('{:<48} {:>8.3f} seconds'.format(name, time.time() - start_time))
+    return result
+
+
+def benchmark_add_edge_lengths(size=300):
+
+    G = make_grid_graph(size, base_osmid=0)
+    print('add_edge_lengths, {:,} edges'.format(len(G.edges())))
+    benchmark('reference', reference_add_edge_lengths, G.copy())
+    benchmark('current', ox.add_edge_lengths, G.copy())
+
+    # the reference casts osmids to float, so it writes lengths to the wrong edges once they pass 2**53
+    G = ox.add_edge_lengths(make_grid_graph(10))
+    assert all(data['length'] > 80 for u, v, data in G.edges(data=True))
+
+
+def benchmark_get_paths_to_simplify(count=200, length=800):
+
+    G = make_chains_graph(count, length)
+    print('get_paths_to_simplify, {:,} nodes in chains of {:,}'.format(len(G), length))
+    endpoints = set([node for node in G.nodes() if ox.is_endpoint(G, node)])
+    reference_paths = benchmark('reference (path building only)', reference_get_paths_to_simplify, G, endpoints)
+    paths = benchmark('current', ox.get_paths_to_simplify, G)
+    assert sorted(paths) == sorted(reference_paths)
+
+
+def benchmark_identify_endpoints(size=600):
+
+    G = make_grid_graph(size)
+    print('identify_endpoints, {:,} nodes'.format(len(G)))
+    for strict in [True, False]:
+        reference = benchmark('reference (is_endpoint per node), strict={}'.format(strict), 
+                              lambda: set([node for node in G.nodes() if ox.is_endpoint(G, node, strict=strict)]))
+        endpoints = benchmark('current, strict={}'.format(strict), ox.identify_endpoints, G, strict=strict)
+        assert set(endpoints) == reference
+
+
+def benchmark_truncate_graph_bbox(size=300):
+
+    G = make_grid_graph(size)
+    C = ox.graph_to_compact(G)
+    print('truncate_graph_bbox, {:,} nodes'.format(len(G)))
+    bbox = (37.7 + size * 6e-4, 37.7 + size * 2e-4, -122.4 + size * 6e-4, -122.4 + size * 2e-4)
+    for truncate_by_edge in [False, True]:
+        reference = benchmark('reference, truncate_by_edge={}'.format(truncate_by_edge), 
+                              reference_truncate_graph_bbox, G, *bbox, truncate_by_edge=truncate_by_edge)
+        G_bbox = benchmark('current, truncate_by_edge={}'.format(truncate_by_edge), 
+                           ox.truncate_graph_bbox, G, *bbox, truncate_by_edge=truncate_by_edge, retain_all=True)
+        C_bbox = benchmark('current, compact graph, truncate_by_edge={}'.format(truncate_by_edge), 
+                           ox.truncate_graph_bbox, C, *bbox, truncate_by_edge=truncate_by_edge, retain_all=True)
+        assert set(G_bbox.nodes()) == set(reference.nodes()) == set(C_bbox.node_ids.tolist())
+
+
+def benchmark_truncate_graph_polygon(size=300):
+
+    G = make_grid_graph(size)
+    print('truncate_graph_polygon, {:,} nodes'.format(len(G)))
+    center = Point(-122.4 + size * 5e-4, 37.7 + size * 5e-4)
+    polygon = center.buffer(size * 3e-4)
+    reference = benchmark('reference', reference_truncate_graph_polygon, G, polygon, quadrat_width=size * 1e-4)
+    G_polygon = benchmark('current', ox.truncate_graph_polygon, G, polygon, retain_all=True)
+    assert set(G_polygon.nodes()) == set(reference.nodes())
+
+
+def benchmark_graph_binary(size=200):
+
+    G = ox.add_edge_lengths(make_grid_graph(size, base_osmid=0))
+    folder = tempfile.mkdtemp()
+    print('save and load, {:,} nodes and {:,} edges'.format(len(G), G.number_of_edges()))
+    benchmark('save_graphml', ox.save_graphml, G, folder=folder)
+    benchmark('load_graphml', ox.load_graphml, 'graph.graphml', folder=folder)
+    benchmark('save_graph_binary', ox.save_graph_binary, G, folder=folder)
+    G_binary = benchmark('load_graph_binary', ox.load_graph_binary, folder=folder)
+    benchmark('load_graph_binary, compact', ox.load_graph_binary, folder=folder, compact=True)
+    assert G_binary.node == G.node
+
+
+def benchmark_graph_parquet(size=200):
+
+    G = ox.add_edge_lengths(make_grid_graph(size, base_osmid=0))
+    folder = tempfile.mkdtemp()
+    print('save and load geoparquet, {:,} nodes and {:,} edges'.format(len(G), G.number_of_edges()))
+    benchmark('save_graphml', ox.save_graphml, G, folder=folder)
+    benchmark('load_graphml', ox.load_graphml, 'graph.graphml', folder=folder)
+    benchmark('save_graph_parquet', ox.save_graph_parquet, G, folder=folder)
+    G_parquet = benchmark('load_graph_parquet', ox.load_graph_parquet, folder=folder)
+    benchmark('load_graph_parquet, compact', ox.load_graph_parquet, folder=folder, compact=True)
+    benchmark('load_graph_parquet, compact, length only', ox.load_graph_parquet, folder=folder, 
+              node_columns=[], edge_columns=['length'], compact=True)
+    assert G_parquet.node == G.node
+
+
+if __name__ == '__main__':
+    ox.config(log_console=False, log_file=False)
+    benchmark_add_edge_lengths()
+    benchmark_get_paths_to_simplify()
+    benchmark_identify_endpoints()
+    benchmark_truncate_graph_bbox()
+    benchmark_truncate_graph_polygon()
+    benchmark_graph_binary()
+    benchmark_graph_parquet()
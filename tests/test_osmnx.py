@@ -22,7 +22,7 @@ ox.log('test error', level=lg.ERROR)
 
 def test_imports():
     
-    import json, math, sys, os, io, ast, unicodedata, hashlib, re, random, time, warnings, datetime as dt, logging as lg
+    import json, math, sys, os, io, ast, unicodedata, hashlib, re, random, time, warnings, gzip, zlib, sqlite3, datetime as dt, logging as lg
     from collections import OrderedDict, Counter
     from itertools import groupby, chain
     from dateutil import parser as date_parser
@@ -35,6 +35,669 @@ def test_imports():
     from rtree.index import Index as RTreeIndex
     
     
+def test_cache():
+
+    url = 'https://nominatim.openstreetmap.org/search?format=json&q=test'
+    response_json = [{'place_id':1, 'display_name':'test'}]
+
+    # save to and load from the folder cache, then migrate the folder into a sqlite cache database
+    ox.save_to_cache(url, response_json)
+    assert ox.get_from_cache(url) == response_json
+    ox.config(use_cache=True, cache_backend='sqlite', cache_max_size=10**6, data_folder='.temp/data',
+              logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+    assert ox.migrate_cache_folder() > 0
+    assert ox.get_from_cache(url) == response_json
+    assert ox.get_from_cache(url + '&limit=1') is None
+
+    ox.save_to_cache(url + '&limit=1', response_json)
+    assert ox.prune_cache(max_size=0) == 2
+    stats = ox.get_cache_stats()
+    assert stats['entries'] == 0 and stats['hits'] > 0 and stats['misses'] > 0
+
+    # stream the elements of a gzip-compressed overpass response out of the cache into nodes and paths
+    response_json = {'elements':[{'type':'node', 'id':1, 'lat':37.79, 'lon':-122.41},
+                                 {'type':'node', 'id':2, 'lat':37.78, 'lon':-122.42},
+                                 {'type':'way', 'id':3, 'nodes':[1, 2], 'tags':{'highway':'residential'},
+                                  'center':{'lat':37.785, 'lon':-122.415}}]}
+    ox.config(use_cache=True, cache_compression='gzip', data_folder='.temp/data',
+              logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+    ox.save_to_cache(url, response_json)
+    assert ox.get_from_cache(url) == response_json
+    assert list(ox.iter_cache_elements(url)) == response_json['elements']
+    nodes, paths = ox.parse_osm_nodes_paths(ox.iter_cache_elements(url))
+    assert len(nodes) == 2 and paths[3]['nodes'] == [1, 2]
+
+    # build a graph in one pass from a streamed response plus an overlapping in-memory one
+    G = ox.create_graph([ox.iter_cache_elements(url), response_json], retain_all=True)
+    assert len(G.nodes()) == 2 and len(G.edges()) == 2
+
+    # streaming goes through the same expiry and hit/miss bookkeeping as get_from_cache
+    ox.config(use_cache=True, cache_backend='sqlite', data_folder='.temp/data',
+              logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+    ox.save_to_cache(url, response_json)
+    ox.reset_cache_stats()
+    assert len(list(ox.iter_cache_elements(url))) == 3 and ox.get_cache_stats()['hits'] == 1
+    ox.config(use_cache=True, cache_backend='sqlite', cache_max_age=0, data_folder='.temp/data',
+              logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+    assert list(ox.iter_cache_elements(url)) == [] and ox.get_cache_stats()['evictions'] == 1
+
+    # the folder cache evicts least-recently used files first, and prunes itself when limits are set
+    ox.config(use_cache=True, data_folder='.temp/data', logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+    ox.prune_cache(max_size=0)
+    urls = [url + '&limit={}'.format(i) for i in range(3)]
+    for i, cache_url in enumerate(urls):
+        ox.save_to_cache(cache_url, response_json)
+        os.utime(ox.get_cache_filename(cache_url), (1000 + i, os.path.getmtime(ox.get_cache_filename(cache_url))))
+    assert ox.get_from_cache(urls[0]) == response_json
+    assert ox.prune_cache(max_size=ox.get_cache_stats()['size'] - 1) == 1
+    assert ox.get_cache_filename(urls[1]) is None and ox.get_cache_filename(urls[0]) is not None
+    ox.config(use_cache=True, cache_max_size=0, data_folder='.temp/data', logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+    ox.save_to_cache(url, response_json)
+    assert ox.get_cache_stats()['entries'] == 0
+
+    ox.config(log_console=True, log_file=True, use_cache=True, 
+              data_folder='.temp/data', logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+
+
+def test_great_circle():
+
+    import numpy as np
+    assert ox.great_circle_vec(37.79, -122.41, 37.79, -122.41) == 0
+    lats = np.array([37.79, 37.78, 40.71], dtype=np.float32)
+    lngs = np.array([-122.41, -122.42, -74.01], dtype=np.float32)
+    distances = ox.great_circle_vec(lats[:-1], lngs[:-1], lats[1:], lngs[1:])
+    assert distances.dtype == np.float32 and 1000 < distances[0] < 2000 and 4e6 < distances[1] < 4.2e6
+    matrix = ox.great_circle_matrix(lats, lngs, lats, lngs, chunk_size=2)
+    assert matrix.shape == (3, 3) and (np.diag(matrix) == 0).all() and np.allclose(matrix, matrix.T)
+
+
+def test_nearest_nodes():
+
+    import networkx as nx
+    G = nx.MultiDiGraph(crs={'init':'epsg:4326'})
+    for i in range(10):
+        for j in range(10):
+            G.add_node(i * 10 + j, y=37.7 + i * 1e-3, x=-122.4 + j * 1e-3)
+    nodes, distances = ox.get_nearest_nodes(G, [(37.7031, -122.3979), (37.7, -122.4)], return_dist=True)
+    assert list(nodes) == [32, 0] and distances[1] < 1e-6
+    assert ox.get_nearest_node(G, (37.7031, -122.3979)) == 32
+
+    # moving a node in place is only picked up once the cached index is cleared
+    G.node[0]['y'], G.node[0]['x'] = 37.7031, -122.3979
+    ox.clear_nearest_indexes(G)
+    assert ox.get_nearest_node(G, (37.7031, -122.3979)) == 0
+    G.node[0]['y'], G.node[0]['x'] = 37.7, -122.4
+    ox.clear_nearest_indexes(G)
+
+    # snap points to edges, one of them with a bent geometry
+    from shapely.geometry import LineString
+    G.add_edge(0, 1, key=0)
+    G.add_edge(0, 11, key=0, geometry=LineString([(-122.4, 37.7), (-122.4, 37.701), (-122.399, 37.701)]))
+    edges, projected_points, distances_along, offsets = ox.get_nearest_edges(G, [(37.7001, -122.3995), (37.7008, -122.3999)])
+    assert edges == [(0, 1, 0), (0, 11, 0)]
+    assert abs(projected_points[0][0] - 37.7) < 1e-9 and abs(projected_points[0][1] + 122.3995) < 1e-9
+    assert 40 < distances_along[0] < 50 and 0 < offsets[0] < 20
+    assert 80 < distances_along[1] < 100 and -10 < offsets[1] < 0
+
+    # straightening the bent edge in place is only picked up once the cached index is cleared
+    G.edge[0][11][0]['geometry'] = LineString([(-122.4, 37.7), (-122.399, 37.701)])
+    ox.clear_nearest_indexes(G)
+    edges, projected_points, distances_along, offsets = ox.get_nearest_edges(G, [(37.7008, -122.3999)])
+    assert edges == [(0, 11, 0)] and 0 < offsets[0] < 100
+
+
+def test_simplify_rings_and_long_paths():
+
+    import networkx as nx
+    G = nx.MultiDiGraph(crs={'init':'epsg:4326'})
+    # a one-way ring with no endpoints, and a chain longer than the recursion limit
+    ring = [10, 11, 12, 13, 14]
+    chain = list(range(100, 3100))
+    for node in ring + chain:
+        G.add_node(node, y=37.7 + node * 1e-5, x=-122.4 + (node % 7) * 1e-5, osmid=node)
+    for u, v in zip(ring, ring[1:] + ring[:1]):
+        G.add_edge(u, v, osmid=1, length=1.)
+    for u, v in zip(chain[:-1], chain[1:]):
+        G.add_edge(u, v, osmid=2, length=1.)
+        G.add_edge(v, u, osmid=2, length=1.)
+    G_parallel = ox.simplify_graph(G, processes=2)
+    G_copy = ox.simplify_graph(G)
+    assert ox.simplify_graph(G, copy=False) is G and len(G_copy) == len(G)
+    assert sorted(G.nodes()) == [10, 100, 3099]
+    assert G.edge[10][10][0]['length'] == 5 and G.edge[100][3099][0]['length'] == 2999
+
+    # simplifying in parallel gives the identical graph
+    assert G_parallel.nodes(data=True) == G.nodes(data=True)
+    assert [(u, v, k, sorted(d.items())) for u, v, k, d in G_parallel.edges(keys=True, data=True)] == \
+           [(u, v, k, sorted(d.items())) for u, v, k, d in G.edges(keys=True, data=True)]
+
+
+def test_identify_endpoints():
+
+    import networkx as nx
+    G = nx.MultiDiGraph(crs={'init':'epsg:4326'})
+    for node in range(1, 12):
+        G.add_node(node, y=37.7 + node * 1e-3, x=-122.4, osmid=node)
+    def add_street(u, v, osmid, count=1):
+        for i in range(count):
+            G.add_edge(u, v, osmid=osmid)
+            G.add_edge(v, u, osmid=osmid)
+    # a self-loop at 1, parallel two-way edges between 3 and 4, a change of osmid at 6, and an osmid list 
+    # on both sides of 9 that only differs from the next one at 10
+    G.add_edge(1, 1, osmid=100)
+    add_street(1, 2, 100)
+    add_street(2, 3, 100)
+    add_street(3, 4, 100, count=2)
+    add_street(4, 5, 100)
+    add_street(5, 6, 100)
+    add_street(6, 7, 101)
+    add_street(7, 8, 101)
+    add_street(8, 9, [102, 103])
+    add_street(9, 10, [102, 103])
+    add_street(10, 11, 104)
+
+    # the endpoints are the same as those is_endpoint finds one node at a time
+    endpoints = ox.identify_endpoints(G)
+    assert endpoints == [node for node in G.nodes() if ox.is_endpoint(G, node)] == [1, 3, 4, 11]
+    non_strict = ox.identify_endpoints(G, strict=False)
+    assert non_strict == [1, 3, 4, 6, 8, 10, 11]
+
+    # is_endpoint cannot compare osmid lists, so check it only at the nodes without any
+    scalar_nodes = [node for node in G.nodes() if not node in [8, 9, 10]]
+    assert [node for node in non_strict if node in scalar_nodes] == [node for node in scalar_nodes if ox.is_endpoint(G, node, strict=False)]
+
+
+def test_simplify_graph_incremental():
+
+    import networkx as nx
+    def make_raw_graph(edges, moved={}, **tags):
+        G = nx.MultiDiGraph(crs={'init':'epsg:4326'})
+        for u, v, osmid in edges:
+            for node in [u, v]:
+                G.add_node(node, y=37.7 + node * 1e-3, x=-122.4 + (node % 3) * 1e-3 + moved.get(node, 0), osmid=node)
+            G.add_edge(u, v, osmid=osmid, **tags)
+            G.add_edge(v, u, osmid=osmid, **tags)
+        return ox.add_edge_lengths(G)
+
+    def assert_same_graph(G, G_full):
+        assert sorted(G.nodes()) == sorted(G_full.nodes()) and G.number_of_edges() == G_full.number_of_edges()
+        for u, v, data in G_full.edges(data=True):
+            assert len(G.edge[u][v]) == 1
+            edge = list(G.edge[u][v].values())[0]
+            assert abs(edge['length'] - data['length']) < 1e-6
+            assert ('geometry' in data) == ('geometry' in edge)
+            if 'geometry' in data:
+                assert edge['geometry'].equals(data['geometry'])
+            for key, value in data.items():
+                if not key in ['length', 'geometry']:
+                    assert edge[key] == value
+
+    # a street 1-5 is extended to 7, and a new street 10-3 joins it at a node that was simplified away
+    street = [(1, 2, 100), (2, 3, 100), (3, 4, 100), (4, 5, 100)]
+    G_old = make_raw_graph(street)
+    G_new = make_raw_graph([(5, 6, 101), (6, 7, 101), (10, 3, 102)])
+    G_full = ox.simplify_graph(make_raw_graph(street + [(5, 6, 101), (6, 7, 101), (10, 3, 102)]))
+    G = ox.simplify_graph_incremental(ox.simplify_graph(G_old), G_new)
+    assert sorted(G.nodes()) == [1, 3, 7, 10]
+    assert_same_graph(G, G_full)
+
+    # overlapping tiles share the raw edges of a street already simplified into a chain of two ways
+    tile = [(1, 2, 100), (2, 3, 100), (3, 4, 101), (4, 5, 101)]
+    overlap = [(3, 4, 101), (4, 5, 101), (5, 6, 101)]
+    G_full = ox.simplify_graph(make_raw_graph(tile + [(5, 6, 101)]))
+    G_simplified = ox.simplify_graph(make_raw_graph(tile))
+    assert ox.simplify_graph_incremental(G_simplified, make_raw_graph(overlap)) is G_simplified
+    assert sorted(G_simplified.nodes()) == [1, 6] and G_simplified.edge[1][6][0]['osmid'] == [100, 101]
+    assert_same_graph(G_simplified, G_full)
+
+    # a way whose tags changed replaces its old edges, and keeps the other ways it was chained with
+    G_tagged = make_raw_graph([(1, 2, 100), (2, 3, 100)], name='Main St')
+    G_full = ox.simplify_graph(nx.compose(make_raw_graph(tile), G_tagged))
+    G = ox.simplify_graph_incremental(ox.simplify_graph(make_raw_graph(tile)), G_tagged, copy=True)
+    assert G.edge[1][5][0]['name'] == 'Main St' and G.edge[1][5][0]['osmid'] == [100, 101]
+    assert_same_graph(G, G_full)
+
+    # a way whose node moved gets its new geometry, without the old one left behind
+    G_moved = make_raw_graph(street, moved={2:5e-4})
+    G = ox.simplify_graph_incremental(ox.simplify_graph(make_raw_graph(street)), G_moved)
+    assert_same_graph(G, ox.simplify_graph(make_raw_graph(street, moved={2:5e-4})))
+    assert (G_moved.node[2]['x'], G_moved.node[2]['y']) in list(G.edge[1][5][0]['geometry'].coords)
+
+
+def test_compact_graph():
+
+    import numpy as np
+    import networkx as nx
+    from shapely.geometry import LineString
+    G = nx.MultiDiGraph(name='compact', crs={'init':'epsg:4326'})
+    for node in range(1, 7):
+        G.add_node(node, y=37.7 + node * 1e-3, x=-122.4 + (node % 2) * 1e-3, osmid=node)
+    G.add_node(2**62, y=37.71, x=-122.41, osmid=2**62, highway='traffic_signals')
+    G.add_edge(1, 2, osmid=[10, 11], highway='residential', oneway=False)
+    G.add_edge(2, 1, osmid=[10, 11], highway='residential', oneway=False)
+    G.add_edge(2, 3, osmid=12, highway='primary', oneway=True, name='Main St')
+    G.add_edge(3, 2**62, osmid=13, highway='primary', oneway=True, geometry=LineString([(-122.4, 37.7), (-122.41, 37.71)]))
+    G.add_edge(3, 2**62, osmid=14, highway='service', oneway=True)
+    for u, v in [(3, 4), (4, 5), (5, 6), (6, 3)]:
+        G.add_edge(u, v, osmid=15, highway='residential', oneway=True)
+    G = ox.add_edge_lengths(G)
+
+    # converting to a compact graph and back is lossless
+    C = ox.graph_to_compact(G)
+    assert C.number_of_nodes() == len(G) and C.number_of_edges() == G.number_of_edges()
+    assert C.edge_columns['highway']['kind'] == 'category' and C.edge_columns['highway']['categories'] == ['residential', 'primary', 'service']
+    assert C.edge_columns['geometry']['kind'] == 'geometry' and C.edge_columns['osmid']['kind'] == 'object'
+    G2 = ox.compact_to_graph(C)
+    assert G2.graph == G.graph and G2.node == G.node
+    assert sorted(G2.edges(keys=True)) == sorted(G.edges(keys=True))
+    for u, v, key, data in G.edges(keys=True, data=True):
+        data2 = G2.edge[u][v][key]
+        assert sorted(data2.keys()) == sorted(data.keys())
+        for name, value in data.items():
+            assert value.equals(data2[name]) if name == 'geometry' else value == data2[name]
+
+    # edge lengths are calculated on the arrays, and pipeline functions accept compact graphs
+    C = ox.add_edge_lengths(C.copy())
+    assert np.allclose(C.edge_values('length'), [G.edge[u][v][k]['length'] for u, v, k in ox.compact_to_graph(C).edges(keys=True)])
+    H = C.subgraph(C.node_ids != 1)
+    assert H.number_of_nodes() == 6 and H.number_of_edges() == 7
+    assert sorted(ox.compact_to_graph(H).edges(keys=True)) == sorted(G.subgraph([2, 3, 4, 5, 6, 2**62]).edges(keys=True))
+    assert ox.basic_stats(C)['m'] == ox.basic_stats(G)['m']
+    assert isinstance(ox.truncate_graph_bbox(C, 37.7035, 37.7, -122.39, -122.42, retain_all=True), ox.CompactGraph)
+    H = C.subgraph(C.node_ids != 2**62)
+    assert len(ox.simplify_graph(H)) == len(ox.simplify_graph(G.subgraph([1, 2, 3, 4, 5, 6]))) == 3
+
+    # a copy shares nothing mutable with the graph
+    C2 = C.copy()
+    C2.edge_columns['highway']['categories'].append('tertiary')
+    C2.edge_columns['osmid']['values'][0].append(16)
+    C2.graph['crs']['init'] = 'epsg:3857'
+    assert len(C.edge_columns['highway']['categories']) == 3 and [10, 11] in C.edge_values('osmid').tolist()
+    assert C.graph['crs'] == {'init':'epsg:4326'}
+
+    # without scipy, the largest component is found in the equivalent networkx graph
+    connected_components = ox.compact.connected_components
+    try:
+        ox.compact.connected_components = None
+        assert sorted(ox.get_largest_compact_component(C).node_ids.tolist()) == [1, 2, 3, 4, 5, 6, 2**62]
+        assert sorted(ox.get_largest_compact_component(C, strongly=True).node_ids.tolist()) == [3, 4, 5, 6]
+    finally:
+        ox.compact.connected_components = connected_components
+
+
+def test_truncate_graph_bbox():
+
+    import networkx as nx
+    G = nx.MultiDiGraph(crs={'init':'epsg:4326'})
+    for i in range(10):
+        for j in range(10):
+            G.add_node(i * 10 + j, y=37.7 + i * 1e-3, x=-122.4 + j * 1e-3)
+            if j > 0:
+                G.add_edge(i * 10 + j - 1, i * 10 + j)
+            if i > 0:
+                G.add_edge(i * 10 + j, (i - 1) * 10 + j)
+    # an isolated node inside the bounding box, which is dropped unless retain_all
+    G.add_node(1000, y=37.7035, x=-122.3965)
+    north, south, east, west = 37.7035, 37.7015, -122.3955, -122.3985
+
+    G.graph['streets_per_node'] = {22:4}
+    G.edge[22][23][0]['osmid'] = [10, 11]
+
+    G_bbox = ox.truncate_graph_bbox(G, north, south, east, west)
+    assert sorted(G_bbox.nodes()) == [22, 23, 24, 32, 33, 34] and len(G) == 101
+    assert G_bbox.nodes() == [node for node in G.nodes() if node in G_bbox]
+
+    # the truncated graph's mutable attributes are copies, not shared with the graph
+    G_bbox.graph['streets_per_node'][22] = 3
+    G_bbox.edge[22][23][0]['osmid'].append(12)
+    assert G.graph['streets_per_node'] == {22:4} and G.edge[22][23][0]['osmid'] == [10, 11]
+    G_edge = ox.truncate_graph_bbox(G, north, south, east, west, truncate_by_edge=True, retain_all=True)
+    assert sorted(G_edge.nodes()) == [12, 13, 14, 21, 22, 23, 24, 25, 31, 32, 33, 34, 35, 42, 43, 44, 1000]
+    assert sorted(G_edge.edges()) == sorted(G.subgraph(G_edge.nodes()).edges())
+
+    # compact graphs are truncated on their arrays, with the same result
+    C = ox.graph_to_compact(G)
+    C_edge = ox.truncate_graph_bbox(C, north, south, east, west, truncate_by_edge=True, retain_all=True)
+    assert sorted(C_edge.node_ids.tolist()) == sorted(G_edge.nodes())
+    assert sorted(ox.truncate_graph_bbox(C, north, south, east, west).node_ids.tolist()) == sorted(G_bbox.nodes())
+
+
+def test_truncate_graph_polygon():
+
+    import networkx as nx
+    import geopandas as gpd
+    import shapely
+    from shapely.geometry import Point, Polygon
+    G = nx.MultiDiGraph(crs={'init':'epsg:4326'})
+    for i in range(10):
+        for j in range(10):
+            G.add_node(i * 10 + j, y=37.7 + i * 1e-3, x=-122.4 + j * 1e-3)
+            if j > 0:
+                G.add_edge(i * 10 + j - 1, i * 10 + j)
+            if i > 0:
+                G.add_edge(i * 10 + j, (i - 1) * 10 + j)
+    # a triangle with nodes 22 to 25 on its base, and 33 and 34 inside it
+    polygon = Polygon([(G.node[22]['x'], G.node[22]['y']), (G.node[25]['x'], G.node[25]['y']), (-122.3965, 37.7045)])
+
+    G_polygon = ox.truncate_graph_polygon(G, polygon, retain_all=True)
+    assert sorted(G_polygon.nodes()) == [22, 23, 24, 25, 33, 34] and len(G) == 100
+    assert not hasattr(shapely, 'is_prepared') or not shapely.is_prepared(polygon)
+    G_edge = ox.truncate_graph_polygon(G, polygon, retain_all=True, truncate_by_edge=True)
+    assert sorted(G_edge.nodes()) == [12, 13, 14, 15, 21, 22, 23, 24, 25, 26, 32, 33, 34, 35, 43, 44]
+    C_edge = ox.truncate_graph_polygon(ox.graph_to_compact(G), polygon, retain_all=True, truncate_by_edge=True)
+    assert sorted(C_edge.node_ids.tolist()) == sorted(G_edge.nodes())
+
+    # the quadrat r-tree intersection finds the same points
+    polygon = polygon.buffer(1e-4)
+    gdf_nodes = gpd.GeoDataFrame({'node':G.nodes(), 'geometry':[Point(data['x'], data['y']) for node, data in G.nodes(data=True)]})
+    points_within_geometry = ox.intersect_index_quadrats(gdf_nodes, polygon, quadrat_width=0.001)
+    assert sorted(points_within_geometry['node']) == sorted(ox.truncate_graph_polygon(G, polygon, retain_all=True).nodes())
+
+
+def test_project_graph():
+
+    import numpy as np
+    import networkx as nx
+    import geopandas as gpd
+    from shapely.geometry import Point, LineString
+    G = nx.MultiDiGraph(name='project', crs={'init':'epsg:4326'})
+    for node in range(1, 5):
+        G.add_node(node, y=37.7 + node * 1e-3, x=-122.4 + (node % 2) * 1e-3, osmid=node)
+    G.add_edge(1, 2, osmid=[10, 13])
+    G.add_edge(2, 3, osmid=11, geometry=LineString([(-122.399, 37.702), (-122.3995, 37.7025), (-122.4, 37.703)]))
+    G.add_edge(3, 4, osmid=12, geometry=LineString([(-122.4, 37.703), (-122.399, 37.704)]))
+
+    # the nodes and edge geometries are projected just as geopandas projects them
+    G_proj = ox.project_graph(G)
+    utm_crs = G_proj.graph['crs']
+    assert utm_crs['proj'] == 'utm' and utm_crs['zone'] == 10 and G_proj.graph['name'] == 'project_UTM'
+    points = gpd.GeoSeries([Point(data['x'], data['y']) for node, data in G.nodes(data=True)], crs=G.graph['crs']).to_crs(utm_crs)
+    for point, (node, data) in zip(points, G_proj.nodes(data=True)):
+        assert abs(data['x'] - point.x) < 1e-6 and abs(data['y'] - point.y) < 1e-6
+        assert data['osmid'] == str(node) and data['lon'] == G.node[node]['x'] and data['lat'] == G.node[node]['y']
+    geometry = gpd.GeoSeries([G.edge[2][3][0]['geometry']], crs=G.graph['crs']).to_crs(utm_crs).iloc[0]
+    assert G_proj.edge[2][3][0]['geometry'].almost_equals(geometry, decimal=6) and 'geometry' not in G_proj.edge[1][2][0]
+    assert 'lon' not in G.node[1] and G.edge[2][3][0]['geometry'].coords[0] == (-122.399, 37.702)
+    G_proj.edge[1][2][0]['osmid'].append(14)
+    assert G.edge[1][2][0]['osmid'] == [10, 13]
+
+    # compact graphs are projected on their arrays, and graphs can be projected back to lat-long
+    C_proj = ox.compact_to_graph(ox.project_graph(ox.graph_to_compact(G)))
+    assert C_proj.node == G_proj.node and C_proj.graph == G_proj.graph
+    assert C_proj.edge[2][3][0]['geometry'].almost_equals(G_proj.edge[2][3][0]['geometry'], decimal=6)
+    G_latlong = ox.project_graph(G_proj, to_latlong=True)
+    assert G_latlong.graph['name'] == 'project' and G_latlong.graph['crs'] == {'init':'epsg:4326'}
+    assert np.allclose([G_latlong.node[node]['x'] for node in G.nodes()], [G.node[node]['x'] for node in G.nodes()])
+    assert G_latlong.edge[3][4][0]['geometry'].almost_equals(G.edge[3][4][0]['geometry'], decimal=9)
+
+
+def test_crs_views():
+
+    import numpy as np
+    import networkx as nx
+    from shapely.geometry import LineString
+    G = nx.MultiDiGraph(name='views', crs={'init':'epsg:4326'})
+    for node in range(1, 4):
+        G.add_node(node, y=37.7 + node * 1e-3, x=-122.4 + (node % 2) * 1e-3, osmid=node)
+    G.add_edge(1, 2, osmid=10, oneway=True)
+    G.add_edge(2, 3, osmid=11, oneway=True, geometry=LineString([(-122.4, 37.702), (-122.3995, 37.7025), (-122.399, 37.703)]))
+    G = ox.add_edge_lengths(G)
+    G_proj = ox.project_graph(G)
+
+    # switch the graph to UTM and back in place, with the same coordinates as project_graph
+    utm_crs = ox.add_crs_view(G)
+    assert utm_crs == G_proj.graph['crs'] and G.graph['crs'] == {'init':'epsg:4326'}
+    assert ox.set_graph_crs(G, utm_crs) is G and G.graph['crs'] == utm_crs
+    for node, data in G_proj.nodes(data=True):
+        assert abs(G.node[node]['x'] - data['x']) < 1e-6 and abs(G.node[node]['y'] - data['y']) < 1e-6
+    geometry = G.edge[2][3][0]['geometry']
+    assert geometry.almost_equals(G_proj.edge[2][3][0]['geometry'], decimal=6) and ox.get_edge_geometry(G, 2, 3) is geometry
+    assert ox.get_edge_geometry(G, 1, 2).length > 100
+    assert ox.graph_to_gdfs(G, nodes=False)['geometry'].iloc[-1].almost_equals(geometry, decimal=6)
+    ox.save_graphml(G, filename='views.graphml')
+    assert ox.load_graphml('views.graphml').edge[2][3][0]['geometry'].almost_equals(geometry, decimal=6)
+
+    # everything that reads the geometries gets them in the active CRS
+    x, y = geometry.coords[1]
+    edges, projected_points, distances_along, offsets = ox.get_nearest_edges(G, [(y + 1, x)])
+    assert tuple(edges[0]) == (2, 3, 0) and 0 < abs(offsets[0]) <= 1
+    fig, ax = ox.plot_graph(G, show=False, close=True)
+    assert ax.get_xlim()[0] <= x <= ax.get_xlim()[1] and ax.get_ylim()[0] <= y <= ax.get_ylim()[1]
+
+    # projecting a switched graph projects its geometries from the active CRS
+    G_latlong = ox.project_graph(G, to_latlong=True)
+    G_proj_latlong = ox.project_graph(G_proj, to_latlong=True)
+    assert 'crs_views' not in G_latlong.graph and G_latlong.edge[2][3][0]['geometry'].almost_equals(G_proj_latlong.edge[2][3][0]['geometry'], decimal=9)
+
+    # switching back restores the original geometries, except those edited since, which are reprojected
+    G.edge[2][3][0]['geometry'] = LineString([(G.node[2]['x'], G.node[2]['y']), (G.node[3]['x'], G.node[3]['y'])])
+    edited = G.edge[2][3][0]['geometry']
+    ox.set_graph_crs(G, {'init':'epsg:4326'})
+    assert G.node[1]['x'] == -122.399 and len(G.edge[2][3][0]['geometry'].coords) == 2
+    assert G.edge[2][3][0]['geometry'].almost_equals(LineString([(-122.4, 37.702), (-122.399, 37.703)]), decimal=9)
+    ox.set_graph_crs(G, utm_crs)
+    assert G.edge[2][3][0]['geometry'] is edited
+
+    # a node moved in one CRS is reprojected into the other when switching, and the rest keep their coordinates
+    x_moved = G.node[1]['x'] + 1000
+    G.node[1]['x'] = x_moved
+    ox.set_graph_crs(G, {'init':'epsg:4326'})
+    assert abs(G.node[1]['x'] - (-122.399 + 1000 / (111320 * np.cos(np.deg2rad(37.701))))) < 1e-4
+    assert abs(G.node[1]['y'] - 37.701) < 1e-4 and (G.node[3]['x'], G.node[3]['y']) == (-122.399, 37.703)
+    ox.set_graph_crs(G, utm_crs)
+    assert abs(G.node[1]['x'] - x_moved) < 1e-6 and abs(G.node[2]['x'] - G_proj.node[2]['x']) < 1e-6
+
+
+def test_graph_binary():
+
+    import numpy as np
+    import networkx as nx
+    from shapely.geometry import LineString
+    G = nx.MultiDiGraph(name='binary', crs={'init':'epsg:4326'}, streets_per_node={1:1, 2:3})
+    for node in range(1, 5):
+        G.add_node(node, y=37.7 + node * 1e-3, x=-122.4 + (node % 2) * 1e-3, osmid=node)
+    G.add_node(2**62, y=37.71, x=-122.41, osmid=2**62, highway='traffic_signals')
+    G.add_edge(1, 2, osmid=[10, 11], highway=['residential', 'tertiary'], oneway=False)
+    G.add_edge(2, 1, osmid=[10, 11], highway=['residential', 'tertiary'], oneway=False)
+    G.add_edge(2, 3, osmid=12, highway='primary', oneway=True, name='Main St', maxspeed=40.5)
+    G.add_edge(3, 2**62, osmid=13, highway='primary', oneway=True, geometry=LineString([(-122.4, 37.7), (-122.41, 37.71)]))
+    G.add_edge(3, 2**62, osmid=14, highway='service', oneway=True)
+    G.add_edge(4, 4, osmid=15, highway='residential', oneway=True, geometry=LineString([(-122.4, 37.704), (-122.401, 37.705), (-122.4, 37.704)]))
+    G = ox.add_edge_lengths(G)
+
+    # saving and loading round-trips the graph, with its arrays memory-mapped
+    ox.save_graph_binary(G, filename='binary')
+    G2 = ox.load_graph_binary('binary')
+    assert G2.graph == G.graph and G2.node == G.node
+    assert sorted(G2.edges(keys=True)) == sorted(G.edges(keys=True))
+    for u, v, key, data in G.edges(keys=True, data=True):
+        data2 = G2.edge[u][v][key]
+        assert sorted(data2.keys()) == sorted(data.keys())
+        for name, value in data.items():
+            assert value.equals(data2[name]) if name == 'geometry' else value == data2[name]
+    G2.edge[1][2][0]['osmid'].append(16)
+    assert G2.edge[2][1][0]['osmid'] == [10, 11]
+    C = ox.load_graph_binary('binary', compact=True)
+    assert isinstance(C.targets, np.memmap) and isinstance(C.edge_columns['geometry']['coords'], np.memmap)
+    assert C.edge_columns['highway']['kind'] == 'object' and C.edge_columns['name']['kind'] == 'category'
+
+
+def test_graph_parquet():
+
+    import json
+    import numpy as np
+    import networkx as nx
+    from shapely import wkb
+    from shapely.geometry import LineString
+    from osmnx.save_load import get_point_wkb, get_linestring_wkb, parse_linestring_wkb
+
+    # the vectorized WKB encoding matches shapely's, and decodes back to the same coordinates
+    lines = [LineString([(0, 1), (2, 3)]), LineString([(-122.4, 37.7), (-122.41, 37.71), (-122.42, 37.7)])]
+    coords = np.array([coord for line in lines for coord in line.coords])
+    offsets = np.array([0, 2, 5])
+    data, byte_offsets = get_linestring_wkb(coords, offsets)
+    assert [data[start:end].tobytes() for start, end in zip(byte_offsets[:-1], byte_offsets[1:])] == [line.wkb for line in lines]
+    coords2, offsets2 = parse_linestring_wkb(data, byte_offsets, np.ones(2, dtype=bool))
+    assert (coords2 == coords).all() and (offsets2 == offsets).all()
+    data, byte_offsets = get_point_wkb(np.array([1.5]), np.array([-2.5]))
+    assert wkb.loads(data.tobytes()).coords[0] == (1.5, -2.5)
+
+    G = nx.MultiDiGraph(name='parquet', crs={'init':'epsg:4326'})
+    for node in range(1, 4):
+        G.add_node(node, y=37.7 + node * 1e-3, x=-122.4 + (node % 2) * 1e-3, osmid=node)
+    G.add_node(2**62, y=37.71, x=-122.41, osmid=2**62, highway='traffic_signals')
+    G.add_edge(1, 2, osmid=[10, 11], highway='residential', oneway=False)
+    G.add_edge(2, 1, osmid=[10, 11], highway='residential', oneway=False)
+    G.add_edge(2, 3, osmid=12, highway='primary', oneway=True, name='Main St', maxspeed=40.5)
+    G.add_edge(3, 2**62, osmid=13, highway='primary', oneway=True, geometry=LineString([(-122.4, 37.7), (-122.41, 37.71)]))
+    G.add_edge(3, 2**62, osmid=14, highway='service', oneway=True)
+    G = ox.add_edge_lengths(G)
+
+    import pytest
+    import pyproj
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+
+    # saving and loading as geoparquet round-trips the graph, leaving out missing edge geometries by default
+    ox.save_graph_parquet(G, filename='parquet', row_group_size=2)
+    G2 = ox.load_graph_parquet('parquet')
+    assert G2.graph == G.graph and G2.node == G.node
+    assert sorted(G2.edges(keys=True)) == sorted(G.edges(keys=True))
+    for u, v, key, data in G.edges(keys=True, data=True):
+        data2 = G2.edge[u][v][key]
+        assert sorted(data2.keys()) == sorted(data.keys())
+        for name, value in data.items():
+            assert value.equals(data2[name]) if name == 'geometry' else value == data2[name]
+    G2.edge[1][2][0]['osmid'].append(16)
+    assert G2.edge[2][1][0]['osmid'] == [10, 11]
+    ox.save_graph_parquet(G, filename='parquet_filled', fill_edge_geometry=True)
+    G2 = ox.load_graph_parquet('parquet_filled')
+    assert all('geometry' in data for u, v, data in G2.edges(data=True))
+    assert list(G2.edge[3][2**62][1]['geometry'].coords) == [(G.node[3]['x'], G.node[3]['y']), (G.node[2**62]['x'], G.node[2**62]['y'])]
+
+    # reading only some columns leaves the others out, and the files are valid geoparquet
+    C = ox.load_graph_parquet('parquet', node_columns=[], edge_columns=['length'], compact=True)
+    assert sorted(C.node_columns.keys()) == ['x', 'y'] and sorted(C.edge_columns.keys()) == ['length']
+    metadata = pyarrow.parquet.read_schema('{}/parquet_edges.parquet'.format(ox.globals.data_folder)).metadata
+    assert json.loads(metadata[b'geo'].decode('utf-8'))['columns']['geometry']['encoding'] == 'WKB'
+
+    # a graph switched to another CRS saves its geometries in the CRS its metadata names
+    utm_crs = ox.add_crs_view(G)
+    ox.set_graph_crs(G, utm_crs)
+    ox.save_graph_parquet(G, filename='parquet_utm')
+    metadata = pyarrow.parquet.read_schema('{}/parquet_utm_edges.parquet'.format(ox.globals.data_folder)).metadata
+    crs = json.loads(metadata[b'geo'].decode('utf-8'))['columns']['geometry']['crs']
+    assert crs == pyproj.CRS.from_user_input(utm_crs).to_json_dict() and ox.load_graph_parquet('parquet_utm').edge[3][2**62][0]['geometry'].equals(G.edge[3][2**62][0]['geometry'])
+
+
+def test_project_geometry():
+
+    from shapely.geometry import Point, Polygon
+    polygon = Polygon([(-122.41, 37.7), (-122.39, 37.7), (-122.4, 37.71)])
+    polygon_proj, crs_proj = ox.project_geometry(polygon)
+    assert crs_proj == ox.get_utm_crs(-122.4) and crs_proj['zone'] == 10 and 1e5 < polygon_proj.area < 1e6
+    assert ox.project_geometry(polygon_proj, crs=crs_proj) == (polygon_proj, crs_proj)
+
+    # projecting back to lat-long reuses the cached transform function
+    polygon_latlong, crs_latlong = ox.project_geometry(polygon_proj, crs=crs_proj, to_latlong=True)
+    assert crs_latlong == {'init':'epsg:4326'} and polygon_latlong.almost_equals(polygon, decimal=9)
+    assert ox.get_transform_function(crs_proj, {'init':'epsg:4326'}) is ox.get_transform_function(dict(crs_proj), {'init':'epsg:4326'})
+    point_proj, crs = ox.project_geometry(Point(-122.4, 37.705), to_crs=crs_proj)
+    assert crs == crs_proj and polygon_proj.intersects(point_proj)
+
+
+def start_local_overpass_server():
+
+    # serve a stand-in for the overpass api on a free local port, responding to each query with an
+    # empty response after a random delay so concurrent requests finish out of order. queries containing
+    # 'busy' get a 429 'too many requests' response the first two times they are sent
+    import json, random, threading, time
+    try:
+        from http.server import HTTPServer, BaseHTTPRequestHandler
+    except ImportError:
+        from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        busy_count = 0
+        def do_GET(self):
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(b'Connected as: 1\nCurrent time: 2017-01-01T00:00:00Z\nRate limit: 2\n2 slots available now.\n')
+        def do_POST(self):
+            data = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+            if 'busy' in data and Handler.busy_count < 2:
+                Handler.busy_count += 1
+                self.send_response(429)
+                self.send_header('Retry-After', '0')
+                self.end_headers()
+                return
+            time.sleep(random.random() / 10)
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps({'elements':[], 'remark':data}).encode('utf-8'))
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, 'http://127.0.0.1:{}/api'.format(server.server_port)
+
+
+def test_overpass_request_batch():
+
+    import time
+    import pytest
+    import requests
+    server, endpoint = start_local_overpass_server()
+    # the first endpoint refuses connections, so every request fails over to the local server
+    ox.config(use_cache=False, overpass_endpoints=['http://127.0.0.1:1/api', endpoint], overpass_max_workers=4, overpass_rate_limit=50,
+              data_folder='.temp/data', logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+    try:
+        datas = [{'data':'query {}'.format(i)} for i in range(12)]
+        response_jsons = ox.overpass_request_batch(datas, pause_duration=0)
+        assert [r['remark'] for r in response_jsons] == ['data=query+{}'.format(i) for i in range(12)]
+
+        # the server is busy for the first two attempts, so the request succeeds on its third
+        ox.reset_request_metrics()
+        response_json = ox.overpass_request({'data':'busy'}, pause_duration=0)
+        assert ox.get_request_metrics()['overpass']['retries'] == 2
+
+        # without a fixed pause, the requests share the 2 slots the server's status reports
+        ox.config(use_cache=False, overpass_endpoints=[endpoint], overpass_max_workers=4, overpass_slot_cooldown_factor=0,
+                  data_folder='.temp/data', logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+        response_jsons = ox.overpass_request_batch(datas)
+        assert len(response_jsons) == 12
+        state = ox.overpass_slots_state[endpoint]
+        assert state['rate_limit'] == 2 and state['held'] == 0 and state['expires'] is None
+
+        # slots are tracked per endpoint, and a failed status sync falls back to one slot until its ttl runs out
+        state = ox.sync_overpass_slots('http://127.0.0.1:1/api')
+        assert state['rate_limit'] == 1 and state['expires'] > state['synced']
+        assert ox.overpass_slots_state[endpoint]['rate_limit'] == 2
+
+        # an endpoint that cannot be connected to at all fails at once instead of being re-tried
+        ox.config(use_cache=False, overpass_endpoints=['http://127.0.0.1:1/api'],
+                  data_folder='.temp/data', logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+        ox.reset_request_metrics()
+        start_time = time.time()
+        with pytest.raises(requests.exceptions.ConnectionError):
+            ox.overpass_request({'data':'query'}, pause_duration=0)
+        assert ox.get_request_metrics()['overpass']['retries'] == 0 and time.time() - start_time < 10
+
+        status = ox.parse_overpass_status('Connected as: 1\nRate limit: 2\n0 slots available now.\n'
+                                          'Slot available after: 2017-01-01T00:00:12Z, in 12 seconds.\n'
+                                          'Currently running queries (pid, space limit, time limit, start time):\n'
+                                          '123\t536870912\t180\t2017-01-01T00:00:00Z\n')
+        assert status == {'rate_limit':2, 'available':0, 'release_times':[12], 'running':1}
+    finally:
+        server.shutdown()
+        ox.config(log_console=True, log_file=True, use_cache=True, 
+                  data_folder='.temp/data', logs_folder='.temp/logs', imgs_folder='.temp/imgs', cache_folder='.temp/cache')
+
+
 def test_gdf_shapefiles():
     
     city = ox.gdf_from_place('Manhattan, New York City, New York, USA')